@@ -0,0 +1,108 @@
+import logging
+import os
+import time
+import asyncpg
+from app.metrics import DB_POOL_ACQUIRE_WAIT, DB_POOL_CONNECTIONS
+
+logger = logging.getLogger("moderation_service.postgres_client")
+
+# Размер пула: MIN_SIZE соединений открывается и прогревается при старте, до MAX_SIZE - под нагрузкой
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", 10))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 10))
+# Сколько подготовленных запросов кэшировать на соединение (0 - не кэшировать, нужно за PgBouncer в режиме transaction)
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 100))
+# Через сколько секунд простоя закрывать соединения сверх MIN_SIZE (0 - не закрывать)
+DB_POOL_MAX_INACTIVE_LIFETIME = float(os.getenv("DB_POOL_MAX_INACTIVE_LIFETIME", 300))
+# SQL, выполняемый на каждом новом соединении, например "SET statement_timeout = '5s'"
+DB_CONNECTION_INIT_SQL = os.getenv("DB_CONNECTION_INIT_SQL", "")
+
+
+class _TimedAcquire:
+    """Контекстный менеджер pool.acquire(), который измеряет ожидание свободного соединения."""
+    def __init__(self, pool: asyncpg.Pool, name: str, timeout: float | None):
+        self.pool = pool
+        self.name = name
+        self.timeout = timeout
+        self.connection = None
+
+    async def __aenter__(self):
+        start_time = time.perf_counter()
+        self.connection = await self.pool.acquire(timeout=self.timeout)
+        DB_POOL_ACQUIRE_WAIT.labels(pool=self.name).observe(time.perf_counter() - start_time)
+        return self.connection
+
+    async def __aexit__(self, *exc_info):
+        connection, self.connection = self.connection, None
+        await self.pool.release(connection)
+
+
+class InstrumentedPool:
+    """
+    Пул asyncpg с метриками: ожидание соединения в db_pool_acquire_wait_seconds и число открытых,
+    занятых и допустимых соединений в db_pool_connections (считается при сборе метрик).
+    Остальные методы пула доступны без изменений.
+    """
+    def __init__(self, pool: asyncpg.Pool, name: str):
+        self._pool = pool
+        self.name = name
+        DB_POOL_CONNECTIONS.labels(pool=name, state="open").set_function(pool.get_size)
+        DB_POOL_CONNECTIONS.labels(pool=name, state="in_use").set_function(
+            lambda: pool.get_size() - pool.get_idle_size()
+        )
+        DB_POOL_CONNECTIONS.labels(pool=name, state="max").set_function(pool.get_max_size)
+
+    def acquire(self, *, timeout: float | None = None) -> _TimedAcquire:
+        return _TimedAcquire(self._pool, self.name, timeout)
+
+    async def warm(self) -> int:
+        """
+        Проверяет запросом каждое из min_size соединений, открытых при создании пула, чтобы первый
+        всплеск трафика не платил за первые обращения к ним, а недоступная БД обнаружилась при старте.
+        """
+        connections = []
+        try:
+            for _ in range(self._pool.get_min_size()):
+                connections.append(await self._pool.acquire())
+            for connection in connections:
+                await connection.fetchval("SELECT 1")
+        finally:
+            for connection in connections:
+                await self._pool.release(connection)
+        return len(connections)
+
+    def __getattr__(self, name: str):
+        return getattr(self._pool, name)
+
+
+async def create_pool(
+    dsn: str,
+    name: str,
+    min_size: int = DB_POOL_MIN_SIZE,
+    max_size: int = DB_POOL_MAX_SIZE,
+    statement_cache_size: int = DB_STATEMENT_CACHE_SIZE,
+    max_inactive_connection_lifetime: float = DB_POOL_MAX_INACTIVE_LIFETIME,
+    init_sql: str = DB_CONNECTION_INIT_SQL,
+) -> InstrumentedPool:
+    """Создает и прогревает пул соединений. name попадает в метки метрик и в application_name сессий."""
+    async def init_connection(connection):
+        if init_sql:
+            await connection.execute(init_sql)
+
+    pool = await asyncpg.create_pool(
+        dsn,
+        min_size=min_size,
+        max_size=max_size,
+        statement_cache_size=statement_cache_size,
+        max_inactive_connection_lifetime=max_inactive_connection_lifetime,
+        init=init_connection,
+        server_settings={"application_name": name},
+    )
+    pool = InstrumentedPool(pool, name)
+    try:
+        warmed = await pool.warm()
+    except Exception:
+        await pool.close()
+        raise
+    logger.info(f"Пул соединений {name} создан: min_size={min_size}, max_size={max_size}, "
+                f"statement_cache_size={statement_cache_size}, прогрето соединений: {warmed}")
+    return pool
@@ -1,13 +1,51 @@
+import logging
+import os
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordBearer
 from services.auth import AuthService
 from repositories.accounts import AccountRepository
+from repositories.revoked_accounts import RevokedAccountsNotLoaded
 from models.schemas import Account
+from app.timing import StageTimer
+from app.metrics import AUTH_REVOCATION_CHECKS_TOTAL
+
+logger = logging.getLogger("moderation_service.auth")
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login", auto_error=False)
 
+# Сколько проверенных токенов помнить, чтобы не проверять подпись на каждый запрос (0 - не помнить)
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", 10000))
+
+# database - аккаунт по токену читается из БД (через кэш аккаунтов) на каждый запрос;
+# stateless - достаточно действительного JWT и проверки id по множеству заблокированных и удаленных аккаунтов
+AUTH_MODE = os.getenv("AUTH_MODE", "database")
+
 # В реальном приложении секретный ключ должен быть в конфигурации
-AUTH_SERVICE = AuthService(secret_key="your-super-secret-key")
+AUTH_SERVICE = AuthService(secret_key="your-super-secret-key", cache_size=AUTH_TOKEN_CACHE_SIZE)
+
+def get_account_repository(request: Request) -> AccountRepository:
+    return request.app.state.account_repository
+
+
+async def _account_from_claims(request: Request, account_id: int, login: str) -> Account | None:
+    """
+    Аккаунт из claims токена без запроса в БД. Отозванный аккаунт возвращается заблокированным;
+    None - множество недоступно, и аккаунт нужно прочитать из БД.
+    """
+    try:
+        revoked = await request.app.state.revoked_accounts.is_revoked(account_id)
+    except RevokedAccountsNotLoaded as e:
+        AUTH_REVOCATION_CHECKS_TOTAL.labels(result="fallback").inc()
+        logger.warning(f"{e}, аккаунт {account_id} читается из БД до восстановления множества")
+        request.app.state.account_repository.request_revoked_accounts_sync()
+        return None
+    except Exception as e:
+        AUTH_REVOCATION_CHECKS_TOTAL.labels(result="fallback").inc()
+        logger.warning(f"Множество отозванных аккаунтов недоступно, аккаунт {account_id} читается из БД: {e}")
+        return None
+    AUTH_REVOCATION_CHECKS_TOTAL.labels(result="revoked" if revoked else "allowed").inc()
+    return Account(id=account_id, login=login, is_blocked=revoked)
+
 
 async def get_current_account(
     request: Request,
@@ -26,18 +64,23 @@ async def get_current_account(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    payload = AUTH_SERVICE.verify_token(token)
-    if payload is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    account_id = int(payload.get("sub"))
-    account_repo: AccountRepository = request.app.state.account_repository
-    account = await account_repo.get_by_id(account_id)
-    
+    with StageTimer("auth"):
+        payload = AUTH_SERVICE.verify_token(token)
+        if payload is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Could not validate credentials",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+
+        account_id = int(payload.get("sub"))
+        account = None
+        if AUTH_MODE == "stateless" and payload.get("login") is not None:
+            account = await _account_from_claims(request, account_id, payload["login"])
+        if account is None:
+            account_repo: AccountRepository = request.app.state.account_repository
+            account = await account_repo.get_by_id(account_id)
+
     if account is None or account.is_blocked:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
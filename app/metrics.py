@@ -1,4 +1,4 @@
-from prometheus_client import Counter, Histogram
+from prometheus_client import Counter, Gauge, Histogram
 
 PREDICTIONS_TOTAL = Counter(
     "predictions_total",
@@ -12,18 +12,198 @@ PREDICTION_DURATION = Histogram(
     buckets=[0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0]
 )
 
+PREDICTION_BATCH_SIZE = Histogram(
+    "prediction_batch_size",
+    "Number of requests scored in one micro-batch",
+    buckets=[1, 2, 4, 8, 16, 32, 64, 128, 256]
+)
+
+PREDICTION_QUEUE_WAIT = Histogram(
+    "prediction_queue_wait_seconds",
+    "Time a request spends in the micro-batch queue before scoring",
+    buckets=[0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1]
+)
+
+EXECUTOR_QUEUE_TIME = Histogram(
+    "inference_executor_queue_seconds",
+    "Time an inference task waits in the executor before it starts running",
+    ["mode"],
+    buckets=[0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25]
+)
+
+EXECUTOR_REJECTED_TOTAL = Counter(
+    "inference_executor_rejected_total",
+    "Inference tasks rejected because the executor queue was full",
+    ["mode"]
+)
+
 PREDICTION_ERRORS_TOTAL = Counter(
     "prediction_errors_total",
     "Total number of prediction errors",
     ["error_type"]
 )
 
+MODEL_SWAP_DURATION = Histogram(
+    "model_swap_duration_seconds",
+    "Time spent on each stage of a model hot-swap",
+    ["stage"],
+    buckets=[0.0001, 0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+)
+
+MODEL_ACTIVE_VERSION = Gauge(
+    "model_active_version_info",
+    "Currently active model version (value is always 1)",
+    ["version"]
+)
+
+MODEL_RELOADS_TOTAL = Counter(
+    "model_reloads_total",
+    "Model reload attempts by outcome",
+    ["result"]
+)
+
+SHADOW_PREDICTIONS_TOTAL = Counter(
+    "shadow_predictions_total",
+    "Requests scored by the shadow model, by agreement of the label with the primary model",
+    ["agreement"]
+)
+
+SHADOW_PROBABILITY_DELTA = Histogram(
+    "shadow_probability_delta",
+    "Absolute difference between shadow and primary violation probabilities",
+    buckets=[0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0]
+)
+
+SHADOW_DROPPED_TOTAL = Counter(
+    "shadow_dropped_total",
+    "Sampled requests dropped because the shadow queue was full"
+)
+
+SHADOW_ERRORS_TOTAL = Counter(
+    "shadow_errors_total",
+    "Shadow model scoring failures"
+)
+
+CACHE_HITS_TOTAL = Counter(
+    "cache_hits_total",
+    "Cache hits by tier",
+    ["tier"]
+)
+
+CACHE_MISSES_TOTAL = Counter(
+    "cache_misses_total",
+    "Cache misses by tier",
+    ["tier"]
+)
+
+CACHE_EVICTIONS_TOTAL = Counter(
+    "cache_evictions_total",
+    "Entries evicted from a cache tier, by reason",
+    ["tier", "reason"]
+)
+
+CACHE_L1_SIZE = Gauge(
+    "cache_l1_size",
+    "Current size of the in-process L1 cache",
+    ["unit"]
+)
+
+CACHE_INVALIDATION_LATENCY = Histogram(
+    "cache_invalidation_latency_seconds",
+    "Time from publishing a cache invalidation to evicting it from this process's L1",
+    buckets=[0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0]
+)
+
+CACHE_INVALIDATION_MESSAGES_TOTAL = Counter(
+    "cache_invalidation_messages_total",
+    "Received cache invalidations: applied, stale (already seen), gap (lost messages, L1 cleared) "
+    "or missed (found by the version check, L1 cleared)",
+    ["result"]
+)
+
+CACHE_STALE_SERVED_TOTAL = Counter(
+    "cache_stale_served_total",
+    "Cached values served past their soft TTL while a background refresh runs"
+)
+
+CACHE_REFRESHES_TOTAL = Counter(
+    "cache_refreshes_total",
+    "Background refreshes of stale cache entries",
+    ["result"]
+)
+
+CACHE_NEGATIVE_HITS_TOTAL = Counter(
+    "cache_negative_hits_total",
+    "Database lookups avoided because the item is cached as missing or closed",
+    ["lookup"]
+)
+
+CACHE_PREWARM_ITEMS_TOTAL = Counter(
+    "cache_prewarm_items_total",
+    "Open items whose predictions were written to the cache by the pre-warmer"
+)
+
+PASSWORD_HASH_DURATION = Histogram(
+    "password_hash_duration_seconds",
+    "Time spent computing password KDF hashes in the password worker pool",
+    ["operation"],
+    buckets=[0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5]
+)
+
+PASSWORD_HASH_WAIT = Histogram(
+    "password_hash_wait_seconds",
+    "Time a password hash waits for a free worker in the password pool",
+    buckets=[0.0, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0]
+)
+
+ACCOUNT_CACHE_REQUESTS_TOTAL = Counter(
+    "account_cache_requests_total",
+    "Account lookups by id served from the in-process cache (hit, a database query saved) or the database (miss)",
+    ["result"]
+)
+
+AUTH_REVOCATION_CHECKS_TOTAL = Counter(
+    "auth_revocation_checks_total",
+    "Stateless auth checks of the token subject against the revoked accounts set: allowed, revoked, "
+    "or fallback to a database lookup when the set is unavailable",
+    ["result"]
+)
+
+SINGLEFLIGHT_CALLS_TOTAL = Counter(
+    "singleflight_calls_total",
+    "Coalesced cache-miss computations: leader runs it, follower joins an in-process call, "
+    "remote_wait waits for another replica holding the Redis lock",
+    ["role"]
+)
+
+REQUEST_STAGE_DURATION = Histogram(
+    "request_stage_duration_seconds",
+    "Time spent per request in each stage of the request path: auth, cache_get, cache_set, db, "
+    "features, inference, serialization",
+    ["route", "stage"],
+    buckets=[0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0]
+)
+
 DB_QUERY_DURATION = Histogram(
     "db_query_duration_seconds",
     "Time spent on database queries",
     ["query_type"]
 )
 
+DB_POOL_ACQUIRE_WAIT = Histogram(
+    "db_pool_acquire_wait_seconds",
+    "Time spent waiting for a connection from the asyncpg pool",
+    ["pool"],
+    buckets=[0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0]
+)
+
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Connections of the asyncpg pool: open, in_use (acquired) and max (pool limit); "
+    "utilization is in_use / max",
+    ["pool", "state"]
+)
+
 MODEL_PREDICTION_PROBABILITY = Histogram(
     "model_prediction_probability",
     "Distribution of model prediction probabilities",
@@ -0,0 +1,53 @@
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from app.metrics import REQUEST_STAGE_DURATION
+
+# Замеры текущего запроса. Вне запроса (воркер, прогрев кэша) переменная пуста и таймеры ничего не делают
+_current_timings: ContextVar[Optional["RequestTimings"]] = ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    """Суммарное время каждого этапа одного запроса."""
+    __slots__ = ("route", "stages", "endpoint_done_at")
+
+    def __init__(self):
+        self.route: str | None = None
+        self.stages: dict[str, float] = {}
+        self.endpoint_done_at: float | None = None
+
+    def add(self, stage: str, duration: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + duration
+
+    def observe(self):
+        # Запросы, не дошедшие до маршрута (404, 405), в метрики этапов не попадают
+        if self.route is None:
+            return
+        for stage, duration in self.stages.items():
+            REQUEST_STAGE_DURATION.labels(route=self.route, stage=stage).observe(duration)
+
+    def server_timing(self) -> str:
+        return ", ".join(f"{stage};dur={duration * 1000:.3f}" for stage, duration in self.stages.items())
+
+
+class StageTimer:
+    """
+    Контекстный менеджер, добавляющий время блока к этапу stage текущего запроса.
+    Вне запроса стоит одно чтение ContextVar.
+    """
+    __slots__ = ("stage", "timings", "started_at")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.timings = _current_timings.get()
+        if self.timings is not None:
+            self.started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.timings is not None:
+            self.timings.add(self.stage, time.perf_counter() - self.started_at)
+        return False
@@ -0,0 +1,77 @@
+import functools
+import inspect
+import time
+from typing import Any, Callable
+
+from fastapi.routing import APIRoute
+from starlette.datastructures import MutableHeaders
+# Сами замеры не зависят от FastAPI и живут отдельно, чтобы их могли импортировать сервисы и воркеры
+from app.stage_timer import RequestTimings, StageTimer, _current_timings
+
+def _mark_endpoint_done(endpoint: Callable) -> Callable:
+    """Запоминает момент возврата из обработчика, чтобы отделить от него сериализацию ответа."""
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs) -> Any:
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            timings = _current_timings.get()
+            if timings is not None:
+                timings.endpoint_done_at = time.perf_counter()
+    return wrapper
+
+
+class TimedRoute(APIRoute):
+    """
+    Маршрут, который подписывает замеры запроса своим шаблоном пути и измеряет этап
+    serialization: проверку ответа по response_model и рендеринг JSON после возврата из обработчика.
+    """
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        if inspect.iscoroutinefunction(endpoint):
+            endpoint = _mark_endpoint_done(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        route = self.path_format
+
+        async def timed_handler(request):
+            timings = _current_timings.get()
+            if timings is None:
+                return await handler(request)
+            timings.route = route
+            response = await handler(request)
+            if timings.endpoint_done_at is not None:
+                timings.add("serialization", time.perf_counter() - timings.endpoint_done_at)
+            return response
+        return timed_handler
+
+
+class StageTimingMiddleware:
+    """
+    ASGI-middleware: заводит замеры на каждый HTTP-запрос, перед отправкой ответа записывает
+    их в гистограмму request_stage_duration_seconds и, если включено, в заголовок Server-Timing.
+    """
+    def __init__(self, app, server_timing_header: bool = False):
+        self.app = app
+        self.server_timing_header = server_timing_header
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current_timings.set(timings)
+
+        async def send_with_timings(message):
+            if message["type"] == "http.response.start":
+                timings.observe()
+                if self.server_timing_header and timings.stages:
+                    MutableHeaders(scope=message).append("Server-Timing", timings.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timings)
+        finally:
+            _current_timings.reset(token)
@@ -6,13 +6,13 @@ import sys
 from datetime import datetime, timezone
 
 from aiokafka import AIOKafkaConsumer, AIOKafkaProducer
-import asyncpg
 
 # Import project-specific modules
 from services.prediction import PredictionService, ItemNotFoundError
+from services.model_manager import ModelManager
 from repositories.items import ItemRepository
 from repositories.moderation_results import ModerationResultRepository
-from model import get_model # To load the ML model
+from app.clients.postgres import InstrumentedPool, create_pool
 
 # Setup logging
 logging.basicConfig(
@@ -28,21 +28,37 @@ MODERATION_TOPIC = "moderation"
 DLQ_TOPIC = "moderation_dlq"
 MAX_RETRIES = 3
 RETRY_DELAY_SECONDS = 5
+# Исполнитель инференса: inline (в цикле событий), thread или process
+INFERENCE_EXECUTOR = os.getenv("INFERENCE_EXECUTOR", "thread")
+INFERENCE_EXECUTOR_WORKERS = int(os.getenv("INFERENCE_EXECUTOR_WORKERS", 0)) or None
+INFERENCE_EXECUTOR_MAX_QUEUE = int(os.getenv("INFERENCE_EXECUTOR_MAX_QUEUE", 64))
+# Как часто проверять появление новой версии модели (0 - не проверять)
+MODEL_WATCH_INTERVAL_SECONDS = float(os.getenv("MODEL_WATCH_INTERVAL_SECONDS", 30))
 
 class WorkerDependencies:
     """Helper class to hold worker dependencies (DB pool, repos, ML model, Kafka producer)."""
     def __init__(self):
-        self.db_pool: asyncpg.Pool | None = None
+        self.db_pool: InstrumentedPool | None = None
         self.item_repo: ItemRepository | None = None
         self.moderation_repo: ModerationResultRepository | None = None
         self.prediction_service: PredictionService | None = None
         self.kafka_producer: AIOKafkaProducer | None = None
+        self.model_manager: ModelManager | None = None
+
+    async def _build_prediction_service(self, model) -> PredictionService:
+        service = PredictionService(model)
+        service.start_executor(
+            mode=INFERENCE_EXECUTOR,
+            max_workers=INFERENCE_EXECUTOR_WORKERS,
+            max_queue_depth=INFERENCE_EXECUTOR_MAX_QUEUE,
+        )
+        return service
 
     async def initialize(self):
         logger.info("Инициализация зависимостей воркера...")
         # DB Pool
         try:
-            self.db_pool = await asyncpg.create_pool(DATABASE_URL)
+            self.db_pool = await create_pool(DATABASE_URL, name="moderation_worker")
             self.item_repo = ItemRepository(self.db_pool)
             self.moderation_repo = ModerationResultRepository(self.db_pool)
             logger.info("Пул соединений с БД для воркера создан.")
@@ -51,9 +67,13 @@ class WorkerDependencies:
             sys.exit(1)
 
         # ML Model
+        # Менеджер подменяет self.prediction_service при появлении новой версии модели
+        self.model_manager = ModelManager(
+            self, self._build_prediction_service, poll_interval=MODEL_WATCH_INTERVAL_SECONDS
+        )
         try:
-            model = get_model()
-            self.prediction_service = PredictionService(model)
+            await self.model_manager.reload()
+            self.model_manager.start_watching()
             logger.info("ML модель для воркера загружена.")
         except Exception as e:
             logger.error(f"Ошибка загрузки ML модели для воркера: {e}", exc_info=True)
@@ -80,6 +100,8 @@ class WorkerDependencies:
         if self.kafka_producer:
             await self.kafka_producer.stop()
             logger.info("Kafka Producer для DLQ/retries остановлен.")
+        if self.model_manager:
+            await self.model_manager.stop()
 
 async def process_message(msg, deps: WorkerDependencies):
     """Обрабатывает одно сообщение из Kafka."""
@@ -101,13 +123,13 @@ async def process_message(msg, deps: WorkerDependencies):
         if not all([deps.item_repo, deps.moderation_repo, deps.prediction_service, deps.kafka_producer]):
             raise RuntimeError("Зависимости воркера не инициализированы.")
 
-        # 1. Получаем данные объявления из БД
-        item_data = await deps.item_repo.get_item_with_seller_info(item_id)
-        if item_data is None:
+        # 1. Получаем признаки объявления из БД
+        item_record = await deps.item_repo.get_item_features(item_id)
+        if item_record is None:
             raise ItemNotFoundError(f"Объявление с id {item_id} не найдено в БД.")
 
         # 2. Вызываем ML-сервис для предсказания
-        prediction_result = deps.prediction_service.predict(item_data)
+        prediction_result = await deps.prediction_service.predict_record_async(item_record)
         is_violation = prediction_result["is_violation"]
         probability = prediction_result["probability"]
 
@@ -0,0 +1,161 @@
+"""
+Бенчмарк стоимости авторизации одного запроса.
+
+Вызывает зависимость get_current_account напрямую (без HTTP) для --clients клиентов, каждый
+из которых повторяет свой токен, как браузер или сервис между логинами. Аккаунты отдаются
+из памяти, поэтому замер показывает только проверку токена и накладные расходы зависимости.
+
+1. AuthService без кэша проверенных токенов (прежнее поведение) и с ним.
+2. Задержка p50/p99 get_current_account с кэшем токенов в режимах проверки аккаунта:
+   database - SELECT на каждый запрос (задержка БД имитируется --db-latency-ms),
+   database+l1 - то же за кэшем аккаунтов CachedAccountRepository,
+   stateless/memory - claims токена и проверка по множеству отозванных в памяти процесса,
+   stateless/redis - то же по множеству в Redis (если задан --redis-host).
+
+Запуск: python -m benchmarks.bench_auth --requests 20000 --clients 100 --redis-host localhost
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import app.dependencies as dependencies
+from benchmarks.suite import percentile_ms
+from models.schemas import Account
+from repositories.accounts import CachedAccountRepository
+from repositories.cache import L1Cache
+from repositories.redis_repository import RedisRepository
+from repositories.revoked_accounts import MemoryRevokedAccounts, RedisRevokedAccounts
+from services.auth import AuthService
+
+SECRET_KEY = "bench-secret-key-long-enough-for-hs256"
+
+
+class MemoryAccountRepository:
+    def __init__(self, accounts: dict[int, Account], latency: float = 0.0):
+        self.accounts = accounts
+        self.latency = latency
+
+    async def get_by_id(self, account_id: int):
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+        return self.accounts.get(account_id)
+
+
+class FakeApp:
+    class state:
+        pass
+
+
+class FakeRequest:
+    def __init__(self, app):
+        self.app = app
+        self.cookies = {}
+
+
+async def measure(auth_service: AuthService, request, tokens: list[str], requests: int) -> float:
+    """Среднее время одного вызова get_current_account в микросекундах."""
+    dependencies.AUTH_SERVICE = auth_service
+    start = time.perf_counter()
+    for i in range(requests):
+        await dependencies.get_current_account(request, tokens[i % len(tokens)])
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+async def measure_latencies(request, tokens: list[str], requests: int) -> list[float]:
+    durations = []
+    for i in range(requests):
+        start = time.perf_counter()
+        await dependencies.get_current_account(request, tokens[i % len(tokens)])
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+async def compare_modes(args, accounts: dict[int, Account], tokens: list[str]):
+    database = MemoryAccountRepository(accounts, latency=args.db_latency_ms / 1000)
+    # Все режимы, кроме database, обслуживают запросы без обращения к БД, поэтому задержка ей не нужна
+    modes = {
+        "database": ("database", database, None),
+        "database+l1": ("database", CachedAccountRepository(database, L1Cache(), ttl=30), None),
+        "stateless/memory": ("stateless", database, MemoryRevokedAccounts()),
+    }
+    redis_repository = None
+    if args.redis_host:
+        redis_repository = RedisRepository(host=args.redis_host, port=args.redis_port)
+        revoked = RedisRevokedAccounts(redis_repository.client, key="bench:revoked_accounts")
+        await revoked.load(range(args.clients + 1, args.clients + 1 + args.revoked))
+        modes["stateless/redis"] = ("stateless", database, revoked)
+
+    requests = max(args.requests // 10, len(tokens))
+    samples: dict[str, list[list[float]]] = {name: [] for name in modes}
+    original_mode = dependencies.AUTH_MODE
+    try:
+        for _ in range(args.rounds):
+            for name, (mode, repository, revoked) in modes.items():
+                app = FakeApp()
+                app.state.account_repository = repository
+                app.state.revoked_accounts = revoked
+                dependencies.AUTH_MODE = mode
+                samples[name].append(await measure_latencies(FakeRequest(app), tokens, requests))
+    finally:
+        dependencies.AUTH_MODE = original_mode
+        if redis_repository is not None:
+            await redis_repository.client.delete("bench:revoked_accounts", "bench:revoked_accounts:loaded")
+            await redis_repository.client.close()
+
+    print(f"\nget_current_account по режимам, медиана по {args.rounds} раундам из {requests} вызовов, "
+          f"задержка БД {args.db_latency_ms} мс")
+    print(f"{'mode':>18} {'p50, ms':>9} {'p99, ms':>9}")
+    for name, rounds in samples.items():
+        p50 = statistics.median(percentile_ms(r, 50) for r in rounds)
+        p99 = statistics.median(percentile_ms(r, 99) for r in rounds)
+        print(f"{name:>18} {p50:>9.4f} {p99:>9.4f}")
+
+
+async def main_async(args):
+    accounts = {i: Account(id=i, login=f"user{i}") for i in range(1, args.clients + 1)}
+    app = FakeApp()
+    app.state.account_repository = MemoryAccountRepository(accounts)
+    request = FakeRequest(app)
+    tokens = [AuthService(SECRET_KEY).create_token(account) for account in accounts.values()]
+
+    original = dependencies.AUTH_SERVICE
+    results: dict[str, list[float]] = {"uncached": [], "memoized": []}
+    try:
+        for _ in range(args.rounds):
+            results["uncached"].append(
+                await measure(AuthService(SECRET_KEY, cache_size=0), request, tokens, args.requests)
+            )
+            # Первые обращения каждого клиента проверяют подпись, как после старта реплики
+            results["memoized"].append(await measure(AuthService(SECRET_KEY), request, tokens, args.requests))
+    finally:
+        dependencies.AUTH_SERVICE = original
+
+    uncached = statistics.median(results["uncached"])
+    memoized = statistics.median(results["memoized"])
+    print(f"get_current_account, {args.clients} клиентов, медиана по {args.rounds} раундам из {args.requests} вызовов")
+    print(f"{'uncached':>10}: {uncached:8.2f} мкс/запрос")
+    print(f"{'memoized':>10}: {memoized:8.2f} мкс/запрос ({uncached / memoized:.1f}x)")
+
+    dependencies.AUTH_SERVICE = AuthService(SECRET_KEY)
+    try:
+        await compare_modes(args, accounts, tokens)
+    finally:
+        dependencies.AUTH_SERVICE = original
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--db-latency-ms", type=float, default=0.5)
+    parser.add_argument("--revoked", type=int, default=10000, help="сколько id заранее положить в множество Redis")
+    parser.add_argument("--redis-host", default=None)
+    parser.add_argument("--redis-port", type=int, default=6379)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Бенчмарк кодеков значений кэша.
+
+Для предсказаний и статусов модерации сравнивает JSON-текст (прежний формат) и компактный
+бинарный формат: размер значения в байтах и время кодирования и декодирования одной записи.
+Redis не нужен: в Redis сохраняются ровно эти байты.
+
+Запуск: python -m benchmarks.bench_cache_codec --records 10000
+"""
+import argparse
+import time
+import numpy as np
+
+from repositories.codecs import BinaryCodec, JsonCodec
+
+
+def make_records(n: int) -> dict[str, list[dict]]:
+    rng = np.random.default_rng(0)
+    predictions = [
+        {"is_violation": bool(rng.integers(0, 2)), "probability": float(rng.random())}
+        for _ in range(n)
+    ]
+    moderation_results = []
+    for i in range(n):
+        failed = rng.random() < 0.1
+        moderation_results.append({
+            "task_id": i + 1,
+            "status": "failed" if failed else "completed",
+            "is_violation": None if failed else bool(rng.integers(0, 2)),
+            "probability": None if failed else float(rng.random()),
+            "error_message": "Объявление не найдено" if failed else None,
+        })
+    return {"prediction": predictions, "moderation_status": moderation_results}
+
+
+def measure(func, values: list, repeat: int) -> float:
+    """Лучшее время на одну запись в микросекундах."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for value in values:
+            func(value)
+        best = min(best, time.perf_counter() - start)
+    return best / len(values) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    codecs = [JsonCodec(), BinaryCodec()]
+    print(f"{'record':>18} {'codec':>7} {'bytes/key':>10} {'encode, us':>11} {'decode, us':>11}")
+    for record_type, values in make_records(args.records).items():
+        for codec in codecs:
+            encoded = [codec.encode(value) for value in values]
+            # В Redis уходят байты; JSON-текст кодируется в UTF-8
+            payloads = [e.encode() if isinstance(e, str) else e for e in encoded]
+            assert [codec.decode(p) for p in payloads] == values
+            size = sum(len(p) for p in payloads) / len(payloads)
+            encode_us = measure(codec.encode, values, args.repeat)
+            decode_us = measure(codec.decode, payloads, args.repeat)
+            print(f"{record_type:>18} {codec.name:>7} {size:>10.1f} {encode_us:>11.2f} {decode_us:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
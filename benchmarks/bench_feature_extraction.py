@@ -0,0 +1,84 @@
+"""
+Бенчмарк преобразования строк БД в матрицу признаков.
+
+Сравнивает прежний путь (строка -> Item с валидацией -> build_features)
+с прямым построением признаков из записей ItemRepository.get_item_features.
+Записи asyncpg имитируются словарями: доступ по ключу у них одинаковый.
+
+Запуск: python -m benchmarks.bench_feature_extraction --rows 1 100 10000
+"""
+import argparse
+import time
+import numpy as np
+
+from models.schemas import Item
+from services.prediction import PredictionService
+
+
+def make_rows(n: int) -> tuple[list[dict], list[dict]]:
+    rng = np.random.default_rng(42)
+    item_rows, feature_rows = [], []
+    for i in range(n):
+        description = "x" * int(rng.integers(0, 1000))
+        row = {
+            "item_id": i + 1,
+            "name": f"Item {i}",
+            "description": description,
+            "category": int(rng.integers(1, 100)),
+            "images_qty": int(rng.integers(0, 10)),
+            "seller_id": int(rng.integers(1, 1000)),
+            "is_verified_seller": bool(rng.integers(0, 2)),
+        }
+        item_rows.append(row)
+        feature_rows.append({
+            "item_id": row["item_id"],
+            "is_verified_seller": row["is_verified_seller"],
+            "images_qty": row["images_qty"],
+            "description_length": len(description),
+            "category": row["category"],
+        })
+    return item_rows, feature_rows
+
+
+def via_item(item_rows: list[dict]) -> np.ndarray:
+    return np.array([PredictionService.build_features(Item(**row)) for row in item_rows])
+
+
+def via_record_rows(feature_rows: list[dict]) -> np.ndarray:
+    return np.array([PredictionService.build_features_from_record(row) for row in feature_rows])
+
+
+def via_record_columns(feature_rows: list[dict]) -> np.ndarray:
+    return PredictionService.build_feature_matrix_from_records(feature_rows)
+
+
+def measure(func, arg, repeat: int) -> float:
+    """Лучшее время одного прогона в секундах."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1, 100, 10000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'item, us/row':>14} {'record, us/row':>16} {'columnar, us/row':>18}")
+    for n in args.rows:
+        item_rows, feature_rows = make_rows(n)
+        np.testing.assert_allclose(via_item(item_rows), via_record_columns(feature_rows))
+        timings = [
+            measure(via_item, item_rows, args.repeat),
+            measure(via_record_rows, feature_rows, args.repeat),
+            measure(via_record_columns, feature_rows, args.repeat),
+        ]
+        print(f"{n:>8} " + " ".join(f"{t / n * 1e6:>{w}.2f}" for t, w in zip(timings, (14, 16, 18))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Бенчмарк всплеска входов: пропускная способность /login и задержка цикла событий.
+
+Запускает --logins одновременных AccountRepository.get_by_login_and_password с хэшами scrypt
+(пул соединений подменен памятью) и параллельно зонд, который каждую миллисекунду засыпает
+на 1 мс и измеряет, насколько позже просыпается: это задержка, которую в тот же момент
+получили бы все остальные запросы сервиса. Сравниваются:
+- inline: scrypt прямо в цикле событий, как выглядел бы переход на KDF без пула;
+- pool: PasswordHasher с --workers потоками.
+
+Запуск: python -m benchmarks.bench_login --logins 50 --workers 2
+"""
+import argparse
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any
+
+import numpy as np
+
+from repositories.accounts import AccountRepository
+from services.passwords import PasswordHasher
+
+PROBE_INTERVAL = 0.001
+
+
+class InlineHasher(PasswordHasher):
+    """Считает KDF в цикле событий."""
+    async def _run(self, operation: str, func, *args) -> Any:
+        return func(*args)
+
+
+class MemoryPool:
+    def __init__(self, row: dict):
+        self.row = row
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self
+
+    async def fetchrow(self, query: str, *args):
+        return self.row
+
+
+async def probe_lag(stop: asyncio.Event) -> list[float]:
+    lags = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(time.perf_counter() - start - PROBE_INTERVAL)
+    return lags
+
+
+async def run(hasher: PasswordHasher, logins: int) -> dict:
+    row = {"id": 1, "login": "seller", "is_blocked": False, "password": hasher.hash_sync("secret")}
+    repository = AccountRepository(MemoryPool(row), hasher=hasher)
+    stop = asyncio.Event()
+    probe = asyncio.create_task(probe_lag(stop))
+    await asyncio.sleep(0.05)
+
+    start = time.perf_counter()
+    accounts = await asyncio.gather(
+        *(repository.get_by_login_and_password("seller", "secret") for _ in range(logins))
+    )
+    elapsed = time.perf_counter() - start
+    stop.set()
+    lags = await probe
+    assert all(account is not None for account in accounts)
+    return {
+        "logins_per_sec": logins / elapsed,
+        "lag_p50_ms": float(np.percentile(lags, 50)) * 1000,
+        "lag_p99_ms": float(np.percentile(lags, 99)) * 1000,
+        "lag_max_ms": max(lags) * 1000,
+    }
+
+
+async def main_async(args):
+    variants = {
+        "inline": InlineHasher(),
+        f"pool x{args.workers}": PasswordHasher(max_workers=args.workers),
+    }
+    print(f"{args.logins} одновременных входов, scrypt n=2^14 r=8 p=1")
+    print(f"{'variant':>10} {'logins/s':>9} {'lag p50, ms':>12} {'lag p99, ms':>12} {'lag max, ms':>12}")
+    for name, hasher in variants.items():
+        result = await run(hasher, args.logins)
+        hasher.shutdown()
+        print(f"{name:>10} {result['logins_per_sec']:>9.1f} {result['lag_p50_ms']:>12.2f} "
+              f"{result['lag_p99_ms']:>12.2f} {result['lag_max_ms']:>12.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Бенчмарк холодного старта загрузки модели.
+
+Каждый замер выполняется в отдельном процессе интерпретатора: учитываются
+импорт модулей сервиса и get_model(), как при старте API или воркера.
+Режимы:
+- compact: компактный артефакт model.npz (по умолчанию);
+- pickle: MODEL_ARTIFACT_FORMAT=pickle, загрузка model.pkl через sklearn;
+- mlflow: USE_MLFLOW=true, только с флагом --mlflow и установленным mlflow.
+
+Запуск: python -m benchmarks.bench_model_startup --runs 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+STARTUP_CODE = """
+import time
+start = time.perf_counter()
+from model import get_model
+from services.prediction import PredictionService
+service = PredictionService(get_model())
+print(time.perf_counter() - start)
+"""
+
+MODES = {
+    "compact": {"USE_MLFLOW": "false", "MODEL_ARTIFACT_FORMAT": "compact"},
+    "pickle": {"USE_MLFLOW": "false", "MODEL_ARTIFACT_FORMAT": "pickle"},
+    "mlflow": {"USE_MLFLOW": "true"},
+}
+
+
+def cold_start(env_overrides: dict) -> tuple[float, float]:
+    """Возвращает (время внутри процесса, полное время с запуском интерпретатора)."""
+    env = {**os.environ, **env_overrides}
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", STARTUP_CODE], env=env, capture_output=True, text=True, check=True
+    )
+    total = time.perf_counter() - start
+    return float(result.stdout.strip().splitlines()[-1]), total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--mlflow", action="store_true", help="Также замерить загрузку из MLflow")
+    args = parser.parse_args()
+
+    modes = ["compact", "pickle"] + (["mlflow"] if args.mlflow else [])
+    print(f"{'mode':>8} {'load, ms (median)':>18} {'process, ms (median)':>21}")
+    for mode in modes:
+        samples = [cold_start(MODES[mode]) for _ in range(args.runs)]
+        load = statistics.median(s[0] for s in samples) * 1000
+        total = statistics.median(s[1] for s in samples) * 1000
+        print(f"{mode:>8} {load:>18.1f} {total:>21.1f}")
+
+
+if __name__ == "__main__":
+    main()
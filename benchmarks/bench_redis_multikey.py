@@ -0,0 +1,93 @@
+"""
+Бенчмарк многоключевых операций RedisRepository.
+
+Записывает, читает и удаляет --keys ключей двумя способами: по одному ключу за сетевой обмен
+(set/get/delete в цикле) и пакетно (set_many через pipeline, get_many через MGET, delete_many).
+Нужен запущенный Redis; выигрыш пакетного режима растет вместе с сетевой задержкой до Redis,
+поэтому его стоит измерять в той же сети, где работает сервис.
+
+Запуск: python -m benchmarks.bench_redis_multikey --host localhost --port 6379 --keys 1000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from repositories.redis_repository import RedisRepository
+
+KEY_PREFIX = "bench:multikey:"
+
+
+async def sequential(repo: RedisRepository, items: dict) -> dict[str, float]:
+    timings = {}
+    start = time.perf_counter()
+    for key, value in items.items():
+        await repo.set(key, value, ttl=60)
+    timings["set"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    values = [await repo.get(key) for key in items]
+    timings["get"] = time.perf_counter() - start
+    assert values == list(items.values())
+
+    start = time.perf_counter()
+    for key in items:
+        await repo.delete(key)
+    timings["delete"] = time.perf_counter() - start
+    return timings
+
+
+async def batched(repo: RedisRepository, items: dict) -> dict[str, float]:
+    timings = {}
+    start = time.perf_counter()
+    await repo.set_many(items, ttl=60)
+    timings["set"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    values = await repo.get_many(list(items))
+    timings["get"] = time.perf_counter() - start
+    assert values == list(items.values())
+
+    start = time.perf_counter()
+    await repo.delete_many(list(items))
+    timings["delete"] = time.perf_counter() - start
+    return timings
+
+
+async def main_async(args):
+    repo = RedisRepository(host=args.host, port=args.port)
+    items = {
+        f"{KEY_PREFIX}{i}": {"is_violation": i % 2 == 0, "probability": i / args.keys}
+        for i in range(args.keys)
+    }
+    results: dict[str, list[dict[str, float]]] = {"sequential": [], "batched": []}
+    try:
+        # Прогрев соединения
+        await batched(repo, dict(list(items.items())[:10]))
+        for _ in range(args.repeat):
+            results["sequential"].append(await sequential(repo, items))
+            results["batched"].append(await batched(repo, items))
+    finally:
+        await repo.delete_many(list(items))
+        await repo.client.close()
+
+    print(f"{args.keys} ключей, медиана по {args.repeat} прогонам")
+    print(f"{'operation':>10} {'sequential, ms':>16} {'batched, ms':>13} {'speedup':>9}")
+    for operation in ("set", "get", "delete"):
+        seq = statistics.median(r[operation] for r in results["sequential"]) * 1000
+        bat = statistics.median(r[operation] for r in results["batched"]) * 1000
+        print(f"{operation:>10} {seq:>16.2f} {bat:>13.2f} {seq / bat:>8.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=6379)
+    parser.add_argument("--keys", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Бенчмарк влияния теневой модели на латентность основного пути.
+
+Подает открытую нагрузку с постоянной частотой --rps на PredictionService.predict_async
+с исполнителем в режиме thread (как в сервисе по умолчанию) без теневой модели и с ней
+при разных долях выборки, и сравнивает p50/p99. Теневая модель обучена отдельно и
+оценивается общим путем sklearn, без быстрого линейного скорера основной. Запросы
+отправляются по расписанию, не дожидаясь ответов на предыдущие, как у живого трафика; при замкнутой нагрузке на
+пределе пропускной способности любая дополнительная работа, даже фоновая, ушла бы
+в латентность. Прогоны чередуются, итог - медиана по раундам. Код возврата 1, если p99
+с теневой моделью хуже базового больше допустимого: относительного --tolerance
+и абсолютного --slack-ms.
+
+Запуск: python -m benchmarks.bench_shadow_latency --requests 5000 --rps 2000
+"""
+import argparse
+import asyncio
+import gc
+import statistics
+import sys
+import time
+import numpy as np
+
+from model import train_model
+from models.schemas import Item
+from services.prediction import PredictionService
+from services.shadow import ShadowEvaluator
+
+
+def train_shadow_model():
+    """Кандидат, отличающийся от основной модели: другая регуляризация и другая выборка."""
+    from sklearn.linear_model import LogisticRegression
+
+    rng = np.random.default_rng(7)
+    X = rng.random((1000, 4))
+    y = ((X[:, 0] < 0.35) & (X[:, 1] < 0.25)).astype(int)
+    return LogisticRegression(C=0.5).fit(X, y)
+
+
+def make_items(n: int) -> list[Item]:
+    rng = np.random.default_rng(0)
+    return [
+        Item(
+            item_id=i + 1, seller_id=1, name="Item", description="x" * int(rng.integers(0, 1000)),
+            category=int(rng.integers(1, 100)), images_qty=int(rng.integers(0, 10)),
+            is_verified_seller=bool(rng.integers(0, 2)),
+        )
+        for i in range(n)
+    ]
+
+
+async def run_load(service: PredictionService, items: list[Item], rps: float) -> list[float]:
+    latencies: list[float] = []
+
+    async def request(item: Item):
+        start = time.perf_counter()
+        await service.predict_async(item)
+        latencies.append(time.perf_counter() - start)
+
+    loop = asyncio.get_running_loop()
+    started_at = loop.time()
+    tasks = []
+    for i, item in enumerate(items):
+        delay = started_at + i / rps - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(request(item)))
+    await asyncio.gather(*tasks)
+    return latencies
+
+
+async def measure(model, shadow_model, sample_rate: float | None, items, rps) -> tuple[float, float]:
+    # Полная сборка мусора по куче с sklearn занимает десятки миллисекунд и попадает в случайный
+    # прогон; замораживаем уже созданные объекты, чтобы сравнивать только работу теневой модели
+    gc.collect()
+    gc.freeze()
+    service = PredictionService(model)
+    service.start_executor(mode="thread", max_queue_depth=len(items))
+    shadow = None
+    if sample_rate is not None:
+        shadow = ShadowEvaluator(shadow_model, sample_rate=sample_rate)
+        # Кандидат оценивается общим путем sklearn predict/predict_proba с валидацией входа,
+        # а не быстрым скалярным произведением основной модели, то есть заведомо медленнее нее
+        shadow.service.scorer = None
+        await shadow.start()
+        service.shadow = shadow
+    try:
+        latencies = await run_load(service, items, rps)
+    finally:
+        service.stop_executor()
+        if shadow is not None:
+            await shadow.stop()
+    return float(np.percentile(latencies, 50)), float(np.percentile(latencies, 99))
+
+
+async def main_async(args) -> int:
+    model = train_model()
+    shadow_model = train_shadow_model()
+    items = make_items(args.requests)
+    configs = {"baseline": None, **{f"shadow {rate:g}": rate for rate in args.sample_rates}}
+
+    # Прогрев пула потоков и кэшей
+    await measure(model, shadow_model, None, items[:200], args.rps)
+
+    results: dict[str, list[tuple[float, float]]] = {name: [] for name in configs}
+    for _ in range(args.rounds):
+        for name, rate in configs.items():
+            results[name].append(await measure(model, shadow_model, rate, items, args.rps))
+
+    baseline_p99 = statistics.median(p99 for _, p99 in results["baseline"])
+    limit = baseline_p99 * (1 + args.tolerance) + args.slack_ms / 1000
+    failed = False
+    print(f"{'config':>14} {'p50, ms':>9} {'p99, ms':>9}")
+    for name, samples in results.items():
+        p50 = statistics.median(s[0] for s in samples) * 1000
+        p99 = statistics.median(s[1] for s in samples) * 1000
+        verdict = ""
+        if name != "baseline" and p99 / 1000 > limit:
+            verdict = "  REGRESSION"
+            failed = True
+        print(f"{name:>14} {p50:>9.3f} {p99:>9.3f}{verdict}")
+    print(f"p99 limit: {limit * 1000:.3f} ms")
+    return 1 if failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--rps", type=float, default=2000, help="Частота поступления запросов")
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--sample-rates", type=float, nargs="+", default=[0.1, 1.0])
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Допустимый относительный рост p99")
+    parser.add_argument("--slack-ms", type=float, default=0.2, help="Допустимый абсолютный рост p99, мс")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Бенчмарк накладных расходов замеров этапов запроса.
+
+1. Стоимость одного StageTimer вне запроса (ContextVar пуст) и внутри запроса.
+2. /simple_predict через ASGI без сети в трех вариантах приложения: без StageTimingMiddleware,
+   с ней и с ней плюс заголовок Server-Timing. Сценарий warm - попадание в кэш, cold - промах
+   (запись в кэш отбрасывается), который проходит все этапы от кэша до сериализации.
+   Варианты чередуются внутри каждого раунда, чтобы дрейф скорости машины делился между ними поровну.
+
+Запуск: python -m benchmarks.bench_stage_timing --requests 2000 --rounds 5
+"""
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+from typing import Any
+
+from fastapi import FastAPI
+import httpx
+
+from app.dependencies import get_current_account
+from app.timing import RequestTimings, StageTimer, StageTimingMiddleware, _current_timings
+from benchmarks.suite import FakeItemRepository, FakeRedisRepository, make_items, percentile_ms
+from model import train_model
+from models.schemas import Account
+from repositories.cache import NegativeCache, SoftTtlCache
+from routes.predictions import router as predictions_router
+from services.prediction import PredictionService
+from services.singleflight import SingleFlight
+
+VARIANTS = {
+    "off": None,
+    "metrics": False,
+    "metrics+header": True,
+}
+
+
+class DroppingRedisRepository(FakeRedisRepository):
+    """Не сохраняет записи, поэтому каждый запрос - промах кэша."""
+    async def set(self, key: str, value: Any, ttl: int):
+        pass
+
+
+def timer_cost_ns(iterations: int) -> tuple[float, float]:
+    def measure() -> float:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            with StageTimer("db"):
+                pass
+        return (time.perf_counter() - start) / iterations * 1e9
+
+    idle = measure()
+    token = _current_timings.set(RequestTimings())
+    try:
+        active = measure()
+    finally:
+        _current_timings.reset(token)
+    return idle, active
+
+
+def build_app(service: PredictionService, items: list, redis_repository, server_timing_header: bool | None) -> FastAPI:
+    app = FastAPI()
+    app.include_router(predictions_router)
+    if server_timing_header is not None:
+        app.add_middleware(StageTimingMiddleware, server_timing_header=server_timing_header)
+    app.state.prediction_service = service
+    app.state.item_repository = FakeItemRepository(items)
+    app.state.singleflight = SingleFlight()
+    app.state.prediction_cache = SoftTtlCache(redis_repository)
+    app.state.negative_cache = NegativeCache(redis_repository)
+    app.dependency_overrides[get_current_account] = lambda: Account(id=1, login="bench")
+    return app
+
+
+async def measure_requests(client: httpx.AsyncClient, items: list, requests: int) -> list[float]:
+    durations = []
+    for i in range(requests):
+        start = time.perf_counter()
+        response = await client.post("/simple_predict", params={"item_id": items[i % len(items)].item_id})
+        durations.append(time.perf_counter() - start)
+        response.raise_for_status()
+    return durations
+
+
+async def main_async(args):
+    logging.disable(logging.INFO)
+    idle, active = timer_cost_ns(args.timer_iterations)
+    print(f"StageTimer: вне запроса {idle:.0f} нс, внутри запроса {active:.0f} нс")
+
+    service = PredictionService(train_model())
+    items = make_items(100)
+    for scenario in ("warm", "cold"):
+        if scenario == "warm":
+            redis_repository = FakeRedisRepository()
+            for item in items:
+                await redis_repository.set(service.cache_key(item.item_id), service.predict(item), ttl=3600)
+        else:
+            redis_repository = DroppingRedisRepository()
+
+        clients = {
+            name: httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=build_app(service, items, redis_repository, header)),
+                base_url="http://bench",
+            )
+            for name, header in VARIANTS.items()
+        }
+        samples: dict[str, list[list[float]]] = {name: [] for name in VARIANTS}
+        try:
+            for client in clients.values():
+                await measure_requests(client, items, args.requests // 10)
+            for _ in range(args.rounds):
+                for name, client in clients.items():
+                    samples[name].append(await measure_requests(client, items, args.requests))
+        finally:
+            for client in clients.values():
+                await client.aclose()
+
+        print(f"\n/simple_predict {scenario}, медиана по {args.rounds} раундам из {args.requests} запросов")
+        print(f"{'variant':>16} {'p50, ms':>9} {'p99, ms':>9} {'overhead p50':>13}")
+        base_p50 = statistics.median(percentile_ms(r, 50) for r in samples["off"])
+        for name, rounds in samples.items():
+            p50 = statistics.median(percentile_ms(r, 50) for r in rounds)
+            p99 = statistics.median(percentile_ms(r, 99) for r in rounds)
+            print(f"{name:>16} {p50:>9.4f} {p99:>9.4f} {(p50 / base_p50 - 1) * 100:>12.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--timer-iterations", type=int, default=200000)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""
+Набор микробенчмарков инференса с проверкой на регрессию.
+
+Прогоняет горячие пути на синтетических Item и фейковых репозиториях без Postgres и Redis.
+Сервис предсказаний собирается так же, как в приложении (build_prediction_service: исполнитель
+инференса и микробатчинг по переменным окружения), поэтому замеряется путь, по которому идут маршруты:
+- predict_async: PredictionService.predict_async для одного объявления через исполнитель;
+- feature_transform: PredictionService.build_features для одного объявления;
+- feature_matrix_100: PredictionService.build_feature_matrix для 100 объявлений;
+- simple_predict_cold: PredictionService.simple_predict с чтением признаков из репозитория;
+- simple_predict_warm: маршрут /simple_predict, результат которого уже лежит в кэше.
+
+Для каждого случая считаются ops/sec, p50 и p99 одной операции (медиана по --rounds раундам).
+Результаты пишутся в JSON (--output) и сравниваются с сохраненным базовым файлом (--baseline):
+код возврата 1, если ops/sec упали больше --tolerance или p50 выросли больше --p50-tolerance.
+p99 операций в десятки микросекунд определяется шумом планировщика, поэтому по умолчанию он только
+печатается; проверка по нему включается явным --p99-tolerance.
+Раунды всех случаев чередуются. Если калибровочная нагрузка отличается от базовой больше чем
+в MACHINE_CHANGE_THRESHOLD раз (другая машина), базовые значения поправляются на эту разницу.
+Базовый файл зависит от железа и обновляется флагом --update-baseline на той машине,
+где запускается проверка.
+
+Запуск: python -m benchmarks.suite
+"""
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable
+import numpy as np
+
+from model import train_model
+from models.schemas import Item
+
+BENCHMARKS_DIR = Path(__file__).parent
+DEFAULT_BASELINE = BENCHMARKS_DIR / "baseline.json"
+DEFAULT_OUTPUT = BENCHMARKS_DIR / "results" / "latest.json"
+CALIBRATION_CASE = "calibration"
+# Во сколько раз калибровка должна отличаться от базовой, чтобы считать машину другой. Между прогонами
+# на одной машине она плавает на 15-25%, и поправка на такие колебания только добавляла бы шум
+MACHINE_CHANGE_THRESHOLD = 1.5
+
+
+def make_items(n: int, seed: int = 0) -> list[Item]:
+    rng = np.random.default_rng(seed)
+    return [
+        Item(
+            item_id=i + 1, seller_id=int(rng.integers(1, 1000)), name=f"Item {i}",
+            description="x" * int(rng.integers(0, 1000)), category=int(rng.integers(1, 100)),
+            images_qty=int(rng.integers(0, 10)), is_verified_seller=bool(rng.integers(0, 2)),
+        )
+        for i in range(n)
+    ]
+
+
+class FakeItemRepository:
+    """Отдает признаки объявлений из памяти в формате ItemRepository.get_item_features."""
+    def __init__(self, items: list[Item]):
+        self._records = {
+            item.item_id: {
+                "item_id": item.item_id,
+                "is_verified_seller": item.is_verified_seller,
+                "images_qty": item.images_qty,
+                "description_length": len(item.description),
+                "category": item.category,
+            }
+            for item in items
+        }
+
+    async def get_item_features(self, item_id: int):
+        return self._records.get(item_id)
+
+
+class FakeRedisRepository:
+    """Хранит значения в памяти в JSON, как RedisRepository, но без сетевого обмена."""
+    def __init__(self):
+        self._data: dict[str, str] = {}
+
+    async def get(self, key: str) -> Any:
+        value = self._data.get(key)
+        return json.loads(value) if value else None
+
+    async def get_with_ttl(self, key: str) -> tuple[Any, None]:
+        return await self.get(key), None
+
+    async def set(self, key: str, value: Any, ttl: int):
+        self._data[key] = json.dumps(value)
+
+    async def set_unless(self, key: str, value: Any, ttl: int, guard: str) -> bool:
+        if guard in self._data:
+            return False
+        await self.set(key, value, ttl)
+        return True
+
+    async def delete(self, key: str):
+        self._data.pop(key, None)
+
+
+def percentile_ms(durations: list[float], q: float) -> float:
+    return float(np.percentile(durations, q)) * 1000
+
+
+def summarize(rounds: list[list[float]]) -> dict:
+    """Медиана метрик по раундам: один прогон легко искажается шумом планировщика."""
+    stats = [
+        (len(durations) / sum(durations), percentile_ms(durations, 50), percentile_ms(durations, 99))
+        for durations in rounds
+    ]
+    return {
+        "ops_per_sec": float(np.median([s[0] for s in stats])),
+        "p50_ms": float(np.median([s[1] for s in stats])),
+        "p99_ms": float(np.median([s[2] for s in stats])),
+        "iterations": sum(len(durations) for durations in rounds),
+    }
+
+
+class Case:
+    """Один замеряемый случай: func(i) - синхронная функция или корутина, iterations - операций в раунде."""
+    def __init__(self, func: Callable[[int], Any], iterations: int, is_async: bool = False):
+        self.func = func
+        self.iterations = iterations
+        self.is_async = is_async
+
+    async def call(self, i: int):
+        result = self.func(i)
+        if self.is_async:
+            await result
+
+    async def measure(self) -> list[float]:
+        durations = []
+        if self.is_async:
+            for i in range(self.iterations):
+                start = time.perf_counter()
+                await self.func(i)
+                durations.append(time.perf_counter() - start)
+        else:
+            for i in range(self.iterations):
+                start = time.perf_counter()
+                self.func(i)
+                durations.append(time.perf_counter() - start)
+        return durations
+
+
+async def run_interleaved(cases: dict[str, Case], warmup: int, rounds: int) -> dict[str, dict]:
+    """
+    Прогоняет случаи раундами по очереди: раунд каждого случая, включая калибровку, затем следующий.
+    Так дрейф скорости машины за прогон делится между всеми случаями поровну и не искажает их
+    отношение к калибровке.
+    """
+    for case in cases.values():
+        for i in range(warmup):
+            await case.call(i)
+    samples: dict[str, list[list[float]]] = {name: [] for name in cases}
+    for _ in range(rounds):
+        for name, case in cases.items():
+            samples[name].append(await case.measure())
+    return {name: summarize(rounds_) for name, rounds_ in samples.items()}
+
+
+def calibration_workload(i: int):
+    """Фиксированная смесь интерпретатора и мелких операций numpy, как на горячих путях сервиса."""
+    values = [float(j) for j in range(50)]
+    array = np.asarray(values)
+    return sum(values) + float(np.dot(array, array))
+
+
+async def run_suite(iterations: int, warmup: int, rounds: int) -> dict[str, dict]:
+    import httpx
+    from main import app, build_prediction_service
+    from app.dependencies import get_current_account
+    from models.schemas import Account
+    from services.prediction import PredictionService
+    from repositories.cache import NegativeCache, SoftTtlCache
+
+    model = train_model()
+    service = await build_prediction_service(model)
+    items = make_items(1000)
+    batch = items[:100]
+    item_repository = FakeItemRepository(items)
+    redis_repository = FakeRedisRepository()
+
+    # Маршрут вызывается через ASGI без сети; lifespan не запускается, состояние задается вручную
+    app.state.prediction_service = service
+    app.state.item_repository = item_repository
+    app.state.redis_repository = redis_repository
+    app.state.prediction_cache = SoftTtlCache(redis_repository)
+    app.state.negative_cache = NegativeCache(redis_repository)
+    app.dependency_overrides[get_current_account] = lambda: Account(id=1, login="bench")
+    for item in items:
+        await redis_repository.set(service.cache_key(item.item_id), service.predict(item), ttl=3600)
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            async def simple_predict_warm(i: int):
+                response = await client.post("/simple_predict", params={"item_id": items[i % len(items)].item_id})
+                response.raise_for_status()
+
+            cases = {
+                # Скорость машины в этом прогоне: по ней базовые значения пересчитываются при сравнении
+                CALIBRATION_CASE: Case(calibration_workload, iterations),
+                "predict_async": Case(
+                    lambda i: service.predict_async(items[i % len(items)]), iterations, is_async=True
+                ),
+                "feature_transform": Case(
+                    lambda i: PredictionService.build_features(items[i % len(items)]), iterations
+                ),
+                "feature_matrix_100": Case(
+                    lambda i: PredictionService.build_feature_matrix(batch), max(1, iterations // 10)
+                ),
+                "simple_predict_cold": Case(
+                    lambda i: service.simple_predict(items[i % len(items)].item_id, item_repository),
+                    iterations, is_async=True,
+                ),
+                "simple_predict_warm": Case(simple_predict_warm, iterations, is_async=True),
+            }
+            return await run_interleaved(cases, warmup, rounds)
+    finally:
+        app.dependency_overrides.pop(get_current_account, None)
+        await service.stop()
+
+
+def compare(
+    results: dict[str, dict], baseline: dict[str, dict], tolerance: float, p50_tolerance: float,
+    p99_tolerance: float | None = None,
+) -> list[str]:
+    """
+    Возвращает описания регрессий относительно базовых результатов: ops/sec и p50 - медианы
+    по раундам и устойчивы к одиночным паузам, p99 проверяется, только если задан p99_tolerance.
+    Если калибровочная нагрузка в текущем и базовом прогонах отличается больше чем
+    в MACHINE_CHANGE_THRESHOLD раз, базовые значения масштабируются на это отношение, чтобы
+    другая машина не выдавалась за регрессию; меньшие отличия считаются шумом.
+    """
+    speed = 1.0
+    if CALIBRATION_CASE in results and CALIBRATION_CASE in baseline:
+        ratio = results[CALIBRATION_CASE]["ops_per_sec"] / baseline[CALIBRATION_CASE]["ops_per_sec"]
+        if not 1 / MACHINE_CHANGE_THRESHOLD <= ratio <= MACHINE_CHANGE_THRESHOLD:
+            speed = ratio
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base is None or name == CALIBRATION_CASE:
+            continue
+        expected_ops = base["ops_per_sec"] * speed
+        expected_p50 = base["p50_ms"] / speed
+        expected_p99 = base["p99_ms"] / speed
+        if current["ops_per_sec"] < expected_ops * (1 - tolerance):
+            regressions.append(
+                f"{name}: ops/sec {current['ops_per_sec']:.0f} < {expected_ops:.0f} (-{tolerance:.0%})"
+            )
+        if current["p50_ms"] > expected_p50 * (1 + p50_tolerance):
+            regressions.append(
+                f"{name}: p50 {current['p50_ms']:.4f} ms > {expected_p50:.4f} ms (+{p50_tolerance:.0%})"
+            )
+        if p99_tolerance is not None and current["p99_ms"] > expected_p99 * (1 + p99_tolerance):
+            regressions.append(
+                f"{name}: p99 {current['p99_ms']:.4f} ms > {expected_p99:.4f} ms (+{p99_tolerance:.0%})"
+            )
+    return regressions
+
+
+def write_json(path: Path, results: dict[str, dict]):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+    path.write_text(json.dumps(payload, indent=2, sort_keys=True) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=5000, help="Операций в одном раунде")
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Допустимое относительное падение ops/sec")
+    parser.add_argument("--p50-tolerance", type=float, default=0.25, help="Допустимый относительный рост p50")
+    parser.add_argument("--p99-tolerance", type=float, default=None,
+                        help="Допустимый относительный рост p99 (по умолчанию p99 не проверяется)")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT)
+    parser.add_argument("--update-baseline", action="store_true", help="Сохранить результаты как базовые")
+    args = parser.parse_args()
+
+    # Логи уровня INFO пишутся на каждый запрос и измеряли бы скорость терминала, а не кода
+    logging.disable(logging.INFO)
+    results = asyncio.run(run_suite(args.iterations, args.warmup, args.rounds))
+    write_json(args.output, results)
+
+    print(f"{'case':>20} {'ops/sec':>12} {'p50, ms':>9} {'p99, ms':>9}")
+    for name, r in results.items():
+        print(f"{name:>20} {r['ops_per_sec']:>12.0f} {r['p50_ms']:>9.4f} {r['p99_ms']:>9.4f}")
+
+    if args.update_baseline:
+        write_json(args.baseline, results)
+        print(f"Базовые результаты сохранены в {args.baseline}")
+        return
+    if not args.baseline.exists():
+        print(f"Базовый файл {args.baseline} не найден, сравнение пропущено")
+        return
+    baseline = json.loads(args.baseline.read_text())["results"]
+    regressions = compare(results, baseline, args.tolerance, args.p50_tolerance, args.p99_tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
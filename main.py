@@ -3,13 +3,18 @@ import asyncio
 import sys
 import os
 from contextlib import asynccontextmanager
-import asyncpg
 from fastapi import FastAPI, Request, status
 from fastapi.responses import JSONResponse
 from prometheus_fastapi_instrumentator import Instrumentator
 
 from services.prediction import PredictionService
-from model import get_model
+from services.model_manager import ModelManager
+from services.shadow import ShadowEvaluator
+from services.singleflight import SingleFlight
+from services.invalidation import InvalidationBus
+from services.prewarm import CachePrewarmer
+from services.passwords import PasswordHasher
+from model import load_model_from_uri
 from routes.predictions import router as predictions_router
 from routes.management import router as management_router
 from routes.auth import router as auth_router
@@ -17,8 +22,14 @@ from repositories.items import ItemRepository
 from repositories.users import UserRepository
 from repositories.moderation_results import ModerationResultRepository
 from repositories.redis_repository import RedisRepository
-from repositories.accounts import AccountRepository
+from repositories.cache import CachedRedisRepository, L1Cache, NegativeCache, SoftTtlCache, parse_prefix_ttls
+from repositories.codecs import get_codec
+from repositories.accounts import AccountRepository, CachedAccountRepository
+from repositories.revoked_accounts import MemoryRevokedAccounts, RedisRevokedAccounts
+from app.dependencies import AUTH_MODE
+from app.clients.postgres import create_pool
 from app.clients.kafka import KafkaProducerClient # Импортируем Kafka Producer
+from app.timing import StageTimingMiddleware
 
 # Решение для известной проблемы с asyncio и Docker в Windows
 if sys.platform == "win32":
@@ -46,13 +57,108 @@ KAFKA_BOOTSTRAP_SERVERS = os.getenv(
 
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+# Формат значений в Redis: json или binary (компактные записи). Оба кодека читают оба формата, но версии
+# без кодеков бинарные записи не читают: binary включается настройкой, когда кодеки есть на всех репликах
+CACHE_CODEC = os.getenv("CACHE_CODEC", "json")
+
+# Микробатчинг предсказаний: конкурентные запросы объединяются в один вызов модели
+PREDICTION_BATCHING_ENABLED = os.getenv("PREDICTION_BATCHING_ENABLED", "false").lower() == "true"
+PREDICTION_BATCH_MAX_SIZE = int(os.getenv("PREDICTION_BATCH_MAX_SIZE", 32))
+PREDICTION_BATCH_MAX_WAIT_MS = float(os.getenv("PREDICTION_BATCH_MAX_WAIT_MS", 5))
+
+# Исполнитель инференса: inline (в цикле событий), thread или process
+INFERENCE_EXECUTOR = os.getenv("INFERENCE_EXECUTOR", "thread")
+INFERENCE_EXECUTOR_WORKERS = int(os.getenv("INFERENCE_EXECUTOR_WORKERS", 0)) or None
+INFERENCE_EXECUTOR_MAX_QUEUE = int(os.getenv("INFERENCE_EXECUTOR_MAX_QUEUE", 64))
+
+# Как часто проверять появление новой версии модели (0 - не проверять)
+MODEL_WATCH_INTERVAL_SECONDS = float(os.getenv("MODEL_WATCH_INTERVAL_SECONDS", 30))
+
+# Теневая модель: models:/<name>/<stage> в MLflow или путь к .npz/.pkl. Пустое значение отключает.
+SHADOW_MODEL_URI = os.getenv("SHADOW_MODEL_URI", "")
+SHADOW_SAMPLE_RATE = float(os.getenv("SHADOW_SAMPLE_RATE", 0.1))
+SHADOW_MAX_QUEUE = int(os.getenv("SHADOW_MAX_QUEUE", 1000))
+
+# L1-кэш в памяти процесса перед Redis. В L1 попадают только ключи с перечисленными префиксами.
+CACHE_L1_ENABLED = os.getenv("CACHE_L1_ENABLED", "true").lower() == "true"
+CACHE_L1_MAX_ENTRIES = int(os.getenv("CACHE_L1_MAX_ENTRIES", 10000))
+CACHE_L1_MAX_BYTES = int(os.getenv("CACHE_L1_MAX_BYTES", 16 * 1024 * 1024))
+CACHE_L1_PREFIX_TTLS = parse_prefix_ttls(
+    os.getenv("CACHE_L1_PREFIX_TTLS", "prediction:=30,moderation_result:=300")
+)
+
+# Схлопывание одновременных промахов кэша предсказаний; distributed - еще и между репликами через Redis
+SINGLEFLIGHT_DISTRIBUTED = os.getenv("SINGLEFLIGHT_DISTRIBUTED", "false").lower() == "true"
+SINGLEFLIGHT_LOCK_TTL_SECONDS = float(os.getenv("SINGLEFLIGHT_LOCK_TTL_SECONDS", 5))
+
+# Срок жизни кэша предсказаний: последние STALE_SECONDS до истечения запись отдается
+# устаревшей и обновляется в фоне; JITTER - доля, на которую случайно сокращается TTL
+PREDICTION_CACHE_TTL_SECONDS = int(os.getenv("PREDICTION_CACHE_TTL_SECONDS", 3600))
+PREDICTION_CACHE_STALE_SECONDS = float(os.getenv("PREDICTION_CACHE_STALE_SECONDS", 600))
+PREDICTION_CACHE_TTL_JITTER = float(os.getenv("PREDICTION_CACHE_TTL_JITTER", 0.1))
+
+# Потоки для хэширования паролей scrypt: столько входов считается одновременно, остальные ждут очереди
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+
+# Кэш аккаунтов для проверки токена; block_account и delete_account сбрасывают его сразу (0 - без кэша)
+ACCOUNT_CACHE_TTL_SECONDS = float(os.getenv("ACCOUNT_CACHE_TTL_SECONDS", 30))
+
+# Где хранить id заблокированных и удаленных аккаунтов для AUTH_MODE=stateless:
+# redis - общее множество всех реплик, memory - память процесса (локальный запуск с одной репликой)
+AUTH_REVOKED_ACCOUNTS_BACKEND = os.getenv("AUTH_REVOKED_ACCOUNTS_BACKEND", "redis")
+
+# Замеры этапов запроса (auth, кэш, БД, признаки, инференс, сериализация) в request_stage_duration_seconds;
+# SERVER_TIMING_HEADER_ENABLED дополнительно отдает их клиенту в заголовке Server-Timing
+REQUEST_STAGE_TIMING_ENABLED = os.getenv("REQUEST_STAGE_TIMING_ENABLED", "true").lower() == "true"
+SERVER_TIMING_HEADER_ENABLED = os.getenv("SERVER_TIMING_HEADER_ENABLED", "false").lower() == "true"
+
+# Сколько секунд помнить, что объявление не найдено или закрыто (0 - не помнить)
+NEGATIVE_CACHE_TTL_SECONDS = int(os.getenv("NEGATIVE_CACHE_TTL_SECONDS", 60))
+
+# Прогрев кэша предсказаний для открытых объявлений; on_startup - сразу после загрузки модели
+CACHE_PREWARM_ON_STARTUP = os.getenv("CACHE_PREWARM_ON_STARTUP", "false").lower() == "true"
+CACHE_PREWARM_CHUNK_SIZE = int(os.getenv("CACHE_PREWARM_CHUNK_SIZE", 500))
+CACHE_PREWARM_MAX_ITEMS_PER_SECOND = float(os.getenv("CACHE_PREWARM_MAX_ITEMS_PER_SECOND", 1000))
+
+
+async def build_prediction_service(model) -> PredictionService:
+    """Создает сервис предсказаний с исполнителем и микробатчингом согласно конфигурации."""
+    service = PredictionService(model)
+    service.start_executor(
+        mode=INFERENCE_EXECUTOR,
+        max_workers=INFERENCE_EXECUTOR_WORKERS,
+        max_queue_depth=INFERENCE_EXECUTOR_MAX_QUEUE,
+    )
+    if PREDICTION_BATCHING_ENABLED:
+        await service.start_batching(
+            max_batch_size=PREDICTION_BATCH_MAX_SIZE,
+            max_wait_ms=PREDICTION_BATCH_MAX_WAIT_MS,
+        )
+        logger.info(
+            f"Микробатчинг включен: max_batch_size={PREDICTION_BATCH_MAX_SIZE}, "
+            f"max_wait_ms={PREDICTION_BATCH_MAX_WAIT_MS}"
+        )
+    # Теневая модель общая для всех версий основной и переживает их подмену
+    service.shadow = getattr(app.state, "shadow_evaluator", None)
+    return service
+
+
+async def invalidate_cached_predictions(version: str | None):
+    """
+    Записи прежней модели в Redis после смены не читаются: ключ prediction:{cache_tag}:{item_id}
+    содержит отпечаток модели. Из L1 всех реплик они удаляются, чтобы не занимать место до истечения.
+    """
+    if app.state.invalidation_bus is not None:
+        app.state.redis_repository.l1.delete_prefix("prediction:")
+        await app.state.invalidation_bus.publish(prefixes=["prediction:"])
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Код при старте приложения
     logger.info(f"Подключаемся к базе данных по адресу: {DATABASE_URL.split('@')[-1]}")
     try:
-        pool = await asyncpg.create_pool(DATABASE_URL)
+        pool = await create_pool(DATABASE_URL, name="moderation_service")
         app.state.pool = pool
         logger.info("Пул соединений с базой данных успешно создан.")
     except Exception as e:
@@ -64,8 +170,55 @@ async def lifespan(app: FastAPI):
     app.state.item_repository = ItemRepository(app.state.pool)
     app.state.user_repository = UserRepository(app.state.pool)
     app.state.moderation_result_repository = ModerationResultRepository(app.state.pool)
-    app.state.redis_repository = RedisRepository(host=REDIS_HOST, port=REDIS_PORT)
-    app.state.account_repository = AccountRepository(app.state.pool)
+    redis_repository = RedisRepository(host=REDIS_HOST, port=REDIS_PORT, codec=get_codec(CACHE_CODEC))
+    app.state.redis_repository = redis_repository
+    # Шина инвалидаций сбрасывает L1 всех реплик при удалении ключей и смене модели
+    app.state.invalidation_bus = None
+    if CACHE_L1_ENABLED:
+        l1_cache = L1Cache(max_entries=CACHE_L1_MAX_ENTRIES, max_bytes=CACHE_L1_MAX_BYTES)
+        app.state.invalidation_bus = InvalidationBus(app.state.redis_repository.client, l1_cache)
+        await app.state.invalidation_bus.start()
+        app.state.redis_repository = CachedRedisRepository(
+            app.state.redis_repository, l1_cache, CACHE_L1_PREFIX_TTLS, bus=app.state.invalidation_bus
+        )
+    app.state.singleflight = SingleFlight(
+        redis_client=app.state.redis_repository.client if SINGLEFLIGHT_DISTRIBUTED else None,
+        lock_ttl=SINGLEFLIGHT_LOCK_TTL_SECONDS,
+    )
+    app.state.prediction_cache = SoftTtlCache(
+        app.state.redis_repository,
+        ttl=PREDICTION_CACHE_TTL_SECONDS,
+        stale_seconds=PREDICTION_CACHE_STALE_SECONDS,
+        ttl_jitter=PREDICTION_CACHE_TTL_JITTER,
+        singleflight=app.state.singleflight,
+    )
+    app.state.negative_cache = NegativeCache(app.state.redis_repository, ttl=NEGATIVE_CACHE_TTL_SECONDS)
+    app.state.password_hasher = PasswordHasher(max_workers=PASSWORD_HASH_WORKERS)
+    # Множество ведется в любом режиме, чтобы реплики в режиме stateless видели блокировки с остальных
+    if AUTH_REVOKED_ACCOUNTS_BACKEND == "memory":
+        app.state.revoked_accounts = MemoryRevokedAccounts()
+    else:
+        app.state.revoked_accounts = RedisRevokedAccounts(app.state.redis_repository.client)
+    app.state.account_repository = AccountRepository(
+        app.state.pool, hasher=app.state.password_hasher, revoked_accounts=app.state.revoked_accounts
+    )
+    try:
+        revoked = await app.state.account_repository.sync_revoked_accounts()
+        logger.info(f"Множество отозванных аккаунтов синхронизировано с БД: {revoked} заблокированных.")
+    except Exception as e:
+        # Без синхронизации stateless-проверка пропустила бы заблокированные аккаунты
+        if AUTH_MODE == "stateless":
+            raise
+        logger.warning(f"Не удалось синхронизировать множество отозванных аккаунтов: {e}")
+    if ACCOUNT_CACHE_TTL_SECONDS > 0:
+        # Аккаунты кэшируются в том же L1, что и Redis, чтобы шина инвалидаций сбрасывала их на всех репликах
+        account_l1 = (
+            app.state.redis_repository.l1 if app.state.invalidation_bus is not None
+            else L1Cache(max_entries=CACHE_L1_MAX_ENTRIES, max_bytes=CACHE_L1_MAX_BYTES)
+        )
+        app.state.account_repository = CachedAccountRepository(
+            app.state.account_repository, account_l1, ttl=ACCOUNT_CACHE_TTL_SECONDS, bus=app.state.invalidation_bus
+        )
 
     # Инициализируем и запускаем Kafka Producer
     app.state.kafka_producer = KafkaProducerClient(KAFKA_BOOTSTRAP_SERVERS)
@@ -76,32 +229,76 @@ async def lifespan(app: FastAPI):
         app.state.kafka_producer = None
         raise
 
-    # Загрузка ML-модели
+    # Теневая модель для сравнения с основной на живом трафике
+    app.state.shadow_evaluator = None
+    if SHADOW_MODEL_URI:
+        try:
+            shadow_model = await asyncio.to_thread(load_model_from_uri, SHADOW_MODEL_URI)
+            if shadow_model is None:
+                raise RuntimeError(f"модель {SHADOW_MODEL_URI} не найдена")
+            app.state.shadow_evaluator = ShadowEvaluator(
+                shadow_model, sample_rate=SHADOW_SAMPLE_RATE, max_queue=SHADOW_MAX_QUEUE
+            )
+            await app.state.shadow_evaluator.start()
+        except Exception as e:
+            logger.error(f"Не удалось загрузить теневую модель: {e}")
+            app.state.shadow_evaluator = None
+
+    # Загрузка ML-модели через менеджер версий, который умеет подменять ее без рестарта
+    app.state.prediction_service = None
+    app.state.model_manager = ModelManager(
+        app.state, build_prediction_service, poll_interval=MODEL_WATCH_INTERVAL_SECONDS,
+        on_swap=invalidate_cached_predictions,
+    )
     try:
-        model = get_model()
-        app.state.prediction_service = PredictionService(model)
+        await app.state.model_manager.reload()
         logger.info("Модель успешно загружена.")
     except Exception as e:
         logger.error(f"Не удалось загрузить модель: {e}")
         app.state.prediction_service = None
-    
+    app.state.model_manager.start_watching()
+
+    # Прогрев пишет в Redis мимо L1, чтобы не вытеснять из него горячие ключи
+    app.state.cache_prewarmer = CachePrewarmer(
+        app.state.item_repository,
+        redis_repository,
+        lambda: app.state.prediction_service,
+        chunk_size=CACHE_PREWARM_CHUNK_SIZE,
+        ttl=PREDICTION_CACHE_TTL_SECONDS,
+        ttl_jitter=PREDICTION_CACHE_TTL_JITTER,
+        max_items_per_second=CACHE_PREWARM_MAX_ITEMS_PER_SECOND,
+    )
+    if CACHE_PREWARM_ON_STARTUP and app.state.prediction_service is not None:
+        app.state.cache_prewarmer.start()
+
     yield
 
     # Код при выключении приложения
+    # Прогрев читает из БД, поэтому останавливается до закрытия пула
+    await app.state.cache_prewarmer.stop()
+    await app.state.prediction_cache.stop()
     if app.state.pool:
         await app.state.pool.close()
         logger.info("Пул соединений с базой данных закрыт.")
     
     if app.state.kafka_producer:
         await app.state.kafka_producer.stop()
-    
+
+    await app.state.model_manager.stop()
     app.state.prediction_service = None
+    if app.state.shadow_evaluator:
+        await app.state.shadow_evaluator.stop()
+    if app.state.invalidation_bus:
+        await app.state.invalidation_bus.stop()
+    app.state.password_hasher.shutdown()
     logger.info("Сервис выключается.")
 
 
 app = FastAPI(lifespan=lifespan)
 
 Instrumentator().instrument(app).expose(app)
+if REQUEST_STAGE_TIMING_ENABLED:
+    app.add_middleware(StageTimingMiddleware, server_timing_header=SERVER_TIMING_HEADER_ENABLED)
 
 # Подключение роутеров
 app.include_router(predictions_router)
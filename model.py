@@ -1,8 +1,14 @@
 import os
+import sys
+import json
 import pickle
+import shutil
+import hashlib
 import logging
+import tempfile
+import importlib.util
+from datetime import datetime, timezone
 import numpy as np
-from sklearn.linear_model import LogisticRegression
 
 # Настройка логирования для этого модуля
 logger = logging.getLogger("moderation_service")
@@ -12,19 +18,71 @@ MLFLOW_Tracking_URI = "sqlite:///mlflow.db"
 MLFLOW_EXPERIMENT_NAME = "moderation-experiment"
 MLFLOW_MODEL_NAME = "moderation-model"
 
-# Пробуем импортировать MLflow, чтобы сервис не падал, если библиотека не установлена
-try:
+# Пути к локальным артефактам модели
+MODEL_PICKLE_PATH = "model.pkl"
+MODEL_COMPACT_PATH = "model.npz"
+
+# Спецификация признаков модели: порядок столбцов и делители для нормировки
+FEATURE_COLUMNS = ("is_verified_seller", "images_qty", "description_length", "category")
+FEATURE_SCALE = np.array([1.0, 10.0, 1000.0, 100.0])
+
+# Версия формата компактного артефакта
+COMPACT_FORMAT_VERSION = 1
+
+# Каталог для публикации весов модели, общих для всех процессов узла.
+# /dev/shm - tmpfs в оперативной памяти, файлы в нем отображаются в память без обращения к диску.
+SHARED_MODEL_DIR = os.getenv("MODEL_SHARED_DIR", "/dev/shm/moderation-model")
+# Сколько последних опубликованных версий хранить в SHARED_MODEL_DIR
+SHARED_MODEL_KEEP_VERSIONS = 2
+
+# MLflow импортируется лениво: сам импорт занимает секунды и нужен только при USE_MLFLOW=true.
+# Проверка наличия пакета через find_spec его не импортирует.
+MLFLOW_AVAILABLE = importlib.util.find_spec("mlflow") is not None
+
+
+def _import_mlflow():
     import mlflow
     import mlflow.sklearn
-    from mlflow.tracking import MlflowClient
+    return mlflow
+
+
+class CompactLinearModel:
+    """
+    Бинарная линейная модель, загруженная из компактного артефакта.
+    Повторяет интерфейс LogisticRegression (coef_, intercept_, classes_,
+    predict, predict_proba), но не требует импорта sklearn.
+    """
+    def __init__(self, coef: np.ndarray, intercept: np.ndarray, classes: np.ndarray, metadata: dict | None = None):
+        # asarray и reshape не копируют данные, поэтому отображенные в память веса остаются общими
+        self.coef_ = np.asarray(coef, dtype=float).reshape(1, -1)
+        self.intercept_ = np.asarray(intercept, dtype=float).reshape(1)
+        self.classes_ = np.asarray(classes)
+        self.metadata = metadata or {}
+        # Каталог опубликованных весов, если модель отображена из разделяемой памяти
+        self.shared_path: str | None = None
+
+    def __reduce__(self):
+        # При передаче в другой процесс (например, в пул исполнителя) отображаем те же файлы,
+        # а не сериализуем веса целиком
+        if self.shared_path is not None:
+            return load_shared_model, (self.shared_path,)
+        return CompactLinearModel, (self.coef_, self.intercept_, self.classes_, self.metadata)
 
-    MLFLOW_AVAILABLE = True
-except ImportError:
-    MLFLOW_AVAILABLE = False
+    def decision_function(self, X: np.ndarray) -> np.ndarray:
+        return np.asarray(X, dtype=float) @ self.coef_[0] + self.intercept_[0]
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        positive = np.exp(-np.logaddexp(0.0, -self.decision_function(X)))
+        return np.column_stack([1.0 - positive, positive])
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self.classes_[(self.decision_function(X) > 0).astype(int)]
 
 
 # Обучаем простую модель на синтетических данных
 def train_model():
+    from sklearn.linear_model import LogisticRegression
+
     logger.info("Training new model on synthetic data...")
     np.random.seed(42)
     # Признаки: [is_verified_seller, images_qty, description_length, category]
@@ -40,14 +98,14 @@ def train_model():
 
 
 # Сохраняем модель в локальный файл pickle
-def save_model_local(model, path="model.pkl"):
+def save_model_local(model, path=MODEL_PICKLE_PATH):
     with open(path, "wb") as f:
         pickle.dump(model, f)
     logger.info(f"Model saved locally to {path}")
 
 
 # Загружаем модель из локального файла
-def load_model_local(path="model.pkl"):
+def load_model_local(path=MODEL_PICKLE_PATH):
     if not os.path.exists(path):
         logger.warning(f"Local model file {path} not found.")
         return None
@@ -56,11 +114,168 @@ def load_model_local(path="model.pkl"):
         return pickle.load(f)
 
 
+def is_binary_logistic_model(model) -> bool:
+    """
+    Проверяет, что модель - бинарная логистическая регрессия, вероятность которой
+    считается сигмоидой от линейной функции. Такие модели можно хранить в компактном
+    формате и оценивать без sklearn.
+    """
+    if isinstance(model, CompactLinearModel):
+        return True
+    # Объект sklearn мог появиться только после импорта sklearn, поэтому сами его не импортируем
+    linear_model = sys.modules.get("sklearn.linear_model")
+    if linear_model is None or not isinstance(model, linear_model.LogisticRegression):
+        return False
+    if not hasattr(model, "coef_") or len(model.classes_) != 2:
+        return False
+    # Для multinomial вероятность считается через softmax, а не сигмоиду
+    return getattr(model, "multi_class", "auto") != "multinomial"
+
+
+def _compact_metadata(model) -> dict:
+    return {
+        "format_version": COMPACT_FORMAT_VERSION,
+        "model_type": "binary_logistic_regression",
+        "source_type": model.metadata.get("source_type") if isinstance(model, CompactLinearModel) else type(model).__name__,
+        "feature_columns": list(FEATURE_COLUMNS),
+        "feature_scale": FEATURE_SCALE.tolist(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def _check_compact_metadata(metadata: dict):
+    if metadata.get("format_version") != COMPACT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported compact model format version: {metadata.get('format_version')}")
+    if (tuple(metadata.get("feature_columns", ())) != FEATURE_COLUMNS
+            or not np.allclose(metadata.get("feature_scale", ()), FEATURE_SCALE)):
+        raise ValueError("Compact model feature spec does not match the service feature spec.")
+
+
+# Сохраняем коэффициенты модели и спецификацию признаков в .npz без pickle
+def save_model_compact(model, path=MODEL_COMPACT_PATH, source_version: str | None = None):
+    if not is_binary_logistic_model(model):
+        raise ValueError(f"Model of type {type(model).__name__} cannot be saved in compact format.")
+    metadata = _compact_metadata(model)
+    if source_version is not None:
+        # Версия pickle, из которого получен артефакт: конвертация не должна выглядеть как новая модель
+        metadata["source_version"] = source_version
+    # Пишем во временный файл и переименовываем, чтобы читатели не увидели недописанный артефакт
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(
+            f,
+            coef=np.asarray(model.coef_, dtype=float)[0],
+            intercept=np.asarray(model.intercept_, dtype=float),
+            classes=np.asarray(model.classes_),
+            metadata=np.array(json.dumps(metadata)),
+        )
+    os.replace(tmp_path, path)
+    logger.info(f"Compact model saved to {path}")
+
+
+# Загружаем модель из компактного артефакта
+def load_model_compact(path=MODEL_COMPACT_PATH):
+    if not os.path.exists(path):
+        logger.warning(f"Compact model file {path} not found.")
+        return None
+    with np.load(path, allow_pickle=False) as data:
+        metadata = json.loads(str(data["metadata"]))
+        _check_compact_metadata(metadata)
+        model = CompactLinearModel(data["coef"], data["intercept"], data["classes"], metadata)
+    logger.info(f"Compact model loaded from {path}")
+    return model
+
+
+# Отпечаток модели: совпадает у процессов и реплик с одной и той же моделью и меняется вместе с ней
+def model_digest(model) -> str:
+    if not is_binary_logistic_model(model):
+        return hashlib.sha256(pickle.dumps(model)).hexdigest()[:16]
+    digest = hashlib.sha256()
+    for array in (model.coef_, model.intercept_, model.classes_):
+        array = np.ascontiguousarray(array)
+        digest.update(str(array.dtype).encode())
+        digest.update(str(array.shape).encode())
+        digest.update(array.tobytes())
+    return digest.hexdigest()[:16]
+
+
+def _cleanup_shared_models(directory: str, keep: str):
+    # Удаление безопасно для процессов, уже отобразивших файлы: данные живут, пока открыто отображение
+    versions = [
+        entry for entry in os.scandir(directory)
+        if entry.is_dir() and not entry.name.startswith(".") and entry.path != keep
+    ]
+    versions.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in versions[SHARED_MODEL_KEEP_VERSIONS - 1:]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+
+
+# Публикуем веса модели в каталог, общий для процессов узла. Каталог версии определяется
+# хешем весов, поэтому процессы с одной и той же моделью используют одни и те же файлы.
+def publish_shared_model(model, directory=None) -> str:
+    if not is_binary_logistic_model(model):
+        raise ValueError(f"Model of type {type(model).__name__} cannot be shared.")
+    directory = directory or SHARED_MODEL_DIR
+    path = os.path.join(directory, model_digest(model))
+    if os.path.isdir(path):
+        return path
+
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = tempfile.mkdtemp(dir=directory, prefix=".tmp-")
+    np.save(os.path.join(tmp_path, "coef.npy"), np.asarray(model.coef_, dtype=float)[0])
+    np.save(os.path.join(tmp_path, "intercept.npy"), np.asarray(model.intercept_, dtype=float))
+    np.save(os.path.join(tmp_path, "classes.npy"), np.asarray(model.classes_))
+    with open(os.path.join(tmp_path, "metadata.json"), "w") as f:
+        json.dump(_compact_metadata(model), f)
+    try:
+        # Переименование каталога атомарно: читатели видят либо полную версию, либо никакую
+        os.rename(tmp_path, path)
+        logger.info(f"Model weights published to shared memory: {path}")
+    except OSError:
+        # Ту же версию одновременно опубликовал другой процесс
+        shutil.rmtree(tmp_path, ignore_errors=True)
+    _cleanup_shared_models(directory, keep=path)
+    return path
+
+
+# Отображаем опубликованные веса в память только для чтения, без копирования в процесс
+def load_shared_model(path) -> CompactLinearModel:
+    with open(os.path.join(path, "metadata.json")) as f:
+        metadata = json.load(f)
+    _check_compact_metadata(metadata)
+    model = CompactLinearModel(
+        np.load(os.path.join(path, "coef.npy"), mmap_mode="r"),
+        np.load(os.path.join(path, "intercept.npy"), mmap_mode="r"),
+        np.load(os.path.join(path, "classes.npy"), mmap_mode="r"),
+        metadata,
+    )
+    model.shared_path = path
+    return model
+
+
+def use_shared_model() -> bool:
+    return os.getenv("MODEL_SHARED_MEMORY", "false").lower() == "true"
+
+
+# Заменяем модель процесса на общую отображенную копию весов
+def share_model(model, directory=None):
+    if not is_binary_logistic_model(model):
+        logger.warning(f"Model of type {type(model).__name__} cannot be shared, using private copy.")
+        return model
+    try:
+        return load_shared_model(publish_shared_model(model, directory))
+    except Exception as e:
+        logger.error(f"Failed to share model weights, using private copy: {e}")
+        return model
+
+
 # Регистрируем модель в MLflow, если она еще не зарегистрирована, и переводим последнюю версию в Production
 def setup_mlflow_and_register(model):
     if not MLFLOW_AVAILABLE:
         logger.error("MLflow libraries not installed.")
         return
+    mlflow = _import_mlflow()
+    from mlflow.tracking import MlflowClient
 
     # Настройка окружения
     mlflow.set_tracking_uri(MLFLOW_Tracking_URI)
@@ -93,6 +308,7 @@ def setup_mlflow_and_register(model):
 def load_model_mlflow():
     if not MLFLOW_AVAILABLE:
         raise ImportError("MLflow is not installed.")
+    mlflow = _import_mlflow()
 
     mlflow.set_tracking_uri(MLFLOW_Tracking_URI)
 
@@ -106,9 +322,99 @@ def load_model_mlflow():
         return None
 
 
+# Загружаем модель по явному адресу: models:/<name>/<stage> из MLflow, .npz или pickle-файл.
+# Используется для теневой модели, которая не должна влиять на выбор основной.
+def load_model_from_uri(uri: str):
+    if uri.startswith("models:/"):
+        if not MLFLOW_AVAILABLE:
+            raise ImportError("MLflow is not installed.")
+        mlflow = _import_mlflow()
+        mlflow.set_tracking_uri(MLFLOW_Tracking_URI)
+        logger.info(f"Loading model from MLflow URI: {uri}")
+        return mlflow.sklearn.load_model(uri)
+    if uri.endswith(".npz"):
+        return load_model_compact(uri)
+    return load_model_local(uri)
+
+
+def use_mlflow_enabled() -> bool:
+    return os.getenv("USE_MLFLOW", "false").lower() == "true"
+
+
+def use_compact_artifact() -> bool:
+    return os.getenv("MODEL_ARTIFACT_FORMAT", "compact").lower() == "compact"
+
+
+# Локальный артефакт, из которого будет загружена модель: компактный, если он не старее pickle
+def _local_artifact_path() -> str:
+    if use_compact_artifact() and os.path.exists(MODEL_COMPACT_PATH):
+        if (not os.path.exists(MODEL_PICKLE_PATH)
+                or os.path.getmtime(MODEL_COMPACT_PATH) >= os.path.getmtime(MODEL_PICKLE_PATH)):
+            return MODEL_COMPACT_PATH
+    return MODEL_PICKLE_PATH
+
+
+def _file_version(path) -> str:
+    stat = os.stat(path)
+    return f"file:{os.path.basename(path)}:{stat.st_mtime_ns}:{stat.st_size}"
+
+
+# Версия компактного артефакта, сконвертированного из pickle, - версия этого pickle
+def _compact_source_version(path) -> str | None:
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            return json.loads(str(data["metadata"])).get("source_version")
+    except Exception as e:
+        logger.warning(f"Could not read compact model metadata from {path}: {e}")
+        return None
+
+
+# Возвращает идентификатор версии модели в источнике, не загружая саму модель.
+# Для MLflow это номер версии в стадии Production, для локального файла - время изменения и размер
+# (у model.npz, сконвертированного из model.pkl, - те же, что у исходного pickle).
+def get_model_version():
+    if use_mlflow_enabled():
+        if not MLFLOW_AVAILABLE:
+            return None
+        from mlflow.tracking import MlflowClient
+
+        client = MlflowClient(tracking_uri=MLFLOW_Tracking_URI)
+        versions = client.get_latest_versions(MLFLOW_MODEL_NAME, stages=["Production"])
+        if not versions:
+            return None
+        return f"mlflow:{versions[0].version}"
+
+    path = _local_artifact_path()
+    if not os.path.exists(path):
+        return None
+    if path == MODEL_COMPACT_PATH:
+        return _compact_source_version(path) or _file_version(path)
+    return _file_version(path)
+
+
+def _load_local():
+    path = _local_artifact_path()
+    if path == MODEL_COMPACT_PATH:
+        try:
+            return load_model_compact(path)
+        except Exception as e:
+            logger.error(f"Failed to load compact model, falling back to pickle: {e}")
+
+    # Версию берем до загрузки, чтобы она относилась к тому же файлу, что и модель
+    version = _file_version(MODEL_PICKLE_PATH) if os.path.exists(MODEL_PICKLE_PATH) else None
+    model = load_model_local()
+    # Конвертируем pickle в компактный артефакт, чтобы следующий старт был быстрым
+    if model is not None and use_compact_artifact() and is_binary_logistic_model(model):
+        try:
+            save_model_compact(model, source_version=version)
+        except OSError as e:
+            logger.warning(f"Could not write compact model artifact: {e}")
+    return model
+
+
 # Основная точка входа, проверяет переменную окружения USE_MLFLOW
 def get_model():
-    use_mlflow = os.getenv("USE_MLFLOW", "false").lower() == "true"
+    use_mlflow = use_mlflow_enabled()
 
     if use_mlflow:
         logger.info("USE_MLFLOW=True. Using MLflow registry.")
@@ -122,13 +428,16 @@ def get_model():
             setup_mlflow_and_register(model)
             # После регистрации снова пробуем загрузить через MLflow API для чистоты эксперимента
             model = load_model_mlflow()
-
-        return model
     else:
         logger.info("USE_MLFLOW=False. Using local file storage.")
-        model = load_model_local()
+        model = _load_local()
         if model is None:
             logger.info("Local model not found. Training and saving new one...")
             model = train_model()
             save_model_local(model)
-        return model
+            if use_compact_artifact():
+                save_model_compact(model)
+
+    if model is not None and use_shared_model():
+        model = share_model(model)
+    return model
@@ -12,3 +12,8 @@ class Item(BaseModel):
 class PredictionResponse(BaseModel):
     is_violation: bool
     probability: float
+
+class Account(BaseModel):
+    id: int
+    login: str
+    is_blocked: bool = False
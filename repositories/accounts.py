@@ -1,20 +1,27 @@
-import hashlib
+import asyncio
+import logging
 import time
 from typing import Optional
 from asyncpg.pool import Pool
-from app.metrics import DB_QUERY_DURATION
+from app.metrics import DB_QUERY_DURATION, ACCOUNT_CACHE_REQUESTS_TOTAL
 from models.schemas import Account
+from repositories.cache import L1Cache
+from services.passwords import PasswordHasher
+
+logger = logging.getLogger("moderation_service.accounts")
 
 class AccountRepository:
-    def __init__(self, pool: Pool):
+    def __init__(self, pool: Pool, hasher: PasswordHasher | None = None, revoked_accounts=None):
         self.pool = pool
-
-    @staticmethod
-    def _hash_password(password: str) -> str:
-        return hashlib.md5(password.encode()).hexdigest()
+        # Хэширование паролей выполняется вне цикла событий, в пуле потоков hasher
+        self.hasher = hasher or PasswordHasher()
+        # Множество id заблокированных и удаленных аккаунтов для проверки токена без запроса в БД
+        self.revoked_accounts = revoked_accounts
+        self._dummy_hash: str | None = None
+        self._sync_task: asyncio.Task | None = None
 
     async def create_account(self, login: str, password: str) -> Account:
-        hashed_password = self._hash_password(password)
+        hashed_password = await self.hasher.hash(password)
         query = "INSERT INTO account (login, password) VALUES ($1, $2) RETURNING id, login, is_blocked"
         start_time = time.time()
         async with self.pool.acquire() as conn:
@@ -31,25 +38,160 @@ class AccountRepository:
         return Account(**row) if row else None
 
     async def get_by_login_and_password(self, login: str, password: str) -> Optional[Account]:
-        hashed_password = self._hash_password(password)
-        query = "SELECT id, login, is_blocked FROM account WHERE login = $1 AND password = $2"
+        query = "SELECT id, login, is_blocked, password FROM account WHERE login = $1"
         start_time = time.time()
         async with self.pool.acquire() as conn:
-            row = await conn.fetchrow(query, login, hashed_password)
+            row = await conn.fetchrow(query, login)
         DB_QUERY_DURATION.labels(query_type="select").observe(time.time() - start_time)
-        return Account(**row) if row else None
 
-    async def block_account(self, account_id: int) -> Optional[Account]:
-        query = "UPDATE account SET is_blocked = TRUE WHERE id = $1 RETURNING id, login, is_blocked"
+        if row is None:
+            # Проверяем пароль и для несуществующего логина, чтобы время ответа не выдавало,
+            # зарегистрирован ли он
+            if self._dummy_hash is None:
+                self._dummy_hash = await self.hasher.hash("dummy-password")
+            await self.hasher.verify(password, self._dummy_hash)
+            return None
+
+        matches, needs_rehash = await self.hasher.verify(password, row["password"])
+        if not matches:
+            return None
+        if needs_rehash:
+            await self._rehash_password(row["id"], row["password"], password)
+        return Account(id=row["id"], login=row["login"], is_blocked=row["is_blocked"])
+
+    async def _rehash_password(self, account_id: int, old_hash: str, password: str):
+        """
+        Заменяет хэш в прежнем формате (MD5) или с устаревшими параметрами KDF при успешном входе.
+        Условие на старый хэш не дает затереть пароль, смененный параллельно.
+        """
+        new_hash = await self.hasher.hash(password)
+        query = "UPDATE account SET password = $2 WHERE id = $1 AND password = $3"
         start_time = time.time()
         async with self.pool.acquire() as conn:
-            row = await conn.fetchrow(query, account_id)
+            await conn.execute(query, account_id, new_hash, old_hash)
         DB_QUERY_DURATION.labels(query_type="update").observe(time.time() - start_time)
+
+    async def block_account(self, account_id: int) -> Optional[Account]:
+        query = "UPDATE account SET is_blocked = TRUE WHERE id = $1 RETURNING id, login, is_blocked"
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                start_time = time.time()
+                row = await conn.fetchrow(query, account_id)
+                DB_QUERY_DURATION.labels(query_type="update").observe(time.time() - start_time)
+                # В множество попадают только существующие id: несуществующий мог бы позже достаться новому аккаунту
+                if row:
+                    await self._revoke(account_id)
         return Account(**row) if row else None
 
     async def delete_account(self, account_id: int):
         query = "DELETE FROM account WHERE id = $1"
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                start_time = time.time()
+                result = await conn.execute(query, account_id)
+                DB_QUERY_DURATION.labels(query_type="delete").observe(time.time() - start_time)
+                if result != "DELETE 0":
+                    await self._revoke(account_id)
+
+    async def _revoke(self, account_id: int):
+        """
+        Добавляет id в множество отозванных до фиксации транзакции. Если Redis недоступен, ошибка
+        откатывает изменение в БД и доходит до вызывающего: блокировку можно повторить, и аккаунт
+        не останется в БД заблокированным, но пропускаемым stateless-проверкой.
+        """
+        if self.revoked_accounts is not None:
+            await self.revoked_accounts.revoke(account_id)
+
+    async def sync_revoked_accounts(self) -> int:
+        """
+        Переносит в множество отозванных все заблокированные в БД аккаунты и отмечает его
+        синхронизированным. Удаленных аккаунтов в БД уже нет, их токены истекают сами.
+        """
+        query = "SELECT id FROM account WHERE is_blocked"
         start_time = time.time()
         async with self.pool.acquire() as conn:
-            await conn.execute(query, account_id)
-        DB_QUERY_DURATION.labels(query_type="delete").observe(time.time() - start_time)
+            rows = await conn.fetch(query)
+        DB_QUERY_DURATION.labels(query_type="select").observe(time.time() - start_time)
+        await self.revoked_accounts.load(row["id"] for row in rows)
+        return len(rows)
+
+    def request_revoked_accounts_sync(self):
+        """
+        Запускает синхронизацию в фоне, если она еще не идет. Вызывается, когда проверка токена
+        обнаружила, что множество потеряно (сброс или failover Redis без персистентности).
+        """
+        if self._sync_task is None or self._sync_task.done():
+            self._sync_task = asyncio.create_task(self._background_sync())
+
+    async def _background_sync(self):
+        try:
+            revoked = await self.sync_revoked_accounts()
+            logger.info(f"Множество отозванных аккаунтов восстановлено из БД: {revoked} заблокированных.")
+        except Exception as e:
+            logger.error(f"Не удалось восстановить множество отозванных аккаунтов: {e}", exc_info=True)
+
+
+class CachedAccountRepository:
+    """
+    AccountRepository с кэшем get_by_id в памяти процесса, чтобы проверка токена
+    не ходила в БД на каждый запрос. Записи живут ttl секунд в общем L1-кэше под ключами
+    account:{id}. block_account и delete_account сразу сбрасывают запись здесь и, если
+    передана шина инвалидаций, на остальных репликах, поэтому блокировка действует
+    не позже доставки инвалидации, а при ее потере - не позже ttl.
+    """
+    def __init__(self, account_repository: AccountRepository, l1: L1Cache, ttl: float = 30.0, bus=None):
+        self.accounts = account_repository
+        self.l1 = l1
+        self.ttl = ttl
+        self.bus = bus
+        # Растет при каждой инвалидации: чтение из БД, начатое до нее, не должно вернуть в кэш старую запись
+        self._generation = 0
+
+    @staticmethod
+    def key(account_id: int) -> str:
+        return f"account:{account_id}"
+
+    async def get_by_id(self, account_id: int) -> Optional[Account]:
+        key = self.key(account_id)
+        account = self.l1.get(key)
+        if account is not None:
+            ACCOUNT_CACHE_REQUESTS_TOTAL.labels(result="hit").inc()
+            return account
+        ACCOUNT_CACHE_REQUESTS_TOTAL.labels(result="miss").inc()
+        generation = self._generation
+        account = await self.accounts.get_by_id(account_id)
+        if account is not None and generation == self._generation:
+            self.l1.set(key, account, self.ttl, len(account.login) + 64)
+        return account
+
+    async def create_account(self, login: str, password: str) -> Account:
+        return await self.accounts.create_account(login, password)
+
+    async def get_by_login_and_password(self, login: str, password: str) -> Optional[Account]:
+        return await self.accounts.get_by_login_and_password(login, password)
+
+    async def block_account(self, account_id: int) -> Optional[Account]:
+        try:
+            return await self.accounts.block_account(account_id)
+        finally:
+            # Запись сбрасывается, даже если запрос упал после фиксации изменения в БД
+            await self.invalidate(account_id)
+
+    async def delete_account(self, account_id: int):
+        try:
+            await self.accounts.delete_account(account_id)
+        finally:
+            await self.invalidate(account_id)
+
+    async def sync_revoked_accounts(self) -> int:
+        return await self.accounts.sync_revoked_accounts()
+
+    def request_revoked_accounts_sync(self):
+        self.accounts.request_revoked_accounts_sync()
+
+    async def invalidate(self, account_id: int):
+        self._generation += 1
+        key = self.key(account_id)
+        self.l1.delete(key)
+        if self.bus is not None:
+            await self.bus.publish(keys=[key])
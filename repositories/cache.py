@@ -0,0 +1,340 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional
+
+from repositories.redis_repository import RedisRepository, jittered_ttl
+from app.metrics import (
+    CACHE_HITS_TOTAL, CACHE_MISSES_TOTAL, CACHE_EVICTIONS_TOTAL, CACHE_L1_SIZE,
+    CACHE_STALE_SERVED_TOTAL, CACHE_REFRESHES_TOTAL, CACHE_NEGATIVE_HITS_TOTAL,
+)
+
+logger = logging.getLogger("moderation_service.cache")
+
+
+def parse_prefix_ttls(value: str) -> dict[str, float]:
+    """Разбирает строку вида "prediction:=30,moderation_result:=300" в словарь префикс -> TTL."""
+    ttls = {}
+    for part in value.split(","):
+        if not part.strip():
+            continue
+        prefix, _, ttl = part.rpartition("=")
+        if not prefix:
+            raise ValueError(f"Некорректное правило TTL для L1-кэша: {part!r}, ожидается <префикс>=<секунды>")
+        ttls[prefix.strip()] = float(ttl)
+    return ttls
+
+
+class L1Cache:
+    """
+    Ограниченный LRU-кэш в памяти процесса со временем жизни записей.
+    Размер ограничен числом записей и суммарным размером значений в байтах (по длине JSON).
+    Значения хранятся уже декодированными и отдаются по ссылке, поэтому изменять их нельзя.
+    """
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 16 * 1024 * 1024,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._clock = clock
+        # ключ -> (значение, момент истечения, размер в байтах)
+        self._entries: OrderedDict[str, tuple[Any, float, int]] = OrderedDict()
+        self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at, _ = entry
+        if expires_at <= self._clock():
+            self._remove(key)
+            CACHE_EVICTIONS_TOTAL.labels(tier="l1", reason="expired").inc()
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: float, size: int):
+        if ttl <= 0 or size > self.max_bytes:
+            self.delete(key)
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (value, self._clock() + ttl, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            CACHE_EVICTIONS_TOTAL.labels(tier="l1", reason="capacity").inc()
+        self._update_size()
+
+    def delete(self, key: str):
+        if key in self._entries:
+            self._remove(key)
+            self._update_size()
+
+    def delete_prefix(self, prefix: str):
+        for key in [key for key in self._entries if key.startswith(prefix)]:
+            self._remove(key)
+        self._update_size()
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+        self._update_size()
+
+    def _remove(self, key: str):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def _update_size(self):
+        CACHE_L1_SIZE.labels(unit="entries").set(len(self._entries))
+        CACHE_L1_SIZE.labels(unit="bytes").set(self._bytes)
+
+
+class CachedRedisRepository:
+    """
+    Двухуровневый кэш с интерфейсом RedisRepository: L1 в памяти процесса поверх Redis.
+    В L1 попадают только ключи с префиксами из prefix_ttls, со своим коротким TTL,
+    но не дольше TTL в Redis. Промах L1 идет в Redis и заполняет L1 найденным значением.
+    Удаление через этот репозиторий сбрасывает запись в обоих уровнях и, если передана
+    шина инвалидаций, в L1 остальных реплик. Без шины записи, удаленные другими репликами,
+    живут в L1 не дольше его TTL.
+    """
+    def __init__(self, redis_repository: RedisRepository, l1: L1Cache, prefix_ttls: dict[str, float], bus=None):
+        self.redis = redis_repository
+        self.l1 = l1
+        self.bus = bus
+        # Длинные префиксы проверяются первыми, чтобы более точное правило побеждало
+        self.prefix_ttls = sorted(prefix_ttls.items(), key=lambda rule: len(rule[0]), reverse=True)
+
+    @property
+    def client(self):
+        return self.redis.client
+
+    def l1_ttl(self, key: str) -> float:
+        for prefix, ttl in self.prefix_ttls:
+            if key.startswith(prefix):
+                return ttl
+        return 0.0
+
+    async def get(self, key: str) -> Optional[Any]:
+        ttl = self.l1_ttl(key)
+        if ttl > 0:
+            value = self.l1.get(key)
+            if value is not None:
+                CACHE_HITS_TOTAL.labels(tier="l1").inc()
+                return value
+            CACHE_MISSES_TOTAL.labels(tier="l1").inc()
+
+        value = await self.redis.get(key)
+        if value is None:
+            CACHE_MISSES_TOTAL.labels(tier="redis").inc()
+            return None
+        CACHE_HITS_TOTAL.labels(tier="redis").inc()
+        if ttl > 0:
+            self.l1.set(key, value, ttl, len(json.dumps(value)))
+        return value
+
+    async def get_with_ttl(self, key: str) -> tuple[Optional[Any], Optional[float]]:
+        """
+        Как get, но еще возвращает оставшееся время жизни в Redis.
+        Для попадания в L1 оно неизвестно (None): L1 хранит запись не дольше своего короткого TTL.
+        """
+        ttl = self.l1_ttl(key)
+        if ttl > 0:
+            value = self.l1.get(key)
+            if value is not None:
+                CACHE_HITS_TOTAL.labels(tier="l1").inc()
+                return value, None
+            CACHE_MISSES_TOTAL.labels(tier="l1").inc()
+
+        value, remaining = await self.redis.get_with_ttl(key)
+        if value is None:
+            CACHE_MISSES_TOTAL.labels(tier="redis").inc()
+            return None, None
+        CACHE_HITS_TOTAL.labels(tier="redis").inc()
+        if remaining is not None:
+            ttl = min(ttl, remaining)
+        if ttl > 0:
+            self.l1.set(key, value, ttl, len(json.dumps(value)))
+        return value, remaining
+
+    async def set(self, key: str, value: Any, ttl: int):
+        await self.redis.set(key, value, ttl)
+        l1_ttl = min(self.l1_ttl(key), ttl)
+        if l1_ttl > 0:
+            self.l1.set(key, value, l1_ttl, len(json.dumps(value)))
+
+    async def set_unless(self, key: str, value: Any, ttl: int, guard: str) -> bool:
+        written = await self.redis.set_unless(key, value, ttl, guard)
+        l1_ttl = min(self.l1_ttl(key), ttl)
+        if written and l1_ttl > 0:
+            self.l1.set(key, value, l1_ttl, len(json.dumps(value)))
+        return written
+
+    async def delete(self, key: str):
+        self.l1.delete(key)
+        await self.redis.delete(key)
+        if self.bus is not None and self.l1_ttl(key) > 0:
+            await self.bus.publish(keys=[key])
+
+    async def get_many(self, keys: list[str]) -> list[Optional[Any]]:
+        """Отдает найденное в L1, остальные ключи читает из Redis одним MGET."""
+        values: list[Optional[Any]] = [None] * len(keys)
+        missing: list[int] = []
+        for i, key in enumerate(keys):
+            if self.l1_ttl(key) > 0:
+                value = self.l1.get(key)
+                if value is not None:
+                    CACHE_HITS_TOTAL.labels(tier="l1").inc()
+                    values[i] = value
+                    continue
+                CACHE_MISSES_TOTAL.labels(tier="l1").inc()
+            missing.append(i)
+
+        if missing:
+            fetched = await self.redis.get_many([keys[i] for i in missing])
+            for i, value in zip(missing, fetched):
+                if value is None:
+                    CACHE_MISSES_TOTAL.labels(tier="redis").inc()
+                    continue
+                CACHE_HITS_TOTAL.labels(tier="redis").inc()
+                values[i] = value
+                ttl = self.l1_ttl(keys[i])
+                if ttl > 0:
+                    self.l1.set(keys[i], value, ttl, len(json.dumps(value)))
+        return values
+
+    async def set_many(self, items: dict[str, Any], ttl: int, ttl_jitter: float = 0.0):
+        await self.redis.set_many(items, ttl, ttl_jitter)
+        # TTL в Redis мог быть уменьшен джиттером, поэтому L1 ограничен нижней границей
+        redis_ttl = ttl * (1 - ttl_jitter) if ttl_jitter > 0 else ttl
+        for key, value in items.items():
+            l1_ttl = min(self.l1_ttl(key), redis_ttl)
+            if l1_ttl > 0:
+                self.l1.set(key, value, l1_ttl, len(json.dumps(value)))
+
+    async def delete_many(self, keys: list[str]):
+        for key in keys:
+            self.l1.delete(key)
+        await self.redis.delete_many(keys)
+        cached_keys = [key for key in keys if self.l1_ttl(key) > 0]
+        if self.bus is not None and cached_keys:
+            await self.bus.publish(keys=cached_keys)
+
+    async def set_indexed(self, key: str, value: Any, ttl: int, index_key: str):
+        await self.redis.set_indexed(key, value, ttl, index_key)
+        l1_ttl = min(self.l1_ttl(key), ttl)
+        if l1_ttl > 0:
+            self.l1.set(key, value, l1_ttl, len(json.dumps(value)))
+
+    async def delete_indexed(self, index_key: str, keys: list[str] = ()) -> list[str]:
+        members = await self.redis.delete_indexed(index_key, keys)
+        deleted = [*keys, *members]
+        for key in deleted:
+            self.l1.delete(key)
+        cached_keys = [key for key in deleted if self.l1_ttl(key) > 0]
+        if self.bus is not None and cached_keys:
+            await self.bus.publish(keys=cached_keys)
+        return members
+
+
+class SoftTtlCache:
+    """
+    Кэш с мягким и жестким сроком жизни поверх RedisRepository или CachedRedisRepository.
+    Запись живет в Redis ttl секунд, сокращенных случайным джиттером до доли ttl_jitter,
+    чтобы ключи, записанные одновременно, не истекали одновременно. Последние stale_seconds
+    перед жестким истечением запись считается устаревшей: get сразу отдает ее и запускает
+    одно фоновое обновление через refresh, поэтому горячие ключи обновляются до того,
+    как запросы начнут получать промахи.
+    """
+    def __init__(self, repository, ttl: int = 3600, stale_seconds: float = 600,
+                 ttl_jitter: float = 0.1, singleflight=None):
+        self.repository = repository
+        self.ttl = ttl
+        self.stale_seconds = stale_seconds
+        self.ttl_jitter = ttl_jitter
+        # Через singleflight фоновое обновление не пересекается с вычислением того же ключа по промаху
+        self.singleflight = singleflight
+        self._refreshing: dict[str, asyncio.Task] = {}
+
+    async def get(self, key: str, refresh: Optional[Callable[[], Awaitable[Any]]] = None) -> Optional[Any]:
+        value, remaining = await self.repository.get_with_ttl(key)
+        if value is not None and remaining is not None and remaining <= self.stale_seconds:
+            CACHE_STALE_SERVED_TOTAL.inc()
+            if refresh is not None:
+                self._schedule_refresh(key, refresh)
+        return value
+
+    async def set(self, key: str, value: Any, guard: Optional[str] = None) -> bool:
+        """
+        Записывает значение. С guard запись атомарно пропускается, если существует ключ guard:
+        так обновление, начатое до закрытия объявления, не вернет в кэш удаленное предсказание.
+        """
+        ttl = jittered_ttl(self.ttl, self.ttl_jitter)
+        if guard is not None:
+            return await self.repository.set_unless(key, value, ttl=ttl, guard=guard)
+        await self.repository.set(key, value, ttl=ttl)
+        return True
+
+    def _schedule_refresh(self, key: str, refresh: Callable[[], Awaitable[Any]]):
+        if key in self._refreshing:
+            return
+        task = asyncio.create_task(self._refresh(key, refresh))
+        self._refreshing[key] = task
+        task.add_done_callback(lambda _: self._refreshing.pop(key, None))
+
+    async def _refresh(self, key: str, refresh: Callable[[], Awaitable[Any]]):
+        try:
+            if self.singleflight is not None:
+                await self.singleflight.do(key, refresh)
+            else:
+                await refresh()
+            CACHE_REFRESHES_TOTAL.labels(result="success").inc()
+        except Exception as e:
+            CACHE_REFRESHES_TOTAL.labels(result="error").inc()
+            logger.warning(f"Не удалось обновить устаревшую запись кэша {key}: {e}")
+
+    async def stop(self):
+        tasks = list(self._refreshing.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class NegativeCache:
+    """
+    Короткоживущие отметки "объявление не найдено или закрыто" в item_missing:{item_id}.
+    Повторные запросы к такому объявлению отвечают 404 без запроса в БД. Отметка снимается
+    при создании объявления с этим id, а закрытое объявление обратно не открывается,
+    поэтому короткий TTL нужен только как страховка от пропущенной инвалидации.
+    """
+    def __init__(self, repository, ttl: int = 60):
+        self.repository = repository
+        self.ttl = ttl
+
+    @staticmethod
+    def key(item_id: int) -> str:
+        return f"item_missing:{item_id}"
+
+    async def is_missing(self, item_id: int, lookup: str) -> bool:
+        """lookup - название пропущенного запроса в БД для метрики."""
+        if await self.repository.get(self.key(item_id)):
+            CACHE_NEGATIVE_HITS_TOTAL.labels(lookup=lookup).inc()
+            return True
+        return False
+
+    async def mark_missing(self, item_id: int):
+        if self.ttl > 0:
+            await self.repository.set(self.key(item_id), True, ttl=self.ttl)
+
+    async def forget(self, item_id: int):
+        await self.repository.delete(self.key(item_id))
@@ -0,0 +1,180 @@
+import json
+import struct
+from typing import Any, Protocol
+
+
+class CodecError(ValueError):
+    """Значение из кэша не удалось декодировать."""
+    pass
+
+
+class Codec(Protocol):
+    name: str
+
+    def encode(self, value: Any) -> bytes | str:
+        ...
+
+    def decode(self, data: bytes | str) -> Any:
+        ...
+
+
+# Заголовок бинарной записи: маркер, версия формата, тип записи.
+# JSON-текст не может начинаться с нулевого байта, поэтому старые записи отличаются по первому байту.
+BINARY_MARKER = 0x00
+BINARY_FORMAT_VERSION = 1
+HEADER = struct.Struct("<BBB")
+
+RECORD_PREDICTION = 1
+RECORD_MODERATION_STATUS = 2
+
+PREDICTION_KEYS = frozenset(("is_violation", "probability"))
+PREDICTION = struct.Struct("<?d")
+
+MODERATION_STATUS_KEYS = frozenset(("task_id", "status", "is_violation", "probability", "error_message"))
+MODERATION_STATUS = struct.Struct("<qBB")
+MODERATION_STATUSES = ("pending", "completed", "failed")
+# Флаги необязательных полей результата модерации
+FLAG_HAS_VIOLATION = 0x01
+FLAG_IS_VIOLATION = 0x02
+FLAG_HAS_PROBABILITY = 0x04
+FLAG_HAS_ERROR = 0x08
+PROBABILITY = struct.Struct("<d")
+ERROR_LENGTH = struct.Struct("<I")
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _encode_json(value: Any) -> str:
+    return json.dumps(value)
+
+
+def decode_value(data: bytes | str) -> Any:
+    """Декодирует запись кэша любого формата: бинарную по маркеру в первом байте, иначе JSON."""
+    if isinstance(data, str) or not data or data[0] != BINARY_MARKER:
+        try:
+            return json.loads(data)
+        except ValueError as e:
+            raise CodecError(f"Некорректный JSON в кэше: {e}") from e
+    try:
+        _, version, record_type = HEADER.unpack_from(data)
+        if version != BINARY_FORMAT_VERSION:
+            raise CodecError(f"Неизвестная версия бинарного формата кэша: {version}")
+        if record_type == RECORD_PREDICTION:
+            is_violation, probability = PREDICTION.unpack_from(data, HEADER.size)
+            return {"is_violation": is_violation, "probability": probability}
+        if record_type == RECORD_MODERATION_STATUS:
+            return _decode_moderation_status(data)
+    except (struct.error, UnicodeDecodeError) as e:
+        raise CodecError(f"Поврежденная бинарная запись в кэше: {e}") from e
+    raise CodecError(f"Неизвестный тип бинарной записи в кэше: {record_type}")
+
+
+def _is_prediction(value: dict) -> bool:
+    return isinstance(value["is_violation"], bool) and _is_number(value["probability"])
+
+
+def _is_moderation_status(value: dict) -> bool:
+    return (
+        isinstance(value["task_id"], int)
+        and -2**63 <= value["task_id"] < 2**63
+        and value["status"] in MODERATION_STATUSES
+        and (value["is_violation"] is None or isinstance(value["is_violation"], bool))
+        and (value["probability"] is None or _is_number(value["probability"]))
+        and (value["error_message"] is None or isinstance(value["error_message"], str))
+    )
+
+
+def _encode_moderation_status(value: dict) -> bytes:
+    flags = 0
+    if value["is_violation"] is not None:
+        flags |= FLAG_HAS_VIOLATION
+        if value["is_violation"]:
+            flags |= FLAG_IS_VIOLATION
+    tail = b""
+    if value["probability"] is not None:
+        flags |= FLAG_HAS_PROBABILITY
+        tail += PROBABILITY.pack(value["probability"])
+    if value["error_message"] is not None:
+        flags |= FLAG_HAS_ERROR
+        error = value["error_message"].encode()
+        tail += ERROR_LENGTH.pack(len(error)) + error
+    return (
+        HEADER.pack(BINARY_MARKER, BINARY_FORMAT_VERSION, RECORD_MODERATION_STATUS)
+        + MODERATION_STATUS.pack(value["task_id"], MODERATION_STATUSES.index(value["status"]), flags)
+        + tail
+    )
+
+
+def _decode_moderation_status(data: bytes) -> dict:
+    offset = HEADER.size
+    task_id, status, flags = MODERATION_STATUS.unpack_from(data, offset)
+    offset += MODERATION_STATUS.size
+    if status >= len(MODERATION_STATUSES):
+        raise CodecError(f"Неизвестный статус модерации в кэше: {status}")
+    probability = None
+    if flags & FLAG_HAS_PROBABILITY:
+        (probability,) = PROBABILITY.unpack_from(data, offset)
+        offset += PROBABILITY.size
+    error_message = None
+    if flags & FLAG_HAS_ERROR:
+        (length,) = ERROR_LENGTH.unpack_from(data, offset)
+        offset += ERROR_LENGTH.size
+        if offset + length > len(data):
+            raise CodecError("Поврежденная бинарная запись в кэше: сообщение об ошибке обрезано")
+        error_message = data[offset:offset + length].decode()
+    return {
+        "task_id": task_id,
+        "status": MODERATION_STATUSES[status],
+        "is_violation": bool(flags & FLAG_IS_VIOLATION) if flags & FLAG_HAS_VIOLATION else None,
+        "probability": probability,
+        "error_message": error_message,
+    }
+
+
+class JsonCodec:
+    """
+    Прежний формат кэша: пишет JSON-текст. Читает и бинарные записи, поэтому
+    реплики с этим кодеком не ломаются, когда соседние уже пишут в BinaryCodec.
+    """
+    name = "json"
+
+    def encode(self, value: Any) -> str:
+        return _encode_json(value)
+
+    def decode(self, data: bytes | str) -> Any:
+        return decode_value(data)
+
+
+class BinaryCodec:
+    """
+    Компактный бинарный формат для записей фиксированной формы: предсказаний
+    (is_violation, probability) и статусов модерации (поля ModerationStatusResponse).
+    Значения другой формы пишутся JSON-текстом. При чтении понимает оба формата,
+    поэтому записи, сохраненные до включения кодека, продолжают читаться.
+    """
+    name = "binary"
+
+    def encode(self, value: Any) -> bytes | str:
+        if isinstance(value, dict):
+            keys = value.keys()
+            if keys == PREDICTION_KEYS and _is_prediction(value):
+                return HEADER.pack(BINARY_MARKER, BINARY_FORMAT_VERSION, RECORD_PREDICTION) + PREDICTION.pack(
+                    value["is_violation"], value["probability"]
+                )
+            if keys == MODERATION_STATUS_KEYS and _is_moderation_status(value):
+                return _encode_moderation_status(value)
+        return _encode_json(value)
+
+    def decode(self, data: bytes | str) -> Any:
+        return decode_value(data)
+
+
+CODECS = {codec.name: codec for codec in (JsonCodec, BinaryCodec)}
+
+
+def get_codec(name: str) -> Codec:
+    if name not in CODECS:
+        raise ValueError(f"Неизвестный кодек кэша: {name}. Допустимые: {tuple(CODECS)}")
+    return CODECS[name]()
@@ -1,4 +1,5 @@
 import time
+from asyncpg import Record
 from asyncpg.pool import Pool
 from models.schemas import Item
 from app.metrics import DB_QUERY_DURATION
@@ -42,6 +43,55 @@ class ItemRepository:
             )
         return None
 
+    async def get_item_features(self, item_id: int) -> Record | None:
+        """
+        Получает только поля, нужные модели, без построения Item.
+        Длина описания считается в БД, поэтому сам текст не передается по сети.
+        """
+        query = """
+            SELECT
+                i.id as item_id,
+                u.is_verified_seller,
+                i.images_qty,
+                char_length(i.description) as description_length,
+                i.category
+            FROM items i
+            JOIN users u ON i.seller_id = u.id
+            WHERE i.id = $1 AND i.is_closed = FALSE;
+        """
+        start_time = time.time()
+        async with self.pool.acquire() as conn:
+            row = await conn.fetchrow(query, item_id)
+        end_time = time.time()
+        DB_QUERY_DURATION.labels(query_type="select").observe(end_time - start_time)
+        return row
+
+    async def get_open_items_features_page(self, after_id: int, limit: int) -> list[Record]:
+        """
+        Страница признаков открытых объявлений с id больше after_id, по возрастанию id.
+        Keyset-пагинация: каждая страница - проход по первичному ключу с нужного места,
+        без OFFSET, поэтому цена страницы не растет по мере обхода таблицы.
+        """
+        query = """
+            SELECT
+                i.id as item_id,
+                u.is_verified_seller,
+                i.images_qty,
+                char_length(i.description) as description_length,
+                i.category
+            FROM items i
+            JOIN users u ON i.seller_id = u.id
+            WHERE i.id > $1 AND i.is_closed = FALSE
+            ORDER BY i.id
+            LIMIT $2;
+        """
+        start_time = time.time()
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(query, after_id, limit)
+        end_time = time.time()
+        DB_QUERY_DURATION.labels(query_type="select").observe(end_time - start_time)
+        return rows
+
     async def create_item(
         self, name: str, description: str, category: int, images_qty: int, seller_id: int
     ) -> int:
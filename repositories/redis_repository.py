@@ -1,16 +1,103 @@
+import logging
+import random
+import time
 import redis.asyncio as redis
 from typing import Optional, Any
-import json
+from repositories.codecs import Codec, CodecError, JsonCodec
+
+logger = logging.getLogger("moderation_service.redis")
+
+# Индекс - sorted set, где у каждого ключа score равен моменту его истечения.
+# Истекшие ключи вычищаются при каждой записи, а сам индекс живет до истечения последнего ключа,
+# поэтому его размер ограничен числом живых записей и он исчезает вместе с ними
+SET_INDEXED_SCRIPT = """
+redis.call("SET", KEYS[1], ARGV[1], "EX", ARGV[2])
+redis.call("ZADD", KEYS[2], ARGV[4], KEYS[1])
+redis.call("ZREMRANGEBYSCORE", KEYS[2], "-inf", ARGV[3])
+local last = redis.call("ZRANGE", KEYS[2], -1, -1, "WITHSCORES")
+redis.call("PEXPIREAT", KEYS[2], string.format("%d", math.ceil(tonumber(last[2]) * 1000)))
+return 1
+"""
+
+# Удаляет живые ключи индекса, дополнительные ключи KEYS[2..] и сам индекс за один обмен с Redis.
+# DEL вызывается пачками, чтобы не упереться в ограничение Lua на число аргументов unpack
+DELETE_INDEXED_SCRIPT = """
+local members = redis.call("ZRANGEBYSCORE", KEYS[1], ARGV[1], "+inf")
+local targets = {}
+for i = 2, #KEYS do
+    table.insert(targets, KEYS[i])
+end
+for _, member in ipairs(members) do
+    table.insert(targets, member)
+end
+for i = 1, #targets, 1000 do
+    redis.call("DEL", unpack(targets, i, math.min(i + 999, #targets)))
+end
+redis.call("DEL", KEYS[1])
+return members
+"""
+
+# Записывает KEYS[i] = ARGV[2i - 1] с TTL ARGV[2i], только если нет стоп-ключа KEYS[n + i].
+# Проверка и запись атомарны, поэтому стоп-ключ, поставленный до удаления записи, не даст ее вернуть
+# Запись одного ключа, если не существует ключ-отметка KEYS[2]
+SET_UNLESS_SCRIPT = """
+if redis.call("EXISTS", KEYS[2]) == 1 then
+    return 0
+end
+redis.call("SET", KEYS[1], ARGV[1], "EX", ARGV[2])
+return 1
+"""
+
+SET_MANY_UNLESS_SCRIPT = """
+local n = #KEYS / 2
+local written = 0
+for i = 1, n do
+    if redis.call("EXISTS", KEYS[n + i]) == 0 then
+        redis.call("SET", KEYS[i], ARGV[2 * i - 1], "EX", ARGV[2 * i])
+        written = written + 1
+    end
+end
+return written
+"""
+
+
+def jittered_ttl(ttl: int, jitter: float) -> int:
+    """TTL, случайно уменьшенный не более чем на долю jitter, чтобы записи одной пачки истекали вразброс."""
+    if jitter <= 0:
+        return ttl
+    return max(1, round(ttl * (1 - random.random() * jitter)))
+
 
 class RedisRepository:
-    def __init__(self, host: str = "localhost", port: int = 6379, db: int = 0):
+    def __init__(self, host: str = "localhost", port: int = 6379, db: int = 0, codec: Codec | None = None):
         self.client = redis.Redis(host=host, port=port, db=db)
+        # Формат значений в Redis; по умолчанию JSON-текст, как раньше
+        self.codec = codec or JsonCodec()
+
+    def _decode(self, key: str, value) -> Optional[Any]:
+        if not value:
+            return None
+        try:
+            return self.codec.decode(value)
+        except CodecError as e:
+            # Нечитаемая запись (например, из более нового формата) считается промахом и будет перезаписана
+            logger.warning(f"Не удалось декодировать значение ключа {key}: {e}")
+            return None
 
     async def get(self, key: str) -> Optional[Any]:
         value = await self.client.get(key)
-        if value:
-            return json.loads(value)
-        return None
+        return self._decode(key, value)
+
+    async def get_with_ttl(self, key: str) -> tuple[Optional[Any], Optional[float]]:
+        """
+        Читает значение вместе с оставшимся временем жизни в секундах за один сетевой обмен.
+        Для отсутствующего ключа или ключа без TTL второе значение - None.
+        """
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.get(key)
+            pipe.pttl(key)
+            value, pttl = await pipe.execute()
+        return self._decode(key, value), (pttl / 1000 if pttl >= 0 else None)
 
     async def set(self, key: str, value: Any, ttl: int):
         """
@@ -19,7 +106,71 @@ class RedisRepository:
         Я выбрал TTL равным 1 часу (3600 секунд), потому что предсказания могут устаревать,
         и нет смысла хранить их вечно. К тому же, это снизит потребление памяти Redis.
         """
-        await self.client.set(key, json.dumps(value), ex=ttl)
+        await self.client.set(key, self.codec.encode(value), ex=ttl)
+
+    async def set_unless(self, key: str, value: Any, ttl: int, guard: str) -> bool:
+        """Как set, но ключ записывается, только если не существует guard. Возвращает, записан ли он."""
+        return bool(await self.client.eval(SET_UNLESS_SCRIPT, 2, key, guard, self.codec.encode(value), ttl))
 
     async def delete(self, key: str):
         await self.client.delete(key)
+
+    async def get_many(self, keys: list[str]) -> list[Optional[Any]]:
+        """
+        Читает несколько ключей одним MGET.
+        Возвращает значения в порядке keys, на месте отсутствующих ключей - None.
+        """
+        if not keys:
+            return []
+        values = await self.client.mget(keys)
+        return [self._decode(key, value) for key, value in zip(keys, values)]
+
+    async def set_many(self, items: dict[str, Any], ttl: int, ttl_jitter: float = 0.0):
+        """
+        Сохраняет несколько значений за один сетевой обмен (pipeline из SET EX).
+        При ttl_jitter > 0 TTL каждого ключа случайно уменьшается до этой доли,
+        чтобы записанные вместе ключи не истекали одновременно.
+        """
+        if not items:
+            return
+        # Транзакция не нужна: ключи независимы, а MULTI/EXEC только добавил бы работы Redis
+        async with self.client.pipeline(transaction=False) as pipe:
+            for key, value in items.items():
+                pipe.set(key, self.codec.encode(value), ex=jittered_ttl(ttl, ttl_jitter))
+            await pipe.execute()
+
+    async def set_many_unless(self, items: dict[str, Any], guards: list[str], ttl: int,
+                              ttl_jitter: float = 0.0) -> int:
+        """
+        Как set_many, но i-й ключ записывается, только если не существует guards[i]
+        (например, отметки о закрытии объявления). Возвращает число записанных ключей.
+        """
+        if not items:
+            return 0
+        args = []
+        for value in items.values():
+            args += [self.codec.encode(value), jittered_ttl(ttl, ttl_jitter)]
+        return await self.client.eval(SET_MANY_UNLESS_SCRIPT, 2 * len(items), *items, *guards, *args)
+
+    async def delete_many(self, keys: list[str]):
+        if keys:
+            await self.client.delete(*keys)
+
+    async def set_indexed(self, key: str, value: Any, ttl: int, index_key: str):
+        """
+        Сохраняет значение с TTL и добавляет ключ во вторичный индекс index_key
+        (например, все результаты модерации одного объявления), чтобы потом удалить их
+        вместе через delete_indexed, не перебирая ключи Redis через SCAN.
+        """
+        now = time.time()
+        await self.client.eval(
+            SET_INDEXED_SCRIPT, 2, key, index_key, self.codec.encode(value), ttl, now, now + ttl
+        )
+
+    async def delete_indexed(self, index_key: str, keys: list[str] = ()) -> list[str]:
+        """
+        Удаляет все живые ключи индекса, дополнительные ключи keys и сам индекс одним вызовом.
+        Возвращает ключи, найденные в индексе.
+        """
+        members = await self.client.eval(DELETE_INDEXED_SCRIPT, 1 + len(keys), index_key, *keys, time.time())
+        return [member.decode() if isinstance(member, bytes) else member for member in members]
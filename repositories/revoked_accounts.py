@@ -0,0 +1,66 @@
+from typing import Iterable
+
+REVOKED_ACCOUNTS_KEY = "auth:revoked_accounts"
+# Сколько id добавлять одной командой SADD при начальной синхронизации
+REVOKE_CHUNK_SIZE = 1000
+
+
+class RevokedAccountsNotLoaded(LookupError):
+    """Множество не синхронизировано с БД (первый запуск, сброс или failover Redis без персистентности)."""
+
+
+class RedisRevokedAccounts:
+    """
+    Множество id заблокированных и удаленных аккаунтов в Redis. Для проверки действительного
+    JWT достаточно одного SISMEMBER вместо SELECT в Postgres. Id хранятся целыми числами,
+    поэтому Redis держит множество в компактной кодировке intset.
+    Ключ-метка {key}:loaded ставится после синхронизации с БД и проверяется тем же запросом,
+    что и SISMEMBER: если данные Redis потеряны, метки нет, и пустому множеству не доверяем.
+    """
+    def __init__(self, client, key: str = REVOKED_ACCOUNTS_KEY):
+        self.client = client
+        self.key = key
+        self.loaded_key = f"{key}:loaded"
+
+    async def is_revoked(self, account_id: int) -> bool:
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.sismember(self.key, account_id)
+            pipe.exists(self.loaded_key)
+            revoked, loaded = await pipe.execute()
+        if not loaded:
+            raise RevokedAccountsNotLoaded(f"Множество {self.key} не синхронизировано с БД")
+        return bool(revoked)
+
+    async def revoke(self, account_id: int):
+        await self.client.sadd(self.key, account_id)
+
+    async def revoke_many(self, account_ids: Iterable[int]):
+        account_ids = list(account_ids)
+        for start in range(0, len(account_ids), REVOKE_CHUNK_SIZE):
+            await self.client.sadd(self.key, *account_ids[start:start + REVOKE_CHUNK_SIZE])
+
+    async def load(self, account_ids: Iterable[int]):
+        """Переносит в множество id из БД и отмечает его синхронизированным."""
+        await self.revoke_many(account_ids)
+        await self.client.set(self.loaded_key, 1)
+
+
+class MemoryRevokedAccounts:
+    """
+    Та же проверка в памяти процесса: для локального запуска и тестов без Redis.
+    Блокировка видна только в этом процессе, поэтому для нескольких реплик не подходит.
+    """
+    def __init__(self):
+        self._ids: set[int] = set()
+
+    async def is_revoked(self, account_id: int) -> bool:
+        return account_id in self._ids
+
+    async def revoke(self, account_id: int):
+        self._ids.add(account_id)
+
+    async def revoke_many(self, account_ids: Iterable[int]):
+        self._ids.update(account_ids)
+
+    async def load(self, account_ids: Iterable[int]):
+        await self.revoke_many(account_ids)
@@ -2,8 +2,10 @@ from fastapi import APIRouter, Depends, HTTPException, status, Response
 from fastapi.security import OAuth2PasswordRequestForm
 from repositories.accounts import AccountRepository
 from services.auth import AuthService
+from app.timing import TimedRoute
+from app.dependencies import get_account_repository
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 # В реальном приложении секретный ключ должен быть в конфигурации
 AUTH_SERVICE = AuthService(secret_key="your-super-secret-key")
@@ -12,7 +14,7 @@ AUTH_SERVICE = AuthService(secret_key="your-super-secret-key")
 async def login(
     response: Response,
     form_data: OAuth2PasswordRequestForm = Depends(),
-    account_repo: AccountRepository = Depends(lambda r: r.app.state.account_repository),
+    account_repo: AccountRepository = Depends(get_account_repository),
 ):
     account = await account_repo.get_by_login_and_password(form_data.username, form_data.password)
     if not account or account.is_blocked:
@@ -1,10 +1,12 @@
 import logging
 from fastapi import APIRouter, HTTPException, Request, status, Query
 from pydantic import BaseModel, Field
+from services.model_manager import ModelRollbackError
+from app.timing import TimedRoute
 
 logger = logging.getLogger("moderation_service.routes.management")
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 # --- Модели для создания ---
 
@@ -49,6 +51,8 @@ async def create_item(item_data: ItemCreate, request: Request):
             seller_id=item_data.seller_id,
         )
         logger.info(f"Создано новое объявление с ID: {item_id}")
+        # Запрос к этому id до создания мог оставить отметку "не найдено"
+        await request.app.state.negative_cache.forget(item_id)
         return {"id": item_id, **item_data.model_dump()}
     except Exception as e:
         if "violates foreign key constraint" in str(e):
@@ -64,7 +68,7 @@ async def close_item(
     item_id: int = Query(..., gt=0, description="ID объявления для закрытия.")
 ):
     """
-    Закрывает объявление и удаляет связанные с ним кэшированные предсказания.
+    Закрывает объявление и удаляет связанные с ним кэшированные предсказания и результаты модерации.
     """
     logger.info(f"Получен запрос на закрытие объявления с ID: {item_id}")
 
@@ -82,15 +86,85 @@ async def close_item(
 
     logger.info(f"Объявление с ID {item_id} помечено как закрытое в PostgreSQL.")
 
-    # 2. Удаляем кэш предсказаний из Redis
-    prediction_cache_key = f"prediction:{item_id}"
-    await redis_repo.delete(prediction_cache_key)
-    logger.info(f"Кэш предсказаний для item_id={item_id} удален из Redis.")
+    # 2. Отмечаем объявление отсутствующим до удаления кэша: прогрев, прочитавший его раньше,
+    # проверяет отметку при записи и не вернет удаленное предсказание
+    await request.app.state.negative_cache.mark_missing(item_id)
 
-    # 3. Находим и удаляем все связанные результаты модерации из кэша
-    # Это более сложная операция, так как мы не знаем task_id напрямую.
-    # В данном случае, мы оставим эту логику для улучшения в будущем,
-    # так как для этого потребуется изменение структуры хранения кэша.
-    # Пока что, удаляем только кэш предсказаний.
+    # 3. Удаляем из кэша предсказание и все результаты модерации объявления.
+    # Ключи результатов берутся из индекса item_tasks, который пополняется при их кэшировании;
+    # L1 других реплик сбрасывается через шину инвалидаций
+    # Ключи предсказаний содержат отпечаток модели: удаляем записи активной модели и модели для отката
+    services = (request.app.state.prediction_service, request.app.state.model_manager.previous_service)
+    prediction_keys = list(dict.fromkeys(service.cache_key(item_id) for service in services if service is not None))
+    task_keys = await redis_repo.delete_indexed(f"item_tasks:{item_id}", keys=prediction_keys)
+    logger.info(
+        f"Кэш предсказаний и {len(task_keys)} результатов модерации для item_id={item_id} удален из Redis."
+    )
 
     return {"message": f"Объявление {item_id} успешно закрыто."}
+
+
+# --- Управление версией модели ---
+
+class ModelVersionResponse(BaseModel):
+    version: str | None
+    previous_version: str | None
+
+
+@router.get("/model", response_model=ModelVersionResponse)
+async def get_model_version(request: Request):
+    """
+    Возвращает активную и предыдущую версии модели.
+    """
+    manager = request.app.state.model_manager
+    return ModelVersionResponse(version=manager.current_version, previous_version=manager.previous_version)
+
+
+@router.post("/model/reload", response_model=ModelVersionResponse)
+async def reload_model(request: Request):
+    """
+    Загружает актуальную версию модели, прогревает ее и переключает на нее трафик.
+    """
+    manager = request.app.state.model_manager
+    try:
+        await manager.reload()
+    except Exception as e:
+        logger.error(f"Не удалось перезагрузить модель: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Ошибка при загрузке новой версии модели.")
+    return ModelVersionResponse(version=manager.current_version, previous_version=manager.previous_version)
+
+
+@router.post("/model/rollback", response_model=ModelVersionResponse)
+async def rollback_model(request: Request):
+    """
+    Возвращает трафик на предыдущую версию модели.
+    """
+    manager = request.app.state.model_manager
+    try:
+        await manager.rollback()
+    except ModelRollbackError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return ModelVersionResponse(version=manager.current_version, previous_version=manager.previous_version)
+
+
+# --- Прогрев кэша ---
+
+@router.post("/cache/prewarm", status_code=status.HTTP_202_ACCEPTED)
+async def start_cache_prewarm(request: Request):
+    """
+    Запускает в фоне прогрев кэша предсказаний для всех открытых объявлений.
+    """
+    prewarmer = request.app.state.cache_prewarmer
+    if request.app.state.prediction_service is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Модель не загружена.")
+    if not prewarmer.start():
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Прогрев кэша уже выполняется.")
+    return prewarmer.status()
+
+
+@router.get("/cache/prewarm")
+async def get_cache_prewarm_status(request: Request):
+    """
+    Возвращает прогресс и скорость текущего или последнего прогрева кэша.
+    """
+    return request.app.state.cache_prewarmer.status()
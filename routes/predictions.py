@@ -1,19 +1,35 @@
 import logging
-from fastapi import APIRouter, HTTPException, Request, status, Query, Depends
+from typing import Any
+from fastapi import APIRouter, HTTPException, Request, status, Query, Depends, Body
 from models.schemas import Item, PredictionResponse, Account
 from services.prediction import ItemNotFoundError
-from pydantic import BaseModel
+from services.executor import ExecutorOverloadedError
+from pydantic import BaseModel, ValidationError
 from app.dependencies import get_current_account
+from app.timing import StageTimer, TimedRoute
 
 logger = logging.getLogger("moderation_service.routes")
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
+
+# Ограничение на размер одного батча, чтобы один запрос не занимал сервис надолго
+MAX_BATCH_SIZE = 1000
 
 class AsyncModerationResponse(BaseModel):
     task_id: int
     status: str
     message: str
 
+class BatchPredictionResult(BaseModel):
+    index: int
+    item_id: int | None = None
+    is_violation: bool | None = None
+    probability: float | None = None
+    error: str | None = None
+
+class BatchPredictionResponse(BaseModel):
+    results: list[BatchPredictionResult]
+
 class ModerationStatusResponse(BaseModel):
     task_id: int
     status: str
@@ -32,11 +48,73 @@ async def predict(item: Item, request: Request, current_account: Account = Depen
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Модель в данный момент не загружена."
         )
-    result = service.predict(item)
+    try:
+        result = await service.predict_async(item)
+    except ExecutorOverloadedError as e:
+        logger.warning(str(e))
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Сервис перегружен, повторите запрос позже."
+        )
     logger.info(f"Результат предсказания: {result}")
     return result
 
 
+@router.post("/predict/batch", response_model=BatchPredictionResponse)
+async def predict_batch(
+    request: Request,
+    items: list[Any] = Body(..., max_length=MAX_BATCH_SIZE),
+    current_account: Account = Depends(get_current_account)
+):
+    """
+    Пакетное предсказание для списка объявлений.
+    Объявления валидируются по отдельности: невалидные получают ошибку,
+    остальные оцениваются одним вызовом модели. Порядок результатов совпадает с порядком входа.
+    """
+    logger.info(f"Получен запрос predict/batch на {len(items)} объявлений")
+    service = request.app.state.prediction_service
+    if not service or service.model is None:
+        logger.error("Модель недоступна.")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Модель в данный момент не загружена."
+        )
+
+    results: list[BatchPredictionResult | None] = [None] * len(items)
+    valid_items: list[Item] = []
+    valid_indexes: list[int] = []
+    for index, raw_item in enumerate(items):
+        try:
+            item = Item.model_validate(raw_item)
+        except ValidationError as e:
+            error = "; ".join(
+                f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors()
+            )
+            raw_item_id = raw_item.get("item_id") if isinstance(raw_item, dict) else None
+            results[index] = BatchPredictionResult(
+                index=index,
+                item_id=raw_item_id if isinstance(raw_item_id, int) else None,
+                error=error,
+            )
+            continue
+        valid_items.append(item)
+        valid_indexes.append(index)
+
+    try:
+        predictions = await service.predict_batch_async(valid_items)
+    except ExecutorOverloadedError as e:
+        logger.warning(str(e))
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Сервис перегружен, повторите запрос позже."
+        )
+    for index, item, prediction in zip(valid_indexes, valid_items, predictions):
+        results[index] = BatchPredictionResult(index=index, item_id=item.item_id, **prediction)
+
+    logger.info(f"predict/batch: оценено {len(valid_items)}, отклонено {len(items) - len(valid_items)}")
+    return BatchPredictionResponse(results=results)
+
+
 @router.post("/simple_predict", response_model=PredictionResponse)
 async def simple_predict(
     request: Request,
@@ -46,31 +124,66 @@ async def simple_predict(
     logger.info(f"Получен запрос simple_predict для item_id: {item_id}")
     prediction_service = request.app.state.prediction_service
     item_repository = request.app.state.item_repository
-    redis_repository = request.app.state.redis_repository
-    cache_key = f"prediction:{item_id}"
-    cached_result = await redis_repository.get(cache_key)
-    if cached_result:
-        logger.info(f"Результат для item_id {item_id} найден в кэше.")
-        return PredictionResponse(**cached_result)
-    logger.info(f"Результат для item_id {item_id} не найден в кэше, выполняем предсказание.")
+    prediction_cache = request.app.state.prediction_cache
+    negative_cache = request.app.state.negative_cache
     if not prediction_service or prediction_service.model is None:
         logger.error("Модель недоступна для simple_predict.")
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Модель в данный момент не загружена."
         )
-    try:
-        result = await prediction_service.simple_predict(item_id, item_repository)
+    # Ключ содержит отпечаток модели, поэтому после ее смены записи прежней версии не читаются
+    cache_key = prediction_service.cache_key(item_id)
+
+    async def predict_and_cache() -> dict:
+        try:
+            result = await prediction_service.simple_predict(item_id, item_repository)
+        except ItemNotFoundError:
+            # Повторы и переборы id не будут доходить до БД, пока отметка не истечет
+            await negative_cache.mark_missing(item_id)
+            raise
         logger.info(f"Simple prediction result for item_id {item_id}: {result}")
-        await redis_repository.set(cache_key, result.dict(), ttl=3600)
-        logger.info(f"Результат для item_id {item_id} сохранен в кэш.")
+        # Объявление могли закрыть после чтения признаков: close_item ставит отметку item_missing
+        # до удаления ключа, и запись с ней не вернет удаленное предсказание в кэш
+        with StageTimer("cache_set"):
+            written = await prediction_cache.set(cache_key, result, guard=negative_cache.key(item_id))
+        if written:
+            logger.info(f"Результат для item_id {item_id} сохранен в кэш.")
         return result
+
+    # Устаревшая запись отдается сразу, а predict_and_cache обновляет ее в фоне
+    with StageTimer("cache_get"):
+        cached_result = await prediction_cache.get(cache_key, refresh=predict_and_cache)
+    if cached_result:
+        logger.info(f"Результат для item_id {item_id} найден в кэше.")
+        return PredictionResponse(**cached_result)
+    with StageTimer("cache_get"):
+        is_missing = await negative_cache.is_missing(item_id, lookup="simple_predict")
+    if is_missing:
+        logger.warning(f"Объявление с id {item_id} отмечено в кэше как отсутствующее.")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Объявление с id {item_id} не найдено."
+        )
+    logger.info(f"Результат для item_id {item_id} не найден в кэше, выполняем предсказание.")
+
+    try:
+        # Одновременные промахи по одному ключу ждут одно чтение из БД и одно предсказание
+        return await request.app.state.singleflight.do(
+            cache_key, predict_and_cache, recheck=lambda: prediction_cache.get(cache_key)
+        )
     except ItemNotFoundError as e:
         logger.warning(str(e))
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=str(e)
         )
+    except ExecutorOverloadedError as e:
+        logger.warning(str(e))
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Сервис перегружен, повторите запрос позже."
+        )
     except Exception as e:
         logger.error(f"An unexpected error occurred in simple_predict service: {e}", exc_info=True)
         raise HTTPException(
@@ -89,7 +202,12 @@ async def async_predict(
     item_repository = request.app.state.item_repository
     moderation_repo = request.app.state.moderation_result_repository
     kafka_producer = request.app.state.kafka_producer
-    item_exists = await item_repository.get_item_with_seller_info(item_id)
+    negative_cache = request.app.state.negative_cache
+    item_exists = False
+    if not await negative_cache.is_missing(item_id, lookup="async_predict"):
+        item_exists = await item_repository.get_item_with_seller_info(item_id)
+        if not item_exists:
+            await negative_cache.mark_missing(item_id)
     if not item_exists:
         logger.warning(f"Объявление с id {item_id} не найдено для асинхронной модерации.")
         raise HTTPException(
@@ -133,7 +251,12 @@ async def get_moderation_result(task_id: int, request: Request, current_account:
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Задача модерации с task_id={task_id} не найдена."
         )
+    response = ModerationStatusResponse(**result)
     if result.get("status") != "pending":
         logger.info(f"Результат для task_id={task_id} является финальным, кэшируем его.")
-        await redis_repository.set(cache_key, dict(result), ttl=3600)
-    return ModerationStatusResponse(**result)
+        # Кэшируем только поля ответа: служебные даты записи клиенту не нужны
+        # Ключ попадает в индекс объявления, чтобы закрытие объявления могло его удалить
+        await redis_repository.set_indexed(
+            cache_key, response.model_dump(), ttl=3600, index_key=f"item_tasks:{result['item_id']}"
+        )
+    return response
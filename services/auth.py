@@ -1,12 +1,22 @@
+import hashlib
+import time
 import jwt
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Callable, Optional
 from models.schemas import Account
 
 class AuthService:
-    def __init__(self, secret_key: str, algorithm: str = "HS256"):
+    def __init__(self, secret_key: str, algorithm: str = "HS256", cache_size: int = 10000,
+                 clock: Callable[[], float] = time.time):
         self.secret_key = secret_key
         self.algorithm = algorithm
+        # LRU уже проверенных токенов: sha256 токена -> (claims, момент истечения по exp).
+        # Клиент присылает один и тот же токен до 30 минут подряд, и повторная проверка HMAC
+        # и разбор JSON не нужны. Храним дайджест, а не сам токен; неверные токены не кэшируются
+        self.cache_size = cache_size
+        self._clock = clock
+        self._verified: OrderedDict[bytes, tuple[dict, float]] = OrderedDict()
 
     def create_token(self, account: Account) -> str:
         payload = {
@@ -18,6 +28,29 @@ class AuthService:
         return jwt.encode(payload, self.secret_key, algorithm=self.algorithm)
 
     def verify_token(self, token: str) -> Optional[dict]:
+        """Возвращает claims действительного токена или None. Claims отдаются по ссылке, изменять их нельзя."""
+        if self.cache_size <= 0:
+            return self._decode(token)
+
+        digest = hashlib.sha256(token.encode()).digest()
+        entry = self._verified.get(digest)
+        if entry is not None:
+            payload, expires_at = entry
+            if expires_at > self._clock():
+                self._verified.move_to_end(digest)
+                return payload
+            del self._verified[digest]
+            return None
+
+        payload = self._decode(token)
+        # Токен без exp не кэшируется: непонятно, когда его перепроверять
+        if payload is not None and "exp" in payload:
+            self._verified[digest] = (payload, float(payload["exp"]))
+            if len(self._verified) > self.cache_size:
+                self._verified.popitem(last=False)
+        return payload
+
+    def _decode(self, token: str) -> Optional[dict]:
         try:
             payload = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
             return payload
@@ -0,0 +1,80 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable
+from app.metrics import EXECUTOR_QUEUE_TIME, EXECUTOR_REJECTED_TOTAL
+
+logger = logging.getLogger("moderation_service.executor")
+
+EXECUTOR_MODES = ("inline", "thread", "process")
+
+
+class ExecutorOverloadedError(Exception):
+    """Очередь исполнителя заполнена, новая задача отклонена."""
+    pass
+
+
+def _timed_call(func: Callable, *args) -> tuple[float, Any]:
+    # Используем wall-clock время, так как в режиме process задача выполняется в другом процессе
+    started_at = time.time()
+    return started_at, func(*args)
+
+
+class InferenceExecutor:
+    """
+    Выполняет CPU-bound задачи вне цикла событий.
+    Режимы:
+    - inline: задача выполняется прямо в цикле событий (прежнее поведение);
+    - thread: в пуле потоков;
+    - process: в пуле процессов, функция и аргументы должны быть picklable.
+    max_queue_depth ограничивает число задач, отправленных и еще не завершенных;
+    сверх лимита задачи отклоняются с ExecutorOverloadedError.
+    """
+    def __init__(self, mode: str = "thread", max_workers: int | None = None, max_queue_depth: int = 64):
+        if mode not in EXECUTOR_MODES:
+            raise ValueError(f"Неизвестный режим исполнителя: {mode}. Допустимые: {EXECUTOR_MODES}")
+        self.mode = mode
+        self.max_workers = max_workers
+        self.max_queue_depth = max_queue_depth
+        self._pool: Executor | None = None
+        self._in_flight = 0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def start(self, initializer: Callable | None = None, initargs: tuple = ()):
+        """Создает пул. initializer используется только в режиме process."""
+        if self.mode == "thread":
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+        elif self.mode == "process":
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers, initializer=initializer, initargs=initargs
+            )
+        logger.info(f"Исполнитель инференса запущен: mode={self.mode}, max_workers={self.max_workers}, "
+                    f"max_queue_depth={self.max_queue_depth}")
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def run(self, func: Callable, *args) -> Any:
+        if self.mode == "inline":
+            return func(*args)
+        if self._pool is None:
+            raise RuntimeError("Исполнитель не запущен")
+        if self._in_flight >= self.max_queue_depth:
+            EXECUTOR_REJECTED_TOTAL.labels(mode=self.mode).inc()
+            raise ExecutorOverloadedError(f"Очередь исполнителя заполнена ({self.max_queue_depth} задач)")
+
+        self._in_flight += 1
+        submitted_at = time.time()
+        try:
+            loop = asyncio.get_running_loop()
+            started_at, result = await loop.run_in_executor(self._pool, _timed_call, func, *args)
+        finally:
+            self._in_flight -= 1
+        EXECUTOR_QUEUE_TIME.labels(mode=self.mode).observe(max(0.0, started_at - submitted_at))
+        return result
@@ -0,0 +1,123 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Iterable
+from repositories.cache import L1Cache
+from app.metrics import CACHE_INVALIDATION_LATENCY, CACHE_INVALIDATION_MESSAGES_TOTAL
+
+logger = logging.getLogger("moderation_service.invalidation")
+
+INVALIDATION_CHANNEL = "cache:invalidation"
+INVALIDATION_VERSION_KEY = "cache:invalidation:version"
+
+# Номер версии выдается и публикуется одной атомарной операцией, поэтому порядок
+# номеров в канале совпадает с порядком публикаций
+PUBLISH_SCRIPT = """
+local version = redis.call("INCR", KEYS[1])
+redis.call("PUBLISH", ARGV[1], version .. "|" .. ARGV[2])
+return version
+"""
+
+
+class InvalidationBus:
+    """
+    Рассылает между репликами инвалидации L1-кэша через Redis pub/sub.
+    Каждое сообщение несет сквозной номер версии. Пропуск номера (сообщение потеряно,
+    пока подписка переподключалась) или отставание от счетчика в Redis, который
+    проверяется каждые check_interval секунд без сообщений, означает, что часть
+    инвалидаций не дошла: тогда L1 очищается целиком.
+    """
+    def __init__(self, client, l1: L1Cache, channel: str = INVALIDATION_CHANNEL,
+                 version_key: str = INVALIDATION_VERSION_KEY, check_interval: float = 5.0):
+        self.client = client
+        self.l1 = l1
+        self.channel = channel
+        self.version_key = version_key
+        self.check_interval = check_interval
+        self.last_version = 0
+        self._task: asyncio.Task | None = None
+
+    async def start(self):
+        if self._task is not None:
+            return
+        try:
+            self.last_version = await self._current_version()
+        except Exception as e:
+            # Версию сверит подписчик после подключения к Redis
+            logger.warning(f"Не удалось прочитать версию инвалидаций кэша: {e}")
+        self._task = asyncio.create_task(self._listen())
+        logger.info(f"Подписка на инвалидации кэша запущена: channel={self.channel}, version={self.last_version}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def publish(self, keys: Iterable[str] = (), prefixes: Iterable[str] = ()):
+        """Рассылает инвалидацию всем репликам. Ошибка Redis не прерывает вызывающий код."""
+        payload = json.dumps({"keys": list(keys), "prefixes": list(prefixes), "sent_at": time.time()})
+        try:
+            await self.client.eval(PUBLISH_SCRIPT, 1, self.version_key, self.channel, payload)
+        except Exception as e:
+            logger.warning(f"Не удалось опубликовать инвалидацию кэша: {e}")
+
+    async def _current_version(self) -> int:
+        return int(await self.client.get(self.version_key) or 0)
+
+    async def _listen(self):
+        while True:
+            pubsub = self.client.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                # Пока подписки не было, сообщения могли потеряться
+                await self.check_version()
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=self.check_interval)
+                    if message is None:
+                        await self.check_version()
+                    elif message["type"] == "message":
+                        self.apply(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Подписка на инвалидации кэша прервана, переподключаемся: {e}")
+                await asyncio.sleep(1.0)
+            finally:
+                await pubsub.aclose()
+
+    def apply(self, data: bytes | str):
+        if isinstance(data, bytes):
+            data = data.decode()
+        version_text, _, payload = data.partition("|")
+        version = int(version_text)
+        if version <= self.last_version:
+            CACHE_INVALIDATION_MESSAGES_TOTAL.labels(result="stale").inc()
+            return
+
+        if version > self.last_version + 1:
+            logger.warning(f"Пропущены инвалидации кэша {self.last_version + 1}..{version - 1}, очищаем L1")
+            self.l1.clear()
+            CACHE_INVALIDATION_MESSAGES_TOTAL.labels(result="gap").inc()
+        else:
+            message = json.loads(payload)
+            for key in message["keys"]:
+                self.l1.delete(key)
+            for prefix in message["prefixes"]:
+                self.l1.delete_prefix(prefix)
+            CACHE_INVALIDATION_LATENCY.observe(max(0.0, time.time() - message["sent_at"]))
+            CACHE_INVALIDATION_MESSAGES_TOTAL.labels(result="applied").inc()
+        self.last_version = version
+
+    async def check_version(self):
+        current = await self._current_version()
+        if current != self.last_version:
+            # Счетчик меньше нашего, если Redis перезапустился без сохранения данных
+            logger.warning(f"Версия инвалидаций кэша в Redis {current}, получена {self.last_version}, очищаем L1")
+            self.l1.clear()
+            CACHE_INVALIDATION_MESSAGES_TOTAL.labels(result="missed").inc()
+            self.last_version = current
@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable
+from model import get_model, get_model_version
+from services.prediction import PredictionService
+from app.metrics import MODEL_SWAP_DURATION, MODEL_ACTIVE_VERSION, MODEL_RELOADS_TOTAL
+
+logger = logging.getLogger("moderation_service.model_manager")
+
+
+class ModelRollbackError(Exception):
+    """Нет предыдущей версии модели, на которую можно откатиться."""
+    pass
+
+
+class ModelManager:
+    """
+    Обновляет модель без перезапуска сервиса.
+    Новая версия загружается и прогревается в фоне, после чего атрибут
+    state.prediction_service подменяется одной операцией присваивания:
+    запросы, уже получившие ссылку на старый сервис, дорабатывают на нем.
+    Предыдущий сервис остается запущенным для мгновенного отката.
+    """
+    def __init__(
+        self,
+        state: Any,
+        service_factory: Callable[[Any], Awaitable[PredictionService]],
+        load_model: Callable[[], Any] = get_model,
+        get_version: Callable[[], str | None] = get_model_version,
+        poll_interval: float = 30.0,
+        on_swap: Callable[[str | None], Awaitable[None]] | None = None,
+    ):
+        self.state = state
+        self.service_factory = service_factory
+        self.load_model = load_model
+        self.get_version = get_version
+        self.poll_interval = poll_interval
+        # Вызывается после смены активной версии, например чтобы сбросить кэши предсказаний
+        self.on_swap = on_swap
+        self.current_version: str | None = None
+        self._previous: tuple[PredictionService, str | None] | None = None
+        # Версия, с которой откатились: наблюдатель не должен загружать ее снова
+        self._rejected_version: str | None = None
+        self._lock = asyncio.Lock()
+        self._watch_task: asyncio.Task | None = None
+
+    @property
+    def previous_version(self) -> str | None:
+        return self._previous[1] if self._previous else None
+
+    @property
+    def previous_service(self) -> PredictionService | None:
+        return self._previous[0] if self._previous else None
+
+    async def reload(self) -> str | None:
+        """Загружает модель из источника, прогревает ее и делает активной."""
+        async with self._lock:
+            start_time = time.perf_counter()
+            version = await asyncio.to_thread(self.get_version)
+            model = await asyncio.to_thread(self.load_model)
+            if model is None:
+                MODEL_RELOADS_TOTAL.labels(result="failed").inc()
+                raise RuntimeError("Не удалось загрузить модель")
+            if version is None:
+                # Модель могла быть только что обучена и сохранена при загрузке
+                version = await asyncio.to_thread(self.get_version)
+            loaded_time = time.perf_counter()
+            MODEL_SWAP_DURATION.labels(stage="load").observe(loaded_time - start_time)
+
+            candidate = await self.service_factory(model)
+            try:
+                await candidate.warmup()
+            except Exception:
+                await candidate.stop()
+                MODEL_RELOADS_TOTAL.labels(result="failed").inc()
+                raise
+            MODEL_SWAP_DURATION.labels(stage="warmup").observe(time.perf_counter() - loaded_time)
+
+            await self._activate(candidate, version)
+            self._rejected_version = None
+            MODEL_RELOADS_TOTAL.labels(result="success").inc()
+            logger.info(f"Активна версия модели {version}")
+            return version
+
+    async def rollback(self) -> str | None:
+        """Возвращает предыдущую версию модели."""
+        async with self._lock:
+            if self._previous is None:
+                raise ModelRollbackError("Нет предыдущей версии модели для отката.")
+            service, version = self._previous
+            rejected_version = self.current_version
+            await self._activate(service, version)
+            self._rejected_version = rejected_version
+            MODEL_RELOADS_TOTAL.labels(result="rollback").inc()
+            logger.warning(f"Выполнен откат модели с версии {rejected_version} на {version}")
+            return version
+
+    async def _activate(self, service: PredictionService, version: str | None):
+        swap_start = time.perf_counter()
+        old_service = getattr(self.state, "prediction_service", None)
+        self.state.prediction_service = service
+        MODEL_SWAP_DURATION.labels(stage="swap").observe(time.perf_counter() - swap_start)
+
+        # Сервис позапрошлой версии больше не нужен ни для запросов, ни для отката
+        if self._previous is not None and self._previous[0] not in (service, old_service):
+            await self._previous[0].stop()
+        self._previous = (old_service, self.current_version) if old_service is not None else None
+
+        self.current_version = version
+        MODEL_ACTIVE_VERSION.clear()
+        MODEL_ACTIVE_VERSION.labels(version=str(version)).set(1)
+
+        if old_service is not None and self.on_swap is not None:
+            try:
+                await self.on_swap(version)
+            except Exception as e:
+                logger.error(f"Ошибка обработчика смены модели: {e}", exc_info=True)
+
+    async def check_for_update(self) -> bool:
+        """Загружает новую версию, если она появилась в источнике."""
+        version = await asyncio.to_thread(self.get_version)
+        if version is None or version in (self.current_version, self._rejected_version):
+            return False
+        logger.info(f"Обнаружена новая версия модели: {version} (текущая {self.current_version})")
+        await self.reload()
+        return True
+
+    def start_watching(self):
+        if self._watch_task is None and self.poll_interval > 0:
+            self._watch_task = asyncio.create_task(self._watch())
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.check_for_update()
+            except Exception as e:
+                logger.error(f"Не удалось обновить модель: {e}", exc_info=True)
+
+    async def stop(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+        if self._previous is not None:
+            await self._previous[0].stop()
+            self._previous = None
+        service = getattr(self.state, "prediction_service", None)
+        if service is not None:
+            await service.stop()
@@ -0,0 +1,86 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from app.metrics import PASSWORD_HASH_DURATION, PASSWORD_HASH_WAIT
+
+SCRYPT_PREFIX = "scrypt"
+# Прежний формат: MD5 без соли, 32 шестнадцатеричных символа
+LEGACY_MD5_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode()
+
+
+class PasswordHasher:
+    """
+    Хэширует и проверяет пароли медленной KDF (scrypt) в собственном пуле потоков,
+    чтобы /login не останавливал цикл событий. scrypt отпускает GIL, поэтому потоки
+    считают параллельно с обработкой остальных запросов. Одновременно выполняется не больше
+    max_workers вычислений; остальные ждут в цикле событий, не занимая потоки.
+
+    Хэш хранится строкой scrypt$n$r$p$соль$хэш, параметры KDF читаются из нее, поэтому
+    их можно усилить без миграции: старые хэши проверяются своими параметрами и помечаются
+    как требующие перехэширования. Так же помечаются записи в прежнем формате MD5.
+    """
+    def __init__(self, max_workers: int = 2, n: int = 2 ** 14, r: int = 8, p: int = 1):
+        self.n = n
+        self.r = r
+        self.p = p
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password")
+        self._semaphore: asyncio.Semaphore | None = None
+
+    def _scrypt(self, password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+        # Память scrypt - 128 * n * r байт; запас нужен, чтобы OpenSSL не отверг параметры
+        return hashlib.scrypt(
+            password.encode(), salt=salt, n=n, r=r, p=p, dklen=32, maxmem=256 * n * r
+        )
+
+    def hash_sync(self, password: str) -> str:
+        salt = os.urandom(16)
+        derived = self._scrypt(password, salt, self.n, self.r, self.p)
+        return f"{SCRYPT_PREFIX}${self.n}${self.r}${self.p}${_b64encode(salt)}${_b64encode(derived)}"
+
+    def verify_sync(self, password: str, stored: str) -> tuple[bool, bool]:
+        """Возвращает (пароль подходит, хэш нужно пересчитать текущими параметрами)."""
+        if LEGACY_MD5_PATTERN.match(stored):
+            legacy = hashlib.md5(password.encode()).hexdigest()
+            return hmac.compare_digest(legacy, stored), True
+        try:
+            prefix, n, r, p, salt, expected = stored.split("$")
+            if prefix != SCRYPT_PREFIX:
+                return False, False
+            n, r, p = int(n), int(r), int(p)
+            derived = self._scrypt(password, base64.b64decode(salt), n, r, p)
+        except ValueError:
+            return False, False
+        matches = hmac.compare_digest(derived, base64.b64decode(expected))
+        return matches, (n, r, p) != (self.n, self.r, self.p)
+
+    async def _run(self, operation: str, func, *args):
+        # Семафор создается лениво: ему нужен запущенный цикл событий
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+        loop = asyncio.get_running_loop()
+        queued_at = loop.time()
+        async with self._semaphore:
+            started_at = loop.time()
+            PASSWORD_HASH_WAIT.observe(started_at - queued_at)
+            try:
+                return await loop.run_in_executor(self._pool, func, *args)
+            finally:
+                PASSWORD_HASH_DURATION.labels(operation=operation).observe(loop.time() - started_at)
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", self.hash_sync, password)
+
+    async def verify(self, password: str, stored: str) -> tuple[bool, bool]:
+        return await self._run("verify", self.verify_sync, password, stored)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -1,50 +1,355 @@
+import asyncio
 import numpy as np
 import time
+from typing import Awaitable, Callable, Mapping, Sequence
+from model import FEATURE_COLUMNS, FEATURE_SCALE, is_binary_logistic_model, model_digest
 from models.schemas import Item
 from repositories.items import ItemRepository
-from app.metrics import PREDICTIONS_TOTAL, PREDICTION_DURATION, PREDICTION_ERRORS_TOTAL, MODEL_PREDICTION_PROBABILITY
+from services.executor import InferenceExecutor, ExecutorOverloadedError
+from app.stage_timer import StageTimer
+from app.metrics import (
+    PREDICTIONS_TOTAL,
+    PREDICTION_DURATION,
+    PREDICTION_ERRORS_TOTAL,
+    MODEL_PREDICTION_PROBABILITY,
+    PREDICTION_BATCH_SIZE,
+    PREDICTION_QUEUE_WAIT,
+)
 
 class ItemNotFoundError(Exception):
     """Кастомное исключение для случаев, когда объявление не найдено в базе данных."""
     pass
 
+
+class LinearScorer:
+    """
+    Быстрый путь инференса для бинарной логистической регрессии.
+    Коэффициенты извлекаются из модели один раз, а метка и вероятность
+    считаются одним скалярным произведением и сигмоидой без валидации sklearn.
+    """
+    def __init__(self, coef: np.ndarray, intercept: float, classes: np.ndarray):
+        self.coef = np.ascontiguousarray(coef, dtype=float).ravel()
+        self.intercept = float(intercept)
+        self.classes = np.asarray(classes)
+
+    @classmethod
+    def from_model(cls, model) -> "LinearScorer | None":
+        """Возвращает скорер для поддерживаемой модели или None для остальных."""
+        if not is_binary_logistic_model(model):
+            return None
+        return cls(model.coef_[0], model.intercept_[0], model.classes_)
+
+    def score(self, features: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Возвращает метки классов и вероятности положительного класса."""
+        decision = features @ self.coef + self.intercept
+        # Численно устойчивая сигмоида: 1 / (1 + exp(-x)) = exp(-log(1 + exp(-x)))
+        probas = np.exp(-np.logaddexp(0.0, -decision))
+        labels = self.classes[(decision > 0).astype(int)]
+        return labels, probas
+
+
+class MicroBatcher:
+    """
+    Собирает конкурентные запросы на предсказание в один батч.
+    Батч отправляется в модель, когда набралось max_batch_size запросов
+    или с момента прихода первого запроса прошло max_wait_ms миллисекунд.
+    """
+    def __init__(
+        self,
+        score_batch: Callable[[np.ndarray], Awaitable[list[dict]]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size должен быть >= 1")
+        self.score_batch = score_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        # Запросы, уже взятые из очереди: собираемый или оцениваемый батч
+        self._batch: list = []
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        # Ожидающие запросы не должны зависнуть навсегда: ни те, что в очереди,
+        # ни те, что уже были в батче, когда отмена прервала сборку или оценку
+        pending, self._batch = self._batch, []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for _, future, _ in pending:
+            if not future.done():
+                future.set_exception(RuntimeError("Микробатчер остановлен"))
+
+    async def submit(self, features: list[float]) -> dict:
+        """Ставит строку признаков в очередь и ждет результат ее батча."""
+        if not self.running:
+            raise RuntimeError("Микробатчер не запущен")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((features, future, time.perf_counter()))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self._batch = batch = []
+            batch.append(await self._queue.get())
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._flush(batch)
+
+    async def _flush(self, batch: list):
+        # Клиент мог отменить запрос, пока он ждал в очереди
+        batch = [entry for entry in batch if not entry[1].done()]
+        if not batch:
+            return
+
+        now = time.perf_counter()
+        for _, _, enqueued_at in batch:
+            PREDICTION_QUEUE_WAIT.observe(now - enqueued_at)
+        PREDICTION_BATCH_SIZE.observe(len(batch))
+
+        features = np.array([entry[0] for entry in batch], dtype=float)
+        try:
+            results = await self.score_batch(features)
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
 class PredictionService:
     def __init__(self, model):
         self.model = model
+        self.scorer = LinearScorer.from_model(model)
+        self.batcher: MicroBatcher | None = None
+        self.executor: InferenceExecutor | None = None
+        # Теневая модель (services.shadow.ShadowEvaluator), получающая выборку запросов
+        self.shadow = None
+        # Отпечаток модели в ключах кэша: записи, посчитанные прежней моделью, после смены не читаются
+        self.cache_tag = self._cache_tag(model)
+
+    @staticmethod
+    def _cache_tag(model) -> str:
+        try:
+            return model_digest(model)
+        except Exception:
+            # Модель, которую нельзя сериализовать, различаем хотя бы в пределах процесса
+            return f"local-{id(model):x}"
+
+    def cache_key(self, item_id: int) -> str:
+        """Ключ кэша предсказания объявления этой моделью."""
+        return f"prediction:{self.cache_tag}:{item_id}"
+
+    @staticmethod
+    def build_features(item: Item) -> list[float]:
+        """Преобразует объявление в вектор признаков модели."""
+        return [
+            1.0 if item.is_verified_seller else 0.0,
+            item.images_qty / 10.0,
+            len(item.description) / 1000.0,
+            item.category / 100.0,
+        ]
+
+    @staticmethod
+    def build_feature_matrix(items: list[Item]) -> np.ndarray:
+        """Строит матрицу признаков для списка объявлений, заполняя ее по столбцам."""
+        n = len(items)
+        features = np.empty((n, 4), dtype=float)
+        features[:, 0] = np.fromiter((item.is_verified_seller for item in items), dtype=float, count=n)
+        features[:, 1] = np.fromiter((item.images_qty for item in items), dtype=float, count=n)
+        features[:, 2] = np.fromiter((len(item.description) for item in items), dtype=float, count=n)
+        features[:, 3] = np.fromiter((item.category for item in items), dtype=float, count=n)
+        features /= FEATURE_SCALE
+        return features
+
+    @staticmethod
+    def build_features_from_record(record: Mapping) -> list[float]:
+        """Вектор признаков из записи ItemRepository.get_item_features."""
+        return [
+            1.0 if record["is_verified_seller"] else 0.0,
+            record["images_qty"] / 10.0,
+            record["description_length"] / 1000.0,
+            record["category"] / 100.0,
+        ]
+
+    @staticmethod
+    def build_feature_matrix_from_records(records: Sequence[Mapping]) -> np.ndarray:
+        """Матрица признаков из записей ItemRepository.get_open_items_features_page, по столбцам."""
+        n = len(records)
+        features = np.empty((n, len(FEATURE_COLUMNS)), dtype=float)
+        for column, name in enumerate(FEATURE_COLUMNS):
+            features[:, column] = np.fromiter((record[name] for record in records), dtype=float, count=n)
+        features /= FEATURE_SCALE
+        return features
 
     def predict(self, item: Item) -> dict:
         """Синхронный метод, выполняющий только расчеты по данным модели."""
+        self._check_model()
+        features = np.array([self.build_features(item)])
+        return self.predict_features(features)[0]
+
+    def _check_model(self):
         if self.model is None:
             PREDICTION_ERRORS_TOTAL.labels(error_type="model_unavailable").inc()
             raise RuntimeError("Модель не загружена")
 
-        # Преобразование признаков
-        feat_verified = 1.0 if item.is_verified_seller else 0.0
-        feat_images = item.images_qty / 10.0
-        feat_desc_len = len(item.description) / 1000.0
-        feat_category = item.category / 100.0
-
-        features = np.array([[feat_verified, feat_images, feat_desc_len, feat_category]])
-
-        try:
-            start_time = time.time()
-            prediction = self.model.predict(features)[0]
-            proba = self.model.predict_proba(features)[0][1]
-            end_time = time.time()
+    def score(self, features: np.ndarray) -> tuple[np.ndarray, np.ndarray, float]:
+        """
+        Чистый расчет без метрик: метки, вероятности и время инференса.
+        Может выполняться в потоке или отдельном процессе исполнителя.
+        """
+        start_time = time.time()
+        if self.scorer is not None:
+            predictions, probas = self.scorer.score(features)
+        else:
+            predictions = self.model.predict(features)
+            probas = self.model.predict_proba(features)[:, 1]
+        return predictions, probas, time.time() - start_time
 
-            PREDICTION_DURATION.observe(end_time - start_time)
+    @staticmethod
+    def _collect_results(predictions: np.ndarray, probas: np.ndarray, duration: float) -> list[dict]:
+        PREDICTION_DURATION.observe(duration)
+        results = []
+        for prediction, proba in zip(predictions, probas):
             MODEL_PREDICTION_PROBABILITY.observe(proba)
-
             result = "violation" if prediction == 1 else "no_violation"
             PREDICTIONS_TOTAL.labels(result=result).inc()
-
-            return {
+            results.append({
                 "is_violation": bool(prediction == 1),
                 "probability": float(proba)
-            }
+            })
+        return results
+
+    def predict_features(self, features: np.ndarray) -> list[dict]:
+        """Выполняет предсказание для матрицы признаков за один вызов модели."""
+        self._check_model()
+        try:
+            return self._collect_results(*self.score(features))
+        except Exception as e:
+            PREDICTION_ERRORS_TOTAL.labels(error_type="prediction_error").inc()
+            raise e
+
+    async def _score_async(self, features: np.ndarray) -> tuple[np.ndarray, np.ndarray, float]:
+        if self.executor is None:
+            return self.score(features)
+        score = _score_in_worker_process if self.executor.mode == "process" else self.score
+        return await self.executor.run(score, features)
+
+    async def predict_features_async(self, features: np.ndarray) -> list[dict]:
+        """То же, что predict_features, но расчет выполняется в исполнителе вне цикла событий."""
+        self._check_model()
+        try:
+            scored = await self._score_async(features)
+        except ExecutorOverloadedError:
+            PREDICTION_ERRORS_TOTAL.labels(error_type="executor_overloaded").inc()
+            raise
         except Exception as e:
             PREDICTION_ERRORS_TOTAL.labels(error_type="prediction_error").inc()
             raise e
+        if self.shadow is not None:
+            # Только постановка в ограниченную очередь: теневая модель считает вне пути запроса
+            self.shadow.submit(features, scored[0], scored[1])
+        return self._collect_results(*scored)
+
+    def predict_batch(self, items: list[Item]) -> list[dict]:
+        """Выполняет предсказание для списка объявлений одним вызовом модели."""
+        if not items:
+            return []
+        return self.predict_features(self.build_feature_matrix(items))
+
+    async def predict_batch_async(self, items: list[Item]) -> list[dict]:
+        if not items:
+            return []
+        return await self.predict_features_async(self.build_feature_matrix(items))
+
+    def start_executor(self, mode: str = "thread", max_workers: int | None = None, max_queue_depth: int = 64):
+        """Переносит инференс в пул потоков или процессов."""
+        self.executor = InferenceExecutor(mode, max_workers, max_queue_depth)
+        # Процессам пула модель передается один раз при старте, а не с каждой задачей
+        self.executor.start(initializer=_init_worker_process, initargs=(self.model,))
+
+    async def stop(self):
+        """Останавливает микробатчер и исполнитель сервиса."""
+        await self.stop_batching()
+        self.stop_executor()
+
+    def stop_executor(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    async def warmup(self, rounds: int = 3, batch_size: int = 32):
+        """
+        Прогревает модель и исполнитель на синтетических данных без записи метрик:
+        поднимает потоки/процессы пула и проверяет, что модель отвечает.
+        """
+        self._check_model()
+        rng = np.random.default_rng(0)
+        for _ in range(rounds):
+            for n in (1, batch_size):
+                _, probas, _ = await self._score_async(rng.random((n, len(FEATURE_COLUMNS))))
+                if len(probas) != n or not np.all(np.isfinite(probas)):
+                    raise RuntimeError("Модель вернула некорректный результат при прогреве")
+
+    async def start_batching(self, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        """Включает микробатчинг для predict_async."""
+        self.batcher = MicroBatcher(self.predict_features_async, max_batch_size, max_wait_ms)
+        await self.batcher.start()
+
+    async def stop_batching(self):
+        if self.batcher is not None:
+            await self.batcher.stop()
+            self.batcher = None
+
+    async def _predict_row_async(self, features: list[float]) -> dict:
+        self._check_model()
+        if self.batcher is None:
+            return (await self.predict_features_async(np.array([features])))[0]
+        return await self.batcher.submit(features)
+
+    async def predict_async(self, item: Item) -> dict:
+        """
+        Асинхронная версия predict.
+        Если включен микробатчинг, запрос объединяется с конкурентными запросами;
+        если настроен исполнитель, расчет выполняется вне цикла событий.
+        """
+        return await self._predict_row_async(self.build_features(item))
+
+    async def predict_record_async(self, record: Mapping) -> dict:
+        """Предсказание по записи ItemRepository.get_item_features без построения Item."""
+        return await self._predict_row_async(self.build_features_from_record(record))
 
     async def simple_predict(self, item_id: int, item_repository: ItemRepository) -> dict:
         """
@@ -52,12 +357,29 @@ class PredictionService:
         1. Получает данные из репозитория.
         2. Вызывает основной метод predict.
         """
-        # Получаем данные объявления из БД
-        item_data = await item_repository.get_item_with_seller_info(item_id)
+        # Получаем из БД только признаки объявления: сам Item наружу не отдается
+        with StageTimer("db"):
+            record = await item_repository.get_item_features(item_id)
 
         # Если объявление не найдено, выбрасываем кастомное исключение
-        if item_data is None:
+        if record is None:
             raise ItemNotFoundError(f"Объявление с id {item_id} не найдено.")
-        
-        # Выполняем предсказание, используя основной синхронный метод
-        return self.predict(item_data)
+
+        # Выполняем предсказание, как predict_record_async, но с раздельными замерами этапов
+        with StageTimer("features"):
+            features = self.build_features_from_record(record)
+        with StageTimer("inference"):
+            return await self._predict_row_async(features)
+
+
+# Модель процесса пула исполнителя в режиме process
+_worker_process_service: PredictionService | None = None
+
+
+def _init_worker_process(model):
+    global _worker_process_service
+    _worker_process_service = PredictionService(model)
+
+
+def _score_in_worker_process(features: np.ndarray) -> tuple[np.ndarray, np.ndarray, float]:
+    return _worker_process_service.score(features)
@@ -0,0 +1,148 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Optional
+from repositories.cache import NegativeCache
+from repositories.items import ItemRepository
+from services.executor import ExecutorOverloadedError
+from services.prediction import PredictionService
+from app.metrics import CACHE_PREWARM_ITEMS_TOTAL
+
+logger = logging.getLogger("moderation_service.prewarm")
+
+
+class CachePrewarmer:
+    """
+    Заполняет кэш предсказаний prediction:{cache_tag}:{item_id} для всех открытых объявлений,
+    чтобы после деплоя или очистки Redis /simple_predict не уходил в БД на каждый запрос.
+
+    Объявления читаются страницами по chunk_size через keyset-пагинацию, каждая страница
+    оценивается одним вызовом модели и записывается одним pipeline с TTL, разбросанным на
+    ttl_jitter, чтобы прогретые вместе ключи не истекали одновременно. Скорость ограничена
+    max_items_per_second, а при переполненной очереди исполнителя инференса прогрев
+    уступает живым запросам и повторяет страницу позже.
+
+    redis_repository - RedisRepository без L1: прогретые ключи не должны вытеснять из L1
+    действительно горячие. Предсказание не пишется, если объявление успели закрыть после
+    чтения страницы: close_item ставит отметку item_missing до удаления ключа, а запись
+    проверяет ее атомарно.
+    """
+    def __init__(
+        self,
+        item_repository: ItemRepository,
+        redis_repository,
+        get_prediction_service: Callable[[], Optional[PredictionService]],
+        chunk_size: int = 500,
+        ttl: int = 3600,
+        ttl_jitter: float = 0.1,
+        max_items_per_second: float = 1000.0,
+        overload_backoff: float = 0.5,
+    ):
+        self.item_repository = item_repository
+        self.redis_repository = redis_repository
+        # Сервис берется заново для каждой страницы: модель может смениться во время прогрева
+        self.get_prediction_service = get_prediction_service
+        self.chunk_size = chunk_size
+        self.ttl = ttl
+        self.ttl_jitter = ttl_jitter
+        self.max_items_per_second = max_items_per_second
+        self.overload_backoff = overload_backoff
+        self._task: asyncio.Task | None = None
+        self._status = "idle"
+        self._items = 0
+        self._last_item_id = 0
+        self._started_at: float | None = None
+        self._finished_at: float | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def status(self) -> dict:
+        """Прогресс текущего или последнего прогрева."""
+        elapsed = 0.0
+        if self._started_at is not None:
+            elapsed = (self._finished_at or time.monotonic()) - self._started_at
+        return {
+            "status": self._status,
+            "items": self._items,
+            "last_item_id": self._last_item_id,
+            "elapsed_seconds": round(elapsed, 3),
+            "items_per_second": round(self._items / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+
+    def start(self) -> bool:
+        """Запускает прогрев в фоне. Возвращает False, если он уже идет."""
+        if self.running:
+            return False
+        self._task = asyncio.create_task(self.run())
+        return True
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run(self) -> dict:
+        self._status = "running"
+        self._items = 0
+        self._last_item_id = 0
+        self._started_at = time.monotonic()
+        self._finished_at = None
+        logger.info(f"Прогрев кэша предсказаний запущен: chunk_size={self.chunk_size}, "
+                    f"max_items_per_second={self.max_items_per_second}")
+        try:
+            while True:
+                records = await self.item_repository.get_open_items_features_page(
+                    self._last_item_id, self.chunk_size
+                )
+                if not records:
+                    break
+                await self._warm_chunk(records)
+                self._last_item_id = records[-1]["item_id"]
+                self._items += len(records)
+                CACHE_PREWARM_ITEMS_TOTAL.inc(len(records))
+                logger.info(f"Прогрев кэша: {self.status()}")
+                await self._throttle()
+            self._status = "completed"
+        except asyncio.CancelledError:
+            self._status = "cancelled"
+            raise
+        except Exception as e:
+            self._status = "failed"
+            logger.error(f"Прогрев кэша прерван на item_id > {self._last_item_id}: {e}", exc_info=True)
+        finally:
+            self._finished_at = time.monotonic()
+        logger.info(f"Прогрев кэша завершен: {self.status()}")
+        return self.status()
+
+    async def _warm_chunk(self, records: list):
+        features = PredictionService.build_feature_matrix_from_records(records)
+        while True:
+            service = self.get_prediction_service()
+            if service is None:
+                raise RuntimeError("Модель не загружена")
+            try:
+                results = await service.predict_features_async(features)
+                break
+            except ExecutorOverloadedError:
+                # Исполнитель занят живыми запросами: ждем и пробуем ту же страницу снова
+                await asyncio.sleep(self.overload_backoff)
+        await self.redis_repository.set_many_unless(
+            {service.cache_key(record["item_id"]): result for record, result in zip(records, results)},
+            guards=[NegativeCache.key(record["item_id"]) for record in records],
+            ttl=self.ttl,
+            ttl_jitter=self.ttl_jitter,
+        )
+
+    async def _throttle(self):
+        if self.max_items_per_second <= 0:
+            return
+        # Не обгоняем заданную среднюю скорость с начала прогрева
+        ahead = self._items / self.max_items_per_second - (time.monotonic() - self._started_at)
+        if ahead > 0:
+            await asyncio.sleep(ahead)
@@ -0,0 +1,138 @@
+import asyncio
+import contextlib
+import logging
+import random
+import sys
+import numpy as np
+from services.executor import InferenceExecutor
+from services.prediction import PredictionService
+from app.metrics import (
+    SHADOW_PREDICTIONS_TOTAL,
+    SHADOW_PROBABILITY_DELTA,
+    SHADOW_DROPPED_TOTAL,
+    SHADOW_ERRORS_TOTAL,
+)
+
+logger = logging.getLogger("moderation_service.shadow")
+
+EVALUATE_CHUNK_SIZE = 64
+
+
+class ShadowEvaluator:
+    """
+    Сравнивает модель-кандидата с основной на живом трафике.
+    На пути запроса выполняется только выборка строк и put_nowait в ограниченную очередь;
+    если очередь заполнена, выборка отбрасывается. Фоновая задача раз в flush_interval_ms
+    забирает накопившиеся строки одним батчем, оценивает их теневой моделью в отдельном
+    потоке и пишет метрики согласия меток и разницы вероятностей. Редкие крупные батчи
+    почти не отнимают время у цикла событий, обслуживающего основные запросы.
+    """
+    def __init__(
+        self,
+        model,
+        sample_rate: float = 0.1,
+        max_queue: int = 1000,
+        max_batch_size: int = 4096,
+        flush_interval_ms: float = 100.0,
+    ):
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError("sample_rate должен быть в диапазоне [0, 1]")
+        self.service = PredictionService(model)
+        self.sample_rate = sample_rate
+        self.max_queue = max_queue
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        # Отдельный поток, чтобы теневая модель не занимала исполнитель основной
+        self.executor = InferenceExecutor(mode="thread", max_workers=1, max_queue_depth=1)
+        # Генератор numpy отпускает GIL при каждом вызове и отдает его потокам инференса,
+        # что на пути запроса заметно дороже самой выборки
+        self._rng = random.Random()
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self.executor.start()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Теневая модель запущена: sample_rate={self.sample_rate}, max_queue={self.max_queue}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.executor.shutdown()
+
+    def submit(self, features: np.ndarray, labels: np.ndarray, probas: np.ndarray):
+        """Отбирает долю строк для сравнения. Никогда не блокирует и не выбрасывает исключений."""
+        if self._queue is None or self.sample_rate <= 0.0:
+            return
+        rate = self.sample_rate
+        if len(features) == 1:
+            # Частый случай одиночного запроса обходится без операций numpy
+            if self._rng.random() >= rate:
+                return
+            entry = (features, labels, probas)
+        else:
+            rows = [i for i in range(len(features)) if self._rng.random() < rate]
+            if not rows:
+                return
+            entry = (features[rows], np.asarray(labels)[rows], np.asarray(probas)[rows])
+        try:
+            self._queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            SHADOW_DROPPED_TOTAL.inc(len(entry[0]))
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            await asyncio.sleep(self.flush_interval)
+            rows = len(batch[0][0])
+            while rows < self.max_batch_size and not self._queue.empty():
+                entry = self._queue.get_nowait()
+                batch.append(entry)
+                rows += len(entry[0])
+            features = np.vstack([entry[0] for entry in batch])
+            labels = np.concatenate([entry[1] for entry in batch])
+            probas = np.concatenate([entry[2] for entry in batch])
+            # Батч оценивается порциями с возвратом управления циклу событий между ними,
+            # чтобы одна большая оценка не задерживала основные запросы
+            for start in range(0, len(features), EVALUATE_CHUNK_SIZE):
+                end = start + EVALUATE_CHUNK_SIZE
+                await self._evaluate(features[start:end], labels[start:end], probas[start:end])
+                await asyncio.sleep(0)
+
+    def _score(self, features: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Метки и вероятности теневой модели. Модель без быстрого линейного пути оценивается одним
+        predict_proba без повторной проверки входа: признаки уже прошли через основную модель,
+        а каждый вызов sklearn держит GIL, нужный потокам основного инференса.
+        """
+        if self.service.scorer is not None:
+            labels, probas, _ = self.service.score(features)
+            return labels, probas
+        model = self.service.model
+        # Для модели sklearn он уже импортирован; саму библиотеку ради этого не загружаем
+        sklearn = sys.modules.get("sklearn")
+        with sklearn.config_context(assume_finite=True) if sklearn else contextlib.nullcontext():
+            probas = np.asarray(model.predict_proba(features))
+        return np.asarray(model.classes_)[probas.argmax(axis=1)], probas[:, 1]
+
+    async def _evaluate(self, features: np.ndarray, labels: np.ndarray, probas: np.ndarray):
+        try:
+            shadow_labels, shadow_probas = await self.executor.run(self._score, features)
+        except Exception as e:
+            SHADOW_ERRORS_TOTAL.inc()
+            logger.warning(f"Ошибка теневой модели: {e}")
+            return
+
+        agree = int(np.sum(shadow_labels == labels))
+        SHADOW_PREDICTIONS_TOTAL.labels(agreement="agree").inc(agree)
+        SHADOW_PREDICTIONS_TOTAL.labels(agreement="disagree").inc(len(labels) - agree)
+        for delta in np.abs(np.asarray(shadow_probas) - probas).tolist():
+            SHADOW_PROBABILITY_DELTA.observe(delta)
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Optional
+from app.metrics import SINGLEFLIGHT_CALLS_TOTAL
+
+logger = logging.getLogger("moderation_service.singleflight")
+
+# Снимает блокировку, только если она все еще принадлежит нам: за время работы она могла истечь
+# и достаться другой реплике
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class SingleFlight:
+    """
+    Схлопывает одновременные вычисления по одному ключу.
+    Первый вызов do() для ключа запускает func, остальные до ее завершения ждут тот же результат
+    или то же исключение. Вычисление идет в отдельной задаче, поэтому отмена запроса,
+    который его начал, не отменяет его для остальных.
+
+    Если передан redis_client, между репликами дополнительно берется короткая блокировка
+    SET NX PX. Реплика, которой блокировка не досталась, опрашивает recheck (обычно чтение
+    кэша), пока владелец не положит результат, и считает сама, если блокировка освободилась
+    без результата или истекла. Ошибки Redis не мешают вычислению.
+    """
+    def __init__(self, redis_client=None, lock_ttl: float = 5.0, poll_interval: float = 0.05):
+        self.redis = redis_client
+        self.lock_ttl = lock_ttl
+        self.poll_interval = poll_interval
+        self._calls: dict[str, asyncio.Task] = {}
+
+    async def do(
+        self,
+        key: str,
+        func: Callable[[], Awaitable[Any]],
+        recheck: Optional[Callable[[], Awaitable[Any]]] = None,
+    ) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            SINGLEFLIGHT_CALLS_TOTAL.labels(role="leader").inc()
+            task = asyncio.create_task(self._execute(key, func, recheck))
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            SINGLEFLIGHT_CALLS_TOTAL.labels(role="follower").inc()
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Помечаем исключение полученным, даже если все ожидающие были отменены
+        if not task.cancelled():
+            task.exception()
+
+    async def _execute(self, key, func, recheck) -> Any:
+        if self.redis is None:
+            return await func()
+
+        lock_key = f"lock:{key}"
+        token = uuid.uuid4().hex
+        try:
+            acquired = await self.redis.set(lock_key, token, nx=True, px=int(self.lock_ttl * 1000))
+        except Exception as e:
+            logger.warning(f"Не удалось взять блокировку {lock_key}: {e}")
+            return await func()
+
+        if acquired:
+            try:
+                return await func()
+            finally:
+                try:
+                    await self.redis.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+                except Exception as e:
+                    logger.warning(f"Не удалось снять блокировку {lock_key}: {e}")
+
+        # Ключ уже вычисляет другая реплика: ждем ее результат в кэше
+        SINGLEFLIGHT_CALLS_TOTAL.labels(role="remote_wait").inc()
+        deadline = time.monotonic() + self.lock_ttl
+        try:
+            while time.monotonic() < deadline:
+                await asyncio.sleep(self.poll_interval)
+                if recheck is not None:
+                    value = await recheck()
+                    if value is not None:
+                        return value
+                if not await self.redis.exists(lock_key):
+                    # Владелец мог записать результат между проверкой кэша и снятием блокировки
+                    if recheck is not None:
+                        value = await recheck()
+                        if value is not None:
+                            return value
+                    break
+        except Exception as e:
+            logger.warning(f"Ошибка ожидания блокировки {lock_key}: {e}")
+        return await func()
@@ -0,0 +1,117 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock
+
+from app.metrics import ACCOUNT_CACHE_REQUESTS_TOTAL
+from models.schemas import Account
+from repositories.accounts import CachedAccountRepository
+from repositories.cache import L1Cache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def counter(result: str) -> float:
+    return ACCOUNT_CACHE_REQUESTS_TOTAL.labels(result=result)._value.get()
+
+
+def make_repository(l1: L1Cache | None = None, bus=None):
+    accounts = AsyncMock()
+    accounts.get_by_id.return_value = Account(id=1, login="seller", is_blocked=False)
+    repository = CachedAccountRepository(accounts, l1 if l1 is not None else L1Cache(), ttl=30, bus=bus)
+    return repository, accounts
+
+
+@pytest.mark.asyncio
+async def test_repeated_lookups_hit_cache():
+    """
+    Юнит-тест: повторные get_by_id в пределах TTL не ходят в БД и учитываются как попадания.
+    """
+    repository, accounts = make_repository()
+    hits_before, misses_before = counter("hit"), counter("miss")
+
+    for _ in range(5):
+        assert (await repository.get_by_id(1)).login == "seller"
+
+    accounts.get_by_id.assert_awaited_once_with(1)
+    assert counter("hit") - hits_before == 4
+    assert counter("miss") - misses_before == 1
+
+
+@pytest.mark.asyncio
+async def test_cached_account_expires_after_ttl():
+    """
+    Юнит-тест: после TTL аккаунт перечитывается из БД.
+    """
+    clock = FakeClock()
+    repository, accounts = make_repository(l1=L1Cache(clock=clock))
+
+    await repository.get_by_id(1)
+    clock.now += 31
+    await repository.get_by_id(1)
+
+    assert accounts.get_by_id.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_block_and_delete_invalidate_immediately():
+    """
+    Юнит-тест: block_account и delete_account сразу сбрасывают запись и рассылают инвалидацию.
+    """
+    bus = AsyncMock()
+    repository, accounts = make_repository(bus=bus)
+    await repository.get_by_id(1)
+
+    accounts.block_account.return_value = Account(id=1, login="seller", is_blocked=True)
+    accounts.get_by_id.return_value = Account(id=1, login="seller", is_blocked=True)
+    await repository.block_account(1)
+    assert (await repository.get_by_id(1)).is_blocked
+
+    accounts.get_by_id.return_value = None
+    await repository.delete_account(1)
+    assert await repository.get_by_id(1) is None
+
+    assert bus.publish.await_args_list == [((), {"keys": ["account:1"]})] * 2
+    assert accounts.get_by_id.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_block_invalidates_cache_when_update_fails():
+    """
+    Юнит-тест: если блокировка упала после фиксации в БД, запись в кэше все равно сбрасывается.
+    """
+    repository, accounts = make_repository()
+    await repository.get_by_id(1)
+
+    accounts.block_account.side_effect = ConnectionError("connection lost")
+    with pytest.raises(ConnectionError):
+        await repository.block_account(1)
+
+    assert repository.l1.get("account:1") is None
+
+
+@pytest.mark.asyncio
+async def test_lookup_racing_with_block_does_not_cache_stale_account():
+    """
+    Юнит-тест: чтение из БД, начатое до блокировки, не возвращает в кэш незаблокированный аккаунт.
+    """
+    repository, accounts = make_repository()
+    release = asyncio.Event()
+
+    async def slow_get_by_id(account_id):
+        await release.wait()
+        return Account(id=account_id, login="seller", is_blocked=False)
+
+    accounts.get_by_id.side_effect = slow_get_by_id
+    lookup = asyncio.create_task(repository.get_by_id(1))
+    await asyncio.sleep(0)
+    await repository.block_account(1)
+    release.set()
+    await lookup
+
+    assert repository.l1.get("account:1") is None
@@ -1,4 +1,8 @@
+import hashlib
+import time
+import jwt
 import pytest
+from unittest.mock import MagicMock
 from services.auth import AuthService
 from models.schemas import Account
 
@@ -20,3 +24,59 @@ def test_verify_invalid_token(auth_service: AuthService):
     invalid_token = "invalid_token"
     payload = auth_service.verify_token(invalid_token)
     assert payload is None
+
+class FakeClock:
+    def __init__(self):
+        self.now = time.time()
+
+    def __call__(self) -> float:
+        return self.now
+
+def test_verified_token_is_memoized(auth_service: AuthService, monkeypatch):
+    """
+    Юнит-тест: повторная проверка того же токена не вызывает jwt.decode.
+    """
+    token = auth_service.create_token(Account(id=1, login="testuser", is_blocked=False))
+    first = auth_service.verify_token(token)
+    decode = MagicMock(side_effect=AssertionError("токен проверяется повторно"))
+    monkeypatch.setattr(jwt, "decode", decode)
+
+    assert auth_service.verify_token(token) == first
+    decode.assert_not_called()
+
+def test_memoized_token_expires_at_exp():
+    """
+    Юнит-тест: запомненный токен перестает приниматься в момент его exp.
+    """
+    clock = FakeClock()
+    auth_service = AuthService(secret_key="test_secret", clock=clock)
+    token = auth_service.create_token(Account(id=1, login="testuser", is_blocked=False))
+    payload = auth_service.verify_token(token)
+
+    clock.now = payload["exp"] - 1
+    assert auth_service.verify_token(token) == payload
+    clock.now = payload["exp"]
+    assert auth_service.verify_token(token) is None
+
+def test_invalid_tokens_are_not_memoized(auth_service: AuthService):
+    """
+    Юнит-тест: неверные токены и токены с чужой подписью не попадают в кэш.
+    """
+    foreign = AuthService(secret_key="other_secret").create_token(Account(id=1, login="testuser"))
+
+    assert auth_service.verify_token("invalid_token") is None
+    assert auth_service.verify_token(foreign) is None
+    assert len(auth_service._verified) == 0
+
+def test_token_cache_is_bounded():
+    """
+    Юнит-тест: при переполнении вытесняется давно не использованный токен.
+    """
+    auth_service = AuthService(secret_key="test_secret", cache_size=2)
+    tokens = [auth_service.create_token(Account(id=i, login=f"user{i}")) for i in range(3)]
+
+    for token in tokens:
+        auth_service.verify_token(token)
+
+    assert len(auth_service._verified) == 2
+    assert hashlib.sha256(tokens[0].encode()).digest() not in auth_service._verified
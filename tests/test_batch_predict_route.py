@@ -0,0 +1,68 @@
+import pytest
+import pytest_asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+from httpx import AsyncClient, ASGITransport
+
+from main import app
+from app.dependencies import get_current_account
+from models.schemas import Account
+
+
+@pytest_asyncio.fixture
+async def client() -> AsyncClient:
+    app.dependency_overrides[get_current_account] = lambda: Account(id=1, login="testuser", is_blocked=False)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        yield ac
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def prediction_service():
+    service = MagicMock()
+    service.model = "mock_model_exists"
+    service.predict_batch_async = AsyncMock(side_effect=lambda items: [
+        {"is_violation": item.item_id % 2 == 0, "probability": item.item_id / 10} for item in items
+    ])
+    app.state.prediction_service = service
+    return service
+
+
+def item_payload(item_id: int) -> dict:
+    return {
+        "seller_id": 1, "is_verified_seller": True, "item_id": item_id, "name": "Test",
+        "description": "Test desc", "category": 1, "images_qty": 1,
+    }
+
+
+@pytest.mark.asyncio
+async def test_predict_batch_keeps_order_and_isolates_errors(client: AsyncClient, prediction_service):
+    """
+    Юнит-тест: невалидные объявления получают ошибку, не ломая остальной батч,
+    а результаты возвращаются в исходном порядке.
+    """
+    payload = [item_payload(1), {**item_payload(2), "category": 0}, item_payload(4), "not an item"]
+
+    response = await client.post("/predict/batch", json=payload)
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["index"] for r in results] == [0, 1, 2, 3]
+    assert results[0]["item_id"] == 1 and results[0]["is_violation"] is False
+    assert results[1]["item_id"] == 2 and "category" in results[1]["error"]
+    assert results[2]["item_id"] == 4 and results[2]["probability"] == 0.4
+    assert results[3]["error"] is not None
+    prediction_service.predict_batch_async.assert_awaited_once()
+    assert [item.item_id for item in prediction_service.predict_batch_async.call_args.args[0]] == [1, 4]
+
+
+@pytest.mark.asyncio
+async def test_predict_batch_model_unavailable(client: AsyncClient):
+    """
+    Юнит-тест: без загруженной модели ручка возвращает 503.
+    """
+    app.state.prediction_service = None
+
+    response = await client.post("/predict/batch", json=[item_payload(1)])
+
+    assert response.status_code == 503
@@ -0,0 +1,101 @@
+import pytest
+
+from benchmarks.suite import CALIBRATION_CASE, FakeItemRepository, compare, make_items, run_suite
+
+
+def result(ops_per_sec: float, p99_ms: float) -> dict:
+    return {"ops_per_sec": ops_per_sec, "p50_ms": p99_ms / 2, "p99_ms": p99_ms, "iterations": 100}
+
+
+def test_compare_detects_throughput_and_latency_regressions():
+    """
+    Юнит-тест: падение ops/sec и рост p99 сверх допуска считаются регрессией.
+    """
+    baseline = {"predict_async": result(1000, 1.0)}
+
+    assert compare({"predict_async": result(900, 1.2)}, baseline, tolerance=0.25, p50_tolerance=0.25) == []
+    regressions = compare(
+        {"predict_async": result(500, 2.0)}, baseline, tolerance=0.25, p50_tolerance=0.25, p99_tolerance=0.5
+    )
+    assert len(regressions) == 3
+    assert all(r.startswith("predict_async:") for r in regressions)
+
+
+def test_compare_checks_p99_only_when_requested():
+    """
+    Юнит-тест: выброс p99 при неизменных ops/sec и p50 не проваливает проверку без --p99-tolerance.
+    """
+    baseline = {"predict_async": result(1000, 1.0)}
+    current = {"predict_async": {**result(1000, 1.0), "p99_ms": 3.0}}
+
+    assert compare(current, baseline, tolerance=0.25, p50_tolerance=0.25) == []
+    assert len(compare(current, baseline, tolerance=0.25, p50_tolerance=0.25, p99_tolerance=0.5)) == 1
+
+
+def test_compare_scales_baseline_by_machine_speed():
+    """
+    Юнит-тест: если калибровочная нагрузка стала вдвое медленнее, вдвое более медленный
+    случай не считается регрессией, а неизменный по скорости на быстрой машине - считается.
+    """
+    baseline = {CALIBRATION_CASE: result(2000, 1.0), "predict_async": result(1000, 1.0)}
+
+    slow_machine = {CALIBRATION_CASE: result(1000, 2.0), "predict_async": result(500, 2.0)}
+    assert compare(slow_machine, baseline, tolerance=0.25, p50_tolerance=0.25) == []
+
+    fast_machine = {CALIBRATION_CASE: result(4000, 0.5), "predict_async": result(1000, 1.0)}
+    assert len(compare(fast_machine, baseline, tolerance=0.25, p50_tolerance=0.25)) == 2
+
+
+def test_compare_ignores_calibration_noise_on_the_same_machine():
+    """
+    Юнит-тест: колебание калибровки на 20% - шум, а не другая машина: базовые значения не пересчитываются,
+    и неизменный случай не выдается за регрессию, а замедленный на 30% - выдается.
+    """
+    baseline = {CALIBRATION_CASE: result(1000, 1.0), "predict_async": result(1000, 1.0)}
+
+    unchanged = {CALIBRATION_CASE: result(1200, 1.0), "predict_async": result(1000, 1.0)}
+    assert compare(unchanged, baseline, tolerance=0.25, p50_tolerance=0.25) == []
+
+    slower = {CALIBRATION_CASE: result(850, 1.0), "predict_async": result(700, 1.4)}
+    assert len(compare(slower, baseline, tolerance=0.25, p50_tolerance=0.25)) == 2
+
+
+def test_compare_ignores_cases_missing_from_baseline():
+    """
+    Юнит-тест: новый случай без базового значения не проваливает проверку.
+    """
+    assert compare({"new_case": result(1, 100.0)}, {}, tolerance=0.25, p50_tolerance=0.25) == []
+
+
+@pytest.mark.asyncio
+async def test_run_suite_reports_every_case():
+    """
+    Юнит-тест: короткий прогон набора возвращает метрики для всех случаев.
+    """
+    results = await run_suite(iterations=5, warmup=1, rounds=1)
+
+    assert set(results) == {
+        CALIBRATION_CASE, "predict_async", "feature_transform", "feature_matrix_100",
+        "simple_predict_cold", "simple_predict_warm",
+    }
+    for metrics in results.values():
+        assert metrics["ops_per_sec"] > 0
+        assert metrics["p99_ms"] >= metrics["p50_ms"]
+
+
+@pytest.mark.asyncio
+async def test_fake_item_repository_matches_feature_query():
+    """
+    Юнит-тест: фейковый репозиторий отдает те же поля, что и ItemRepository.get_item_features.
+    """
+    item = make_items(1)[0]
+    record = await FakeItemRepository([item]).get_item_features(item.item_id)
+
+    assert record == {
+        "item_id": item.item_id,
+        "is_verified_seller": item.is_verified_seller,
+        "images_qty": item.images_qty,
+        "description_length": len(item.description),
+        "category": item.category,
+    }
+    assert await FakeItemRepository([item]).get_item_features(item.item_id + 1) is None
@@ -0,0 +1,356 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock
+
+from repositories.cache import CachedRedisRepository, L1Cache, SoftTtlCache, parse_prefix_ttls
+from app.metrics import (
+    CACHE_HITS_TOTAL, CACHE_MISSES_TOTAL, CACHE_EVICTIONS_TOTAL,
+    CACHE_STALE_SERVED_TOTAL, CACHE_REFRESHES_TOTAL,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def counter(metric, **labels) -> float:
+    return metric.labels(**labels)._value.get()
+
+
+def make_repository(l1: L1Cache | None = None, prefix_ttls: dict | None = None):
+    redis_repository = AsyncMock()
+    redis_repository.get.return_value = None
+    repository = CachedRedisRepository(
+        redis_repository,
+        l1 if l1 is not None else L1Cache(),
+        prefix_ttls or {"prediction:": 30, "moderation_result:": 300},
+    )
+    return repository, redis_repository
+
+
+def test_parse_prefix_ttls():
+    """
+    Юнит-тест: правила TTL читаются из строки переменной окружения.
+    """
+    assert parse_prefix_ttls("prediction:=30, moderation_result:=300,") == {
+        "prediction:": 30.0, "moderation_result:": 300.0
+    }
+    with pytest.raises(ValueError):
+        parse_prefix_ttls("prediction:")
+
+
+def test_l1_evicts_least_recently_used_by_entries():
+    """
+    Юнит-тест: при превышении числа записей вытесняется давно не читанная.
+    """
+    l1 = L1Cache(max_entries=2)
+    evictions_before = counter(CACHE_EVICTIONS_TOTAL, tier="l1", reason="capacity")
+    l1.set("a", 1, ttl=10, size=1)
+    l1.set("b", 2, ttl=10, size=1)
+    assert l1.get("a") == 1
+    l1.set("c", 3, ttl=10, size=1)
+
+    assert l1.get("b") is None
+    assert l1.get("a") == 1
+    assert l1.get("c") == 3
+    assert counter(CACHE_EVICTIONS_TOTAL, tier="l1", reason="capacity") - evictions_before == 1
+
+
+def test_l1_evicts_by_bytes_and_skips_oversized_values():
+    """
+    Юнит-тест: суммарный размер значений ограничен, слишком большое значение не кэшируется.
+    """
+    l1 = L1Cache(max_entries=100, max_bytes=10)
+    l1.set("a", "x", ttl=10, size=6)
+    l1.set("b", "y", ttl=10, size=6)
+    assert l1.get("a") is None
+    assert l1.get("b") == "y"
+    assert l1.size_bytes == 6
+
+    l1.set("big", "z", ttl=10, size=11)
+    assert l1.get("big") is None
+    assert l1.size_bytes == 6
+
+
+def test_l1_entries_expire():
+    """
+    Юнит-тест: запись недоступна после истечения TTL и удаляется из L1.
+    """
+    clock = FakeClock()
+    l1 = L1Cache(clock=clock)
+    l1.set("a", 1, ttl=5, size=1)
+    clock.now += 4.9
+    assert l1.get("a") == 1
+    clock.now += 0.2
+    assert l1.get("a") is None
+    assert len(l1) == 0
+
+
+@pytest.mark.asyncio
+async def test_miss_falls_through_to_redis_and_populates_l1():
+    """
+    Юнит-тест: промах L1 идет в Redis, повторное чтение обслуживается из L1 без Redis.
+    """
+    repository, redis_repository = make_repository()
+    redis_repository.get.return_value = {"is_violation": False, "probability": 0.1}
+    l1_hits_before = counter(CACHE_HITS_TOTAL, tier="l1")
+    l1_misses_before = counter(CACHE_MISSES_TOTAL, tier="l1")
+    redis_hits_before = counter(CACHE_HITS_TOTAL, tier="redis")
+
+    first = await repository.get("prediction:1")
+    second = await repository.get("prediction:1")
+
+    assert first == second == {"is_violation": False, "probability": 0.1}
+    redis_repository.get.assert_awaited_once_with("prediction:1")
+    assert counter(CACHE_MISSES_TOTAL, tier="l1") - l1_misses_before == 1
+    assert counter(CACHE_HITS_TOTAL, tier="redis") - redis_hits_before == 1
+    assert counter(CACHE_HITS_TOTAL, tier="l1") - l1_hits_before == 1
+
+
+@pytest.mark.asyncio
+async def test_redis_miss_is_not_cached_in_l1():
+    """
+    Юнит-тест: отсутствие ключа в Redis не запоминается в L1.
+    """
+    repository, redis_repository = make_repository()
+    redis_misses_before = counter(CACHE_MISSES_TOTAL, tier="redis")
+
+    assert await repository.get("prediction:2") is None
+    assert await repository.get("prediction:2") is None
+
+    assert redis_repository.get.await_count == 2
+    assert counter(CACHE_MISSES_TOTAL, tier="redis") - redis_misses_before == 2
+
+
+@pytest.mark.asyncio
+async def test_keys_without_prefix_rule_bypass_l1():
+    """
+    Юнит-тест: ключи без правила TTL всегда читаются из Redis.
+    """
+    repository, redis_repository = make_repository()
+    redis_repository.get.return_value = {"value": 1}
+
+    await repository.get("session:1")
+    await repository.get("session:1")
+
+    assert redis_repository.get.await_count == 2
+    assert len(repository.l1) == 0
+
+
+@pytest.mark.asyncio
+async def test_set_unless_skips_l1_when_guard_blocks_write():
+    """
+    Юнит-тест: если стоп-ключ не дал записать значение в Redis, оно не попадает и в L1.
+    """
+    repository, redis_repository = make_repository()
+    redis_repository.set_unless.return_value = False
+
+    assert await repository.set_unless("prediction:1", {"p": 1}, ttl=60, guard="item_missing:1") is False
+    assert len(repository.l1) == 0
+
+    redis_repository.set_unless.return_value = True
+    assert await repository.set_unless("prediction:1", {"p": 1}, ttl=60, guard="item_missing:1") is True
+    assert repository.l1.get("prediction:1") == {"p": 1}
+
+
+@pytest.mark.asyncio
+async def test_set_writes_both_tiers_with_l1_ttl_capped_by_redis_ttl():
+    """
+    Юнит-тест: запись идет в Redis и в L1, TTL в L1 не превышает TTL в Redis.
+    """
+    clock = FakeClock()
+    repository, redis_repository = make_repository(l1=L1Cache(clock=clock))
+
+    await repository.set("moderation_result:7", {"status": "completed"}, ttl=10)
+
+    redis_repository.set.assert_awaited_once_with("moderation_result:7", {"status": "completed"}, 10)
+    assert await repository.get("moderation_result:7") == {"status": "completed"}
+    clock.now += 11
+    await repository.get("moderation_result:7")
+    redis_repository.get.assert_awaited_once_with("moderation_result:7")
+
+
+@pytest.mark.asyncio
+async def test_delete_invalidates_both_tiers():
+    """
+    Юнит-тест: удаление сбрасывает запись в L1 и в Redis.
+    """
+    repository, redis_repository = make_repository()
+    await repository.set("prediction:3", {"is_violation": True, "probability": 0.9}, ttl=3600)
+
+    await repository.delete("prediction:3")
+
+    redis_repository.delete.assert_awaited_once_with("prediction:3")
+    assert await repository.get("prediction:3") is None
+    redis_repository.get.assert_awaited_once_with("prediction:3")
+
+
+@pytest.mark.asyncio
+async def test_get_many_reads_only_l1_misses_from_redis():
+    """
+    Юнит-тест: get_many отдает найденное в L1, остальное читает одним вызовом get_many у Redis
+    и сохраняет порядок ключей.
+    """
+    repository, redis_repository = make_repository()
+    await repository.set("prediction:1", {"p": 1}, ttl=3600)
+    redis_repository.get_many.return_value = [{"p": 2}, None, {"s": 1}]
+
+    values = await repository.get_many(["prediction:2", "prediction:1", "prediction:3", "session:1"])
+
+    assert values == [{"p": 2}, {"p": 1}, None, {"s": 1}]
+    redis_repository.get_many.assert_awaited_once_with(["prediction:2", "prediction:3", "session:1"])
+    # Найденный в Redis ключ с правилом TTL попал в L1, ключ без правила - нет
+    assert repository.l1.get("prediction:2") == {"p": 2}
+    assert repository.l1.get("session:1") is None
+
+
+@pytest.mark.asyncio
+async def test_set_many_and_delete_many_update_both_tiers():
+    """
+    Юнит-тест: пакетные запись и удаление проходят через Redis и L1.
+    """
+    repository, redis_repository = make_repository()
+
+    await repository.set_many({"prediction:1": {"p": 1}, "prediction:2": {"p": 2}}, ttl=3600)
+    redis_repository.set_many.assert_awaited_once()
+    assert repository.l1.get("prediction:1") == {"p": 1}
+
+    await repository.delete_many(["prediction:1", "prediction:2"])
+    redis_repository.delete_many.assert_awaited_once_with(["prediction:1", "prediction:2"])
+    assert len(repository.l1) == 0
+
+
+@pytest.mark.asyncio
+async def test_delete_indexed_evicts_index_members_from_l1():
+    """
+    Юнит-тест: delete_indexed сбрасывает в L1 и дополнительные ключи, и ключи, найденные в индексе.
+    """
+    repository, redis_repository = make_repository()
+    await repository.set_indexed("moderation_result:5", {"status": "completed"}, ttl=3600, index_key="item_tasks:1")
+    await repository.set("prediction:1", {"p": 1}, ttl=3600)
+    redis_repository.set_indexed.assert_awaited_once_with(
+        "moderation_result:5", {"status": "completed"}, 3600, "item_tasks:1"
+    )
+    redis_repository.delete_indexed.return_value = ["moderation_result:5"]
+
+    deleted = await repository.delete_indexed("item_tasks:1", keys=["prediction:1"])
+
+    assert deleted == ["moderation_result:5"]
+    redis_repository.delete_indexed.assert_awaited_once_with("item_tasks:1", ["prediction:1"])
+    assert len(repository.l1) == 0
+
+
+@pytest.mark.asyncio
+async def test_get_with_ttl_caps_l1_by_remaining_redis_ttl():
+    """
+    Юнит-тест: get_with_ttl отдает оставшийся TTL из Redis и не держит запись в L1 дольше него.
+    """
+    clock = FakeClock()
+    repository, redis_repository = make_repository(l1=L1Cache(clock=clock))
+    redis_repository.get_with_ttl.return_value = ({"p": 1}, 5.0)
+
+    assert await repository.get_with_ttl("prediction:1") == ({"p": 1}, 5.0)
+    assert await repository.get_with_ttl("prediction:1") == ({"p": 1}, None)
+    clock.now += 6
+    await repository.get_with_ttl("prediction:1")
+    assert redis_repository.get_with_ttl.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_soft_ttl_cache_serves_stale_value_and_refreshes_once():
+    """
+    Юнит-тест: после мягкого срока запись отдается сразу, а обновление запускается
+    один раз, сколько бы запросов ни пришло до его завершения.
+    """
+    repository = AsyncMock()
+    repository.get_with_ttl.return_value = ({"p": 1}, 100.0)
+    cache = SoftTtlCache(repository, ttl=3600, stale_seconds=600)
+    refreshed = asyncio.Event()
+    refresh = AsyncMock(side_effect=refreshed.wait)
+    stale_before = CACHE_STALE_SERVED_TOTAL._value.get()
+    success_before = counter(CACHE_REFRESHES_TOTAL, result="success")
+
+    values = []
+    for _ in range(3):
+        values.append(await cache.get("prediction:1", refresh=refresh))
+        # Даем фоновому обновлению начаться и зависнуть на событии до следующего чтения
+        await asyncio.sleep(0)
+
+    assert values == [{"p": 1}] * 3
+    assert CACHE_STALE_SERVED_TOTAL._value.get() - stale_before == 3
+    assert refresh.await_count == 1
+    assert "prediction:1" in cache._refreshing
+    refreshed.set()
+    await asyncio.gather(*cache._refreshing.values())
+    await asyncio.sleep(0)
+    refresh.assert_awaited_once()
+    assert counter(CACHE_REFRESHES_TOTAL, result="success") - success_before == 1
+    assert not cache._refreshing
+
+
+@pytest.mark.asyncio
+async def test_soft_ttl_cache_does_not_refresh_fresh_values():
+    """
+    Юнит-тест: свежая запись и запись без известного TTL (попадание в L1) не обновляются.
+    """
+    repository = AsyncMock()
+    cache = SoftTtlCache(repository, ttl=3600, stale_seconds=600)
+    refresh = AsyncMock()
+
+    repository.get_with_ttl.return_value = ({"p": 1}, 3000.0)
+    assert await cache.get("prediction:1", refresh=refresh) == {"p": 1}
+    repository.get_with_ttl.return_value = ({"p": 1}, None)
+    assert await cache.get("prediction:1", refresh=refresh) == {"p": 1}
+    await asyncio.sleep(0)
+
+    refresh.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_soft_ttl_cache_counts_failed_refresh():
+    """
+    Юнит-тест: ошибка фонового обновления не доходит до запроса и учитывается в метрике.
+    """
+    repository = AsyncMock()
+    repository.get_with_ttl.return_value = ({"p": 1}, 1.0)
+    cache = SoftTtlCache(repository, stale_seconds=600)
+    errors_before = counter(CACHE_REFRESHES_TOTAL, result="error")
+
+    assert await cache.get("prediction:1", refresh=AsyncMock(side_effect=RuntimeError("db down"))) == {"p": 1}
+    await asyncio.sleep(0)
+
+    assert counter(CACHE_REFRESHES_TOTAL, result="error") - errors_before == 1
+
+
+@pytest.mark.asyncio
+async def test_soft_ttl_cache_set_with_guard():
+    """
+    Юнит-тест: запись с guard идет через set_unless, чтобы фоновое обновление не вернуло закрытое объявление.
+    """
+    repository = AsyncMock()
+    repository.set_unless.return_value = False
+    cache = SoftTtlCache(repository, ttl=1000, ttl_jitter=0)
+
+    assert await cache.set("prediction:1", {"p": 1}, guard="item_missing:1") is False
+    repository.set_unless.assert_awaited_once_with("prediction:1", {"p": 1}, ttl=1000, guard="item_missing:1")
+    repository.set.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_soft_ttl_cache_jitters_ttl():
+    """
+    Юнит-тест: set сокращает TTL случайно и не больше чем на долю ttl_jitter.
+    """
+    repository = AsyncMock()
+    cache = SoftTtlCache(repository, ttl=1000, ttl_jitter=0.2)
+
+    for i in range(50):
+        await cache.set(f"prediction:{i}", {"p": i})
+
+    ttls = [c.kwargs["ttl"] for c in repository.set.await_args_list]
+    assert all(800 <= ttl <= 1000 for ttl in ttls)
+    assert len(set(ttls)) > 1
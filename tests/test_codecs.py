@@ -0,0 +1,75 @@
+import pytest
+
+from repositories.codecs import BinaryCodec, CodecError, JsonCodec, get_codec
+
+PREDICTION = {"is_violation": True, "probability": 0.8123456789}
+MODERATION_STATUSES = [
+    {"task_id": 7, "status": "completed", "is_violation": False, "probability": 0.1,
+     "error_message": None},
+    {"task_id": 8, "status": "failed", "is_violation": None, "probability": None,
+     "error_message": "Объявление не найдено"},
+    {"task_id": 9, "status": "pending", "is_violation": None, "probability": None, "error_message": None},
+]
+
+
+@pytest.mark.parametrize("value", [PREDICTION, *MODERATION_STATUSES])
+def test_binary_codec_roundtrip_is_exact_and_smaller_than_json(value):
+    """
+    Юнит-тест: записи фиксированной формы кодируются в бинарный формат без потерь
+    и занимают меньше места, чем JSON.
+    """
+    encoded = BinaryCodec().encode(value)
+
+    assert isinstance(encoded, bytes)
+    assert BinaryCodec().decode(encoded) == value
+    assert len(encoded) < len(JsonCodec().encode(value).encode())
+
+
+@pytest.mark.parametrize("value", [
+    {"data": "test_data"},
+    {"is_violation": "yes", "probability": 0.5},
+    {"task_id": 1, "status": "unknown", "is_violation": None, "probability": None, "error_message": None},
+    [1, 2, 3],
+])
+def test_binary_codec_falls_back_to_json_for_other_values(value):
+    """
+    Юнит-тест: значения другой формы сохраняются JSON-текстом.
+    """
+    encoded = BinaryCodec().encode(value)
+
+    assert encoded == JsonCodec().encode(value)
+    assert BinaryCodec().decode(encoded.encode()) == value
+
+
+@pytest.mark.parametrize("codec", [JsonCodec(), BinaryCodec()])
+def test_both_codecs_read_both_formats(codec):
+    """
+    Юнит-тест: любой кодек читает и старые JSON-записи, и бинарные, что позволяет
+    переключать формат без сброса кэша.
+    """
+    assert codec.decode(b'{"is_violation": true, "probability": 0.8123456789}') == PREDICTION
+    assert codec.decode(BinaryCodec().encode(PREDICTION)) == PREDICTION
+
+
+@pytest.mark.parametrize("data", [
+    b"\x00\x02\x01" + bytes(9),  # неизвестная версия формата
+    b"\x00\x01\x63" + bytes(9),  # неизвестный тип записи
+    b"\x00\x01\x01\x01",  # обрезанная запись
+    b"not json",
+])
+def test_corrupted_or_unknown_data_raises_codec_error(data):
+    """
+    Юнит-тест: нечитаемая запись приводит к CodecError, а не к произвольному исключению.
+    """
+    with pytest.raises(CodecError):
+        BinaryCodec().decode(data)
+
+
+def test_get_codec_by_name():
+    """
+    Юнит-тест: кодек выбирается по имени из конфигурации.
+    """
+    assert isinstance(get_codec("binary"), BinaryCodec)
+    assert isinstance(get_codec("json"), JsonCodec)
+    with pytest.raises(ValueError):
+        get_codec("msgpack")
@@ -0,0 +1,89 @@
+import asyncio
+import threading
+import pytest
+
+from model import train_model
+from models.schemas import Item
+from services.executor import InferenceExecutor, ExecutorOverloadedError
+from services.prediction import PredictionService
+
+
+def make_item(item_id: int = 1) -> Item:
+    return Item(
+        item_id=item_id, name="Test", description="Test desc", category=1,
+        images_qty=1, seller_id=1, is_verified_seller=True
+    )
+
+
+def test_unknown_mode_rejected():
+    """
+    Юнит-тест: неизвестный режим исполнителя отклоняется при создании.
+    """
+    with pytest.raises(ValueError):
+        InferenceExecutor(mode="gpu")
+
+
+@pytest.mark.asyncio
+async def test_inline_mode_runs_in_event_loop_thread():
+    """
+    Юнит-тест: в режиме inline задача выполняется в потоке цикла событий.
+    """
+    executor = InferenceExecutor(mode="inline")
+    executor.start()
+    assert await executor.run(threading.get_ident) == threading.get_ident()
+
+
+@pytest.mark.asyncio
+async def test_thread_mode_runs_off_event_loop():
+    """
+    Юнит-тест: в режиме thread задача выполняется вне потока цикла событий.
+    """
+    executor = InferenceExecutor(mode="thread", max_workers=1)
+    executor.start()
+    try:
+        assert await executor.run(threading.get_ident) != threading.get_ident()
+    finally:
+        executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_queue_depth_is_bounded():
+    """
+    Юнит-тест: задачи сверх max_queue_depth отклоняются, а не копятся.
+    """
+    release = threading.Event()
+    executor = InferenceExecutor(mode="thread", max_workers=1, max_queue_depth=2)
+    executor.start()
+    try:
+        running = [asyncio.ensure_future(executor.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(ExecutorOverloadedError):
+            await executor.run(release.wait)
+        release.set()
+        await asyncio.gather(*running)
+        assert executor.in_flight == 0
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("mode", ["thread", "process"])
+async def test_prediction_service_with_executor_matches_inline(mode):
+    """
+    Юнит-тест: предсказания через пул потоков и процессов совпадают с расчетом в цикле событий.
+    """
+    model = train_model()
+    expected = PredictionService(model).predict(make_item())
+
+    service = PredictionService(model)
+    service.start_executor(mode=mode, max_workers=1)
+    try:
+        result = await service.predict_async(make_item())
+        batch = await service.predict_batch_async([make_item(1), make_item(2)])
+    finally:
+        service.stop_executor()
+
+    assert result["is_violation"] == expected["is_violation"]
+    assert result["probability"] == pytest.approx(expected["probability"])
+    assert len(batch) == 2
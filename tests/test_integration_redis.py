@@ -1,6 +1,7 @@
 import pytest
 import asyncio
 from repositories.redis_repository import RedisRepository
+from repositories.revoked_accounts import RedisRevokedAccounts, RevokedAccountsNotLoaded
 
 @pytest.mark.integration
 @pytest.mark.asyncio
@@ -46,3 +47,115 @@ async def test_integration_redis_ttl():
     finally:
         await repo.delete(test_key)
         await repo.client.close()
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_integration_redis_multikey_operations():
+    """
+    Интеграционный тест для пакетных операций: set_many, get_many с отсутствующим ключом и delete_many.
+    """
+    repo = RedisRepository(host="localhost", port=6379)
+    items = {f"integration_multikey_{i}": {"index": i} for i in range(3)}
+    keys = list(items)
+
+    try:
+        await repo.set_many(items, ttl=60)
+        values = await repo.get_many([keys[0], "integration_multikey_missing", keys[2]])
+        assert values == [{"index": 0}, None, {"index": 2}]
+        assert 0 < await repo.client.ttl(keys[1]) <= 60
+        await repo.delete_many(keys)
+        assert await repo.get_many(keys) == [None, None, None]
+    finally:
+        await repo.delete_many(keys)
+        await repo.client.close()
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_integration_redis_indexed_keys():
+    """
+    Интеграционный тест вторичного индекса: истекшие ключи вычищаются из индекса,
+    delete_indexed удаляет живые ключи, дополнительные ключи и сам индекс.
+    """
+    repo = RedisRepository(host="localhost", port=6379)
+    index_key = "integration_index"
+    keys = ["integration_indexed_1", "integration_indexed_2", "integration_indexed_extra"]
+
+    try:
+        await repo.set_indexed(keys[0], {"index": 1}, ttl=1, index_key=index_key)
+        await asyncio.sleep(1.1)
+        await repo.set_indexed(keys[1], {"index": 2}, ttl=60, index_key=index_key)
+        await repo.set(keys[2], {"index": 3}, ttl=60)
+        assert await repo.client.zcard(index_key) == 1
+        assert 58 <= await repo.client.ttl(index_key) <= 60
+
+        deleted = await repo.delete_indexed(index_key, keys=[keys[2]])
+
+        assert deleted == [keys[1]]
+        assert await repo.client.exists(index_key, *keys) == 0
+    finally:
+        await repo.delete_many([index_key, *keys])
+        await repo.client.close()
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_integration_redis_set_many_unless():
+    """
+    Интеграционный тест: ключ со стоп-ключом (закрытое объявление) не записывается, остальные пишутся с TTL.
+    """
+    repo = RedisRepository(host="localhost", port=6379)
+    keys = ["integration_unless_1", "integration_unless_2"]
+    guards = ["integration_unless_missing_1", "integration_unless_missing_2"]
+
+    try:
+        await repo.client.set(guards[1], 1, ex=60)
+        written = await repo.set_many_unless({keys[0]: {"p": 1}, keys[1]: {"p": 2}}, guards=guards, ttl=60)
+
+        assert written == 1
+        assert await repo.get(keys[0]) == {"p": 1}
+        assert await repo.get(keys[1]) is None
+        assert 58 <= await repo.client.ttl(keys[0]) <= 60
+    finally:
+        await repo.delete_many([*keys, *guards])
+        await repo.client.close()
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_integration_redis_set_unless():
+    """
+    Интеграционный тест: обновление предсказания не записывается, пока стоит отметка о закрытии объявления.
+    """
+    repo = RedisRepository(host="localhost", port=6379)
+    key, guard = "integration_set_unless", "integration_set_unless_missing"
+
+    try:
+        assert await repo.set_unless(key, {"p": 1}, ttl=60, guard=guard) is True
+        await repo.delete(key)
+        await repo.client.set(guard, 1, ex=60)
+        assert await repo.set_unless(key, {"p": 2}, ttl=60, guard=guard) is False
+        assert await repo.get(key) is None
+    finally:
+        await repo.delete_many([key, guard])
+        await repo.client.close()
+
+@pytest.mark.integration
+@pytest.mark.asyncio
+async def test_integration_redis_revoked_accounts():
+    """
+    Интеграционный тест множества отозванных аккаунтов: id хранятся в компактном intset,
+    а без метки синхронизации множеству не доверяют.
+    """
+    repo = RedisRepository(host="localhost", port=6379)
+    revoked = RedisRevokedAccounts(repo.client, key="integration_revoked_accounts")
+
+    try:
+        await revoked.revoke(1)
+        with pytest.raises(RevokedAccountsNotLoaded):
+            await revoked.is_revoked(4)
+        await revoked.load([2, 3])
+        assert await revoked.is_revoked(1)
+        assert await revoked.is_revoked(2)
+        assert not await revoked.is_revoked(4)
+        assert await repo.client.object("encoding", revoked.key) in ("intset", b"intset")
+    finally:
+        await repo.client.delete(revoked.key, revoked.loaded_key)
+        await repo.client.close()
@@ -0,0 +1,204 @@
+import asyncio
+import json
+import time
+import pytest
+from unittest.mock import AsyncMock
+
+from repositories.cache import CachedRedisRepository, L1Cache
+from services.invalidation import InvalidationBus
+from services.model_manager import ModelManager
+from services.prediction import PredictionService
+from model import train_model
+from app.metrics import CACHE_INVALIDATION_MESSAGES_TOTAL
+
+
+class FakePubSub:
+    def __init__(self, broker: "FakeRedisClient"):
+        self.broker = broker
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    async def subscribe(self, channel):
+        self.broker.subscribers.setdefault(channel, []).append(self)
+
+    async def get_message(self, ignore_subscribe_messages=True, timeout=None):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def aclose(self):
+        for subscribers in self.broker.subscribers.values():
+            if self in subscribers:
+                subscribers.remove(self)
+
+
+class FakeRedisClient:
+    """Имитирует версию в Redis, скрипт публикации и доставку pub/sub всем подписчикам."""
+    def __init__(self):
+        self.data: dict[str, int] = {}
+        self.subscribers: dict[str, list[FakePubSub]] = {}
+
+    def pubsub(self):
+        return FakePubSub(self)
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def eval(self, script, numkeys, version_key, channel, payload):
+        self.data[version_key] = self.data.get(version_key, 0) + 1
+        message = f"{self.data[version_key]}|{payload}".encode()
+        for subscriber in self.subscribers.get(channel, []):
+            subscriber.queue.put_nowait({"type": "message", "data": message})
+        return self.data[version_key]
+
+
+def message(version: int, keys=(), prefixes=()) -> bytes:
+    payload = json.dumps({"keys": list(keys), "prefixes": list(prefixes), "sent_at": time.time()})
+    return f"{version}|{payload}".encode()
+
+
+def counter(result: str) -> float:
+    return CACHE_INVALIDATION_MESSAGES_TOTAL.labels(result=result)._value.get()
+
+
+async def wait_until(condition, timeout: float = 1.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "условие не выполнилось вовремя"
+        await asyncio.sleep(0.001)
+
+
+@pytest.mark.asyncio
+async def test_delete_on_one_replica_evicts_l1_on_another():
+    """
+    Юнит-тест: удаление ключа через репозиторий одной реплики сбрасывает его в L1 другой реплики.
+    """
+    client = FakeRedisClient()
+    replicas = []
+    for _ in range(2):
+        l1 = L1Cache()
+        bus = InvalidationBus(client, l1, check_interval=0.5)
+        await bus.start()
+        redis_repository = AsyncMock()
+        replicas.append((CachedRedisRepository(redis_repository, l1, {"prediction:": 30}, bus=bus), bus))
+    try:
+        await wait_until(lambda: len(client.subscribers.get(bus.channel, [])) == 2)
+        for repository, _ in replicas:
+            repository.l1.set("prediction:1", {"is_violation": False, "probability": 0.1}, ttl=30, size=10)
+            repository.l1.set("prediction:2", {"is_violation": True, "probability": 0.9}, ttl=30, size=10)
+
+        await replicas[0][0].delete("prediction:1")
+
+        other_l1 = replicas[1][0].l1
+        await wait_until(lambda: other_l1.get("prediction:1") is None)
+        assert other_l1.get("prediction:2") is not None
+        assert replicas[1][1].last_version == 1
+    finally:
+        for _, bus in replicas:
+            await bus.stop()
+
+
+def test_prefix_invalidation_evicts_matching_keys():
+    """
+    Юнит-тест: инвалидация по префиксу удаляет из L1 только ключи с этим префиксом.
+    """
+    l1 = L1Cache()
+    bus = InvalidationBus(AsyncMock(), l1)
+    l1.set("prediction:1", 1, ttl=30, size=1)
+    l1.set("moderation_result:1", 2, ttl=30, size=1)
+
+    bus.apply(message(1, prefixes=["prediction:"]))
+
+    assert l1.get("prediction:1") is None
+    assert l1.get("moderation_result:1") == 2
+
+
+def test_version_gap_clears_l1():
+    """
+    Юнит-тест: пропуск номера версии означает потерянное сообщение, и L1 очищается целиком.
+    """
+    l1 = L1Cache()
+    bus = InvalidationBus(AsyncMock(), l1)
+    bus.last_version = 3
+    l1.set("prediction:1", 1, ttl=30, size=1)
+    l1.set("moderation_result:1", 2, ttl=30, size=1)
+    gaps_before = counter("gap")
+
+    bus.apply(message(5, keys=["prediction:9"]))
+
+    assert len(l1) == 0
+    assert bus.last_version == 5
+    assert counter("gap") - gaps_before == 1
+
+
+def test_already_seen_version_is_ignored():
+    """
+    Юнит-тест: сообщение с уже обработанной версией не применяется повторно.
+    """
+    l1 = L1Cache()
+    bus = InvalidationBus(AsyncMock(), l1)
+    bus.last_version = 5
+    l1.set("prediction:1", 1, ttl=30, size=1)
+
+    bus.apply(message(4, keys=["prediction:1"]))
+
+    assert l1.get("prediction:1") == 1
+    assert bus.last_version == 5
+
+
+@pytest.mark.asyncio
+async def test_version_check_recovers_from_lost_messages():
+    """
+    Юнит-тест: если счетчик версий в Redis ушел вперед без полученных сообщений, L1 очищается.
+    """
+    client = FakeRedisClient()
+    l1 = L1Cache()
+    bus = InvalidationBus(client, l1)
+    l1.set("prediction:1", 1, ttl=30, size=1)
+
+    await bus.check_version()
+    assert len(l1) == 1
+
+    client.data[bus.version_key] = 7
+    await bus.check_version()
+    assert len(l1) == 0
+    assert bus.last_version == 7
+
+
+@pytest.mark.asyncio
+async def test_keys_outside_l1_are_not_published():
+    """
+    Юнит-тест: удаление ключа, который не кэшируется в L1, не рассылается по шине.
+    """
+    bus = AsyncMock()
+    repository = CachedRedisRepository(AsyncMock(), L1Cache(), {"prediction:": 30}, bus=bus)
+
+    await repository.delete("lock:prediction:1")
+    await repository.delete_many(["prediction:1", "session:1"])
+
+    bus.publish.assert_awaited_once_with(keys=["prediction:1"])
+
+
+@pytest.mark.asyncio
+async def test_model_swap_calls_on_swap_hook():
+    """
+    Юнит-тест: обработчик смены модели вызывается при подмене версии, но не при первой загрузке.
+    """
+    class State:
+        pass
+
+    versions = iter(["v1", "v2"])
+    on_swap = AsyncMock()
+
+    async def factory(model):
+        return PredictionService(model)
+
+    manager = ModelManager(
+        State(), factory, load_model=train_model, get_version=lambda: next(versions), on_swap=on_swap
+    )
+    await manager.reload()
+    on_swap.assert_not_awaited()
+
+    await manager.reload()
+    on_swap.assert_awaited_once_with("v2")
+    await manager.stop()
@@ -1,3 +1,5 @@
+import numpy as np
+from datetime import datetime
 import pytest
 import pytest_asyncio
 from unittest.mock import MagicMock, AsyncMock
@@ -6,25 +8,39 @@ from httpx import AsyncClient, ASGITransport
 from fastapi import FastAPI
 
 from main import app
-from models.schemas import Item
+from app.dependencies import get_current_account
+from models.schemas import Account
+from services.prediction import PredictionService
+from services.singleflight import SingleFlight
+from repositories.cache import NegativeCache, SoftTtlCache
+from app.metrics import CACHE_NEGATIVE_HITS_TOTAL
 
 
 # Используем pytest_asyncio.fixture для асинхронных фикстур
 @pytest_asyncio.fixture
 async def client() -> AsyncClient:
+    # Авторизация проверяется отдельно, здесь подставляем аккаунт напрямую
+    app.dependency_overrides[get_current_account] = lambda: Account(id=1, login="testuser", is_blocked=False)
+    # Кэш всегда пуст, чтобы запрос доходил до репозитория
+    app.state.redis_repository = AsyncMock()
+    app.state.redis_repository.get.return_value = None
+    app.state.redis_repository.get_with_ttl.return_value = (None, None)
+    app.state.singleflight = SingleFlight()
+    app.state.prediction_cache = SoftTtlCache(app.state.redis_repository, singleflight=app.state.singleflight)
+    app.state.negative_cache = NegativeCache(app.state.redis_repository)
     # Используем новый, рекомендованный способ создания клиента
     async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
         yield ac
+    app.dependency_overrides.clear()
 
 
 @pytest.fixture
-def mock_prediction_service():
-    # Мокаем сервис предсказаний
-    mock_svc = MagicMock()
-    # Метод predict возвращает стандартный успешный ответ
-    mock_svc.predict.return_value = {"is_violation": False, "probability": 0.1}
-    mock_svc.model = "mock_model_exists" # Убеждаемся, что модель "загружена"
-    return mock_svc
+def mock_model():
+    # Мокаем модель: предсказание "нет нарушения" с вероятностью 0.1
+    model = MagicMock()
+    model.predict.return_value = np.array([0])
+    model.predict_proba.return_value = np.array([[0.9, 0.1]])
+    return model
 
 
 @pytest.fixture
@@ -32,24 +48,24 @@ def mock_item_repository():
     # Мокаем репозиторий
     mock_repo = MagicMock()
     # Создаем мок для асинхронного метода
-    mock_repo.get_item_with_seller_info = AsyncMock()
+    mock_repo.get_item_features = AsyncMock()
     return mock_repo
 
 
 @pytest.mark.asyncio
-async def test_simple_predict_success(client: AsyncClient, mock_prediction_service, mock_item_repository):
+async def test_simple_predict_success(client: AsyncClient, mock_model, mock_item_repository):
     """
     Тест успешного выполнения simple_predict.
     """
-    # Настраиваем мок репозитория: при вызове с item_id=1 он вернет тестовый Item
-    test_item = Item(
-        item_id=1, name="Test", description="Test desc", category=1,
-        images_qty=1, seller_id=1, is_verified_seller=True
-    )
-    mock_item_repository.get_item_with_seller_info.return_value = test_item
+    # Настраиваем мок репозитория: при вызове с item_id=1 он вернет признаки объявления
+    test_record = {
+        "item_id": 1, "is_verified_seller": True, "images_qty": 1,
+        "description_length": 9, "category": 1,
+    }
+    mock_item_repository.get_item_features.return_value = test_record
 
     # Подменяем реальные сервисы нашими моками в состоянии приложения
-    app.state.prediction_service = mock_prediction_service
+    app.state.prediction_service = PredictionService(mock_model)
     app.state.item_repository = mock_item_repository
 
     # Выполняем запрос
@@ -60,19 +76,23 @@ async def test_simple_predict_success(client: AsyncClient, mock_prediction_servi
     assert response.json()["is_violation"] is False
     
     # Проверяем, что метод репозитория был вызван с правильным item_id
-    mock_item_repository.get_item_with_seller_info.assert_awaited_once_with(1)
-    # Проверяем, что сервис предсказаний был вызван с данными, которые вернул репозиторий
-    mock_prediction_service.predict.assert_called_once_with(test_item)
+    mock_item_repository.get_item_features.assert_awaited_once_with(1)
+    # Проверяем, что модель получила признаки, построенные из записи репозитория
+    features = mock_model.predict_proba.call_args.args[0]
+    np.testing.assert_allclose(features, [PredictionService.build_features_from_record(test_record)])
+    # Предсказание пишется в кэш, только если объявление не успели отметить закрытым
+    assert app.state.redis_repository.set_unless.await_args.kwargs["guard"] == "item_missing:1"
 
 
 @pytest.mark.asyncio
-async def test_simple_predict_not_found(client: AsyncClient, mock_item_repository):
+async def test_simple_predict_not_found(client: AsyncClient, mock_model, mock_item_repository):
     """
     Тест случая, когда item_id не найден в базе данных.
     """
     # Настраиваем мок репозитория: при вызове он вернет None
-    mock_item_repository.get_item_with_seller_info.return_value = None
+    mock_item_repository.get_item_features.return_value = None
     app.state.item_repository = mock_item_repository
+    app.state.prediction_service = PredictionService(mock_model)
     # Сервис предсказаний нам здесь не важен
 
     # Выполняем запрос
@@ -80,10 +100,43 @@ async def test_simple_predict_not_found(client: AsyncClient, mock_item_repositor
 
     # Проверяем, что получили ошибку 404
     assert response.status_code == 404
-    assert "not found" in response.json()["detail"]
+    assert "не найдено" in response.json()["detail"]
     
     # Проверяем, что метод репозитория был вызван
-    mock_item_repository.get_item_with_seller_info.assert_awaited_once_with(999)
+    mock_item_repository.get_item_features.assert_awaited_once_with(999)
+
+
+@pytest.mark.asyncio
+async def test_missing_item_is_negatively_cached(client: AsyncClient, mock_model, mock_item_repository):
+    """
+    Тест негативного кэша: после первого 404 повторные запросы simple_predict и async_predict
+    к тому же объявлению не обращаются к БД.
+    """
+    stored = {}
+
+    async def set_value(key, value, ttl):
+        stored[key] = value
+
+    app.state.redis_repository.get.side_effect = lambda key: stored.get(key)
+    app.state.redis_repository.set.side_effect = set_value
+    mock_item_repository.get_item_features.return_value = None
+    mock_item_repository.get_item_with_seller_info = AsyncMock()
+    app.state.item_repository = mock_item_repository
+    app.state.moderation_result_repository = AsyncMock()
+    app.state.kafka_producer = AsyncMock()
+    app.state.prediction_service = PredictionService(mock_model)
+    hits_before = CACHE_NEGATIVE_HITS_TOTAL.labels(lookup="simple_predict")._value.get()
+
+    for _ in range(3):
+        response = await client.post("/simple_predict", params={"item_id": 999})
+        assert response.status_code == 404
+    response = await client.post("/async_predict", params={"item_id": 999})
+    assert response.status_code == 404
+
+    mock_item_repository.get_item_features.assert_awaited_once_with(999)
+    mock_item_repository.get_item_with_seller_info.assert_not_awaited()
+    assert CACHE_NEGATIVE_HITS_TOTAL.labels(lookup="simple_predict")._value.get() - hits_before == 2
+    app.state.redis_repository.set.assert_awaited_once_with("item_missing:999", True, ttl=60)
 
 
 @pytest.mark.asyncio
@@ -94,3 +147,27 @@ async def test_simple_predict_invalid_id(client: AsyncClient):
     """
     response = await client.post("/simple_predict", params={"item_id": 0})
     assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_final_moderation_result_is_cached_without_timestamps(client: AsyncClient):
+    """
+    Тест кэширования финального результата модерации: в кэш попадают только поля ответа,
+    даты записи из БД не сохраняются.
+    """
+    created_at = datetime(2024, 1, 1, 12, 0, 0)
+    moderation_repo = MagicMock()
+    moderation_repo.get_result_by_id = AsyncMock(return_value={
+        "task_id": 5, "item_id": 1, "status": "completed", "is_violation": True, "probability": 0.9,
+        "error_message": None, "created_at": created_at, "processed_at": created_at,
+    })
+    app.state.moderation_result_repository = moderation_repo
+
+    response = await client.get("/moderation_result/5")
+
+    assert response.status_code == 200
+    cached = {"task_id": 5, "status": "completed", "is_violation": True, "probability": 0.9, "error_message": None}
+    assert response.json() == cached
+    app.state.redis_repository.set_indexed.assert_awaited_once_with(
+        "moderation_result:5", cached, ttl=3600, index_key="item_tasks:1"
+    )
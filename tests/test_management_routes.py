@@ -1,5 +1,5 @@
 import pytest
-from unittest.mock import AsyncMock
+from unittest.mock import AsyncMock, MagicMock
 from fastapi.testclient import TestClient
 from main import app
 
@@ -11,9 +11,13 @@ def client():
     # Мокируем зависимости, чтобы сделать тесты быстрыми и изолированными (юнит-тесты)
     app.state.item_repository = AsyncMock()
     app.state.redis_repository = AsyncMock()
+    app.state.negative_cache = AsyncMock()
     app.state.user_repository = AsyncMock()
     app.state.moderation_result_repository = AsyncMock()
     app.state.prediction_service = MagicMock()
+    app.state.prediction_service.cache_key.side_effect = lambda item_id: f"prediction:current:{item_id}"
+    app.state.model_manager = MagicMock()
+    app.state.model_manager.previous_service = None
     app.state.kafka_producer = AsyncMock()
     return TestClient(app)
 
@@ -25,13 +29,43 @@ def test_close_item_success(client):
     """
     item_id_to_close = 123
     app.state.item_repository.close_item.return_value = item_id_to_close
+    app.state.redis_repository.delete_indexed.return_value = [f"moderation_result:{item_id_to_close}:1"]
 
     response = client.post(f"/close?item_id={item_id_to_close}")
 
     assert response.status_code == 200
     assert response.json() == {"message": f"Объявление {item_id_to_close} успешно закрыто."}
     app.state.item_repository.close_item.assert_awaited_once_with(item_id_to_close)
-    app.state.redis_repository.delete.assert_awaited_once_with(f"prediction:{item_id_to_close}")
+    app.state.redis_repository.delete_indexed.assert_awaited_once_with(
+        f"item_tasks:{item_id_to_close}", keys=[f"prediction:current:{item_id_to_close}"]
+    )
+    app.state.negative_cache.mark_missing.assert_awaited_once_with(item_id_to_close)
+
+def test_close_item_marks_missing_before_deleting_cache(client):
+    """
+    Юнит-тест: отметка о закрытии ставится до удаления кэша, чтобы прогрев не вернул удаленное предсказание.
+    """
+    calls = []
+    app.state.item_repository.close_item.return_value = 7
+    app.state.negative_cache.mark_missing.side_effect = lambda *args: calls.append("mark_missing")
+    app.state.redis_repository.delete_indexed.side_effect = lambda *args, **kwargs: calls.append("delete") or []
+
+    assert client.post("/close?item_id=7").status_code == 200
+    assert calls == ["mark_missing", "delete"]
+
+def test_close_item_deletes_prediction_of_rollback_model(client):
+    """
+    Юнит-тест: удаляется и предсказание модели для отката, иначе после отката закрытое объявление читалось бы из кэша.
+    """
+    app.state.item_repository.close_item.return_value = 5
+    app.state.model_manager.previous_service = MagicMock()
+    app.state.model_manager.previous_service.cache_key.side_effect = lambda item_id: f"prediction:previous:{item_id}"
+    app.state.redis_repository.delete_indexed.return_value = []
+
+    assert client.post("/close?item_id=5").status_code == 200
+    app.state.redis_repository.delete_indexed.assert_awaited_once_with(
+        "item_tasks:5", keys=["prediction:current:5", "prediction:previous:5"]
+    )
 
 def test_close_item_not_found(client):
     """
@@ -45,6 +79,9 @@ def test_close_item_not_found(client):
     assert response.status_code == 404
     assert response.json() == {"detail": f"Объявление с ID {item_id_to_close} не найдено."}
     app.state.item_repository.close_item.assert_awaited_once_with(item_id_to_close)
+    app.state.redis_repository.delete_indexed.assert_not_awaited()
+    # Отметку об отсутствии ставит только успешное закрытие: запрос к несуществующему id ничего не кэширует
+    app.state.negative_cache.mark_missing.assert_not_awaited()
 
 def test_close_item_invalid_id(client):
     """
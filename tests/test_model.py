@@ -0,0 +1,148 @@
+import json
+import os
+import subprocess
+import sys
+import time
+import numpy as np
+import pytest
+from types import SimpleNamespace
+
+import model
+from model import (
+    CompactLinearModel, train_model, save_model_compact, load_model_compact,
+    save_model_local, get_model, get_model_version,
+)
+from services.model_manager import ModelManager
+from services.prediction import PredictionService
+
+
+@pytest.fixture(scope="module")
+def trained_model():
+    return train_model()
+
+
+@pytest.fixture
+def model_dir(tmp_path, monkeypatch):
+    """Рабочая директория с артефактами модели, изолированная от репозитория."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("USE_MLFLOW", "false")
+    monkeypatch.delenv("MODEL_ARTIFACT_FORMAT", raising=False)
+    return tmp_path
+
+
+def test_compact_artifact_round_trip(trained_model, tmp_path):
+    """
+    Юнит-тест: модель из компактного артефакта предсказывает так же, как sklearn.
+    """
+    path = tmp_path / "model.npz"
+    save_model_compact(trained_model, path)
+    compact = load_model_compact(path)
+
+    features = np.random.default_rng(1).random((200, 4))
+    assert isinstance(compact, CompactLinearModel)
+    np.testing.assert_array_equal(compact.predict(features), trained_model.predict(features))
+    np.testing.assert_allclose(compact.predict_proba(features), trained_model.predict_proba(features), atol=1e-12)
+    assert compact.metadata["feature_columns"] == list(model.FEATURE_COLUMNS)
+
+
+def test_compact_artifact_uses_linear_scorer(trained_model, tmp_path):
+    """
+    Юнит-тест: для модели из компактного артефакта включается быстрый линейный скорер.
+    """
+    path = tmp_path / "model.npz"
+    save_model_compact(trained_model, path)
+    assert PredictionService(load_model_compact(path)).scorer is not None
+
+
+def test_compact_artifact_rejects_other_feature_spec(trained_model, tmp_path):
+    """
+    Юнит-тест: артефакт с другой спецификацией признаков не загружается.
+    """
+    path = tmp_path / "model.npz"
+    save_model_compact(trained_model, path)
+    with np.load(path) as data:
+        arrays = dict(data)
+    metadata = json.loads(str(arrays["metadata"]))
+    metadata["feature_columns"] = ["category", "images_qty", "description_length", "is_verified_seller"]
+    arrays["metadata"] = np.array(json.dumps(metadata))
+    np.savez(path, **arrays)
+
+    with pytest.raises(ValueError):
+        load_model_compact(path)
+
+
+def test_get_model_converts_pickle_to_compact(trained_model, model_dir):
+    """
+    Юнит-тест: при наличии только pickle get_model создает компактный артефакт,
+    и следующая загрузка идет из него.
+    """
+    save_model_local(trained_model)
+    pickle_version = get_model_version()
+
+    first = get_model()
+    assert (model_dir / "model.npz").exists()
+    # Конвертация не меняет версию: это та же модель
+    assert get_model_version() == pickle_version
+
+    second = get_model()
+    assert isinstance(second, CompactLinearModel)
+    features = np.random.default_rng(2).random((10, 4))
+    np.testing.assert_allclose(second.predict_proba(features), first.predict_proba(features), atol=1e-12)
+
+
+async def build_service(model) -> PredictionService:
+    return PredictionService(model)
+
+
+@pytest.mark.asyncio
+async def test_rolled_back_version_stays_rejected_after_conversion(trained_model, model_dir):
+    """
+    Юнит-тест: после конвертации нового pickle в компактный артефакт и отката
+    наблюдатель не загружает отклоненную модель снова.
+    """
+    now = time.time()
+    save_model_local(trained_model)
+    os.utime(model_dir / "model.pkl", (now - 20, now - 20))
+    state = SimpleNamespace(prediction_service=None)
+    manager = ModelManager(state, build_service)
+    first_version = await manager.reload()
+    os.utime(model_dir / "model.npz", (now - 15, now - 15))
+
+    save_model_local(train_model())
+    os.utime(model_dir / "model.pkl", (now - 10, now - 10))
+    assert await manager.check_for_update() is True
+    rejected_version = manager.current_version
+    assert rejected_version.startswith("file:model.pkl:")
+
+    await manager.rollback()
+
+    assert manager.current_version == first_version
+    assert get_model_version() == rejected_version
+    assert await manager.check_for_update() is False
+    assert manager.current_version == first_version
+
+
+def test_pickle_format_can_be_forced(trained_model, model_dir, monkeypatch):
+    """
+    Юнит-тест: MODEL_ARTIFACT_FORMAT=pickle отключает компактный артефакт.
+    """
+    monkeypatch.setenv("MODEL_ARTIFACT_FORMAT", "pickle")
+    save_model_local(trained_model)
+
+    loaded = get_model()
+
+    assert not isinstance(loaded, CompactLinearModel)
+    assert not (model_dir / "model.npz").exists()
+
+
+def test_import_does_not_load_mlflow_or_sklearn():
+    """
+    Юнит-тест: импорт модуля модели и загрузка компактного артефакта не тянут mlflow и sklearn.
+    """
+    code = (
+        "import sys, model; "
+        "m = model.load_model_compact(); "
+        "print(m is not None, 'mlflow' in sys.modules, 'sklearn' in sys.modules)"
+    )
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert output.split() == ["True", "False", "False"]
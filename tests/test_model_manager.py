@@ -0,0 +1,123 @@
+import pytest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from model import train_model
+from services.model_manager import ModelManager, ModelRollbackError
+from services.prediction import PredictionService
+
+
+class FakeSource:
+    """Источник моделей: версия меняется при публикации новой модели."""
+    def __init__(self):
+        self.version = "v1"
+        self.model = train_model()
+        self.loads = 0
+
+    def publish(self, version, model=None):
+        self.version = version
+        self.model = model or train_model()
+
+    def load(self):
+        self.loads += 1
+        return self.model
+
+    def get_version(self):
+        return self.version
+
+
+async def build_service(model) -> PredictionService:
+    return PredictionService(model)
+
+
+@pytest.fixture
+def source():
+    return FakeSource()
+
+
+@pytest.fixture
+def state():
+    return SimpleNamespace(prediction_service=None)
+
+
+@pytest.fixture
+def manager(state, source):
+    return ModelManager(state, build_service, load_model=source.load, get_version=source.get_version)
+
+
+@pytest.mark.asyncio
+async def test_reload_swaps_service_and_keeps_previous(manager, state, source):
+    """
+    Юнит-тест: новая версия подменяет сервис, а старый остается для отката.
+    """
+    await manager.reload()
+    first_service = state.prediction_service
+    assert manager.current_version == "v1"
+
+    source.publish("v2")
+    assert await manager.check_for_update() is True
+
+    assert state.prediction_service is not first_service
+    assert state.prediction_service.model is source.model
+    assert manager.current_version == "v2"
+    assert manager.previous_version == "v1"
+
+
+@pytest.mark.asyncio
+async def test_check_for_update_skips_same_version(manager, source):
+    """
+    Юнит-тест: без новой версии модель повторно не загружается.
+    """
+    await manager.reload()
+    assert await manager.check_for_update() is False
+    assert source.loads == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_warmup_keeps_current_service(manager, state, source):
+    """
+    Юнит-тест: если новая модель не прошла прогрев, трафик остается на текущей.
+    """
+    await manager.reload()
+    current_service = state.prediction_service
+
+    broken_model = MagicMock()
+    broken_model.predict.side_effect = ValueError("broken")
+    source.publish("v2", broken_model)
+    with pytest.raises(ValueError):
+        await manager.reload()
+
+    assert state.prediction_service is current_service
+    assert manager.current_version == "v1"
+
+
+@pytest.mark.asyncio
+async def test_rollback_restores_previous_and_is_not_undone_by_watcher(manager, state, source):
+    """
+    Юнит-тест: откат возвращает прежний сервис, и наблюдатель не загружает
+    отклоненную версию снова.
+    """
+    await manager.reload()
+    first_service = state.prediction_service
+    source.publish("v2")
+    await manager.reload()
+
+    await manager.rollback()
+
+    assert state.prediction_service is first_service
+    assert manager.current_version == "v1"
+    assert await manager.check_for_update() is False
+
+    source.publish("v3")
+    assert await manager.check_for_update() is True
+    assert manager.current_version == "v3"
+
+
+@pytest.mark.asyncio
+async def test_rollback_without_previous(manager):
+    """
+    Юнит-тест: откат без предыдущей версии невозможен.
+    """
+    await manager.reload()
+    with pytest.raises(ModelRollbackError):
+        await manager.rollback()
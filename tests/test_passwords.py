@@ -0,0 +1,123 @@
+import asyncio
+import hashlib
+import threading
+import pytest
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock
+
+from repositories.accounts import AccountRepository
+from services.passwords import PasswordHasher
+
+
+def make_hasher(**kwargs) -> PasswordHasher:
+    # Дешевые параметры scrypt, чтобы тесты шли быстро
+    return PasswordHasher(n=2 ** 4, r=1, p=1, **kwargs)
+
+
+def make_pool(row: dict | None):
+    conn = MagicMock()
+    conn.fetchrow = AsyncMock(return_value=row)
+    conn.execute = AsyncMock()
+    pool = MagicMock()
+
+    @asynccontextmanager
+    async def acquire():
+        yield conn
+
+    pool.acquire = acquire
+    return pool, conn
+
+
+def test_hash_is_salted_and_verifiable():
+    """
+    Юнит-тест: одинаковые пароли дают разные хэши, и каждый из них проверяется.
+    """
+    hasher = make_hasher()
+    first, second = hasher.hash_sync("secret"), hasher.hash_sync("secret")
+
+    assert first != second
+    assert hasher.verify_sync("secret", first) == (True, False)
+    assert hasher.verify_sync("wrong", first) == (False, False)
+    assert hasher.verify_sync("secret", "garbage") == (False, False)
+
+
+def test_legacy_md5_and_weaker_params_need_rehash():
+    """
+    Юнит-тест: MD5-хэши прежнего формата и хэши со старыми параметрами KDF проверяются,
+    но помечаются как требующие перехэширования.
+    """
+    hasher = make_hasher()
+    legacy = hashlib.md5(b"secret").hexdigest()
+    weaker = PasswordHasher(n=2 ** 2, r=1, p=1).hash_sync("secret")
+
+    assert hasher.verify_sync("secret", legacy) == (True, True)
+    assert hasher.verify_sync("wrong", legacy) == (False, True)
+    assert hasher.verify_sync("secret", weaker) == (True, True)
+
+
+@pytest.mark.asyncio
+async def test_hashing_runs_off_loop_with_bounded_concurrency():
+    """
+    Юнит-тест: хэширование идет в потоках пула, одновременно не больше max_workers вычислений.
+    """
+    hasher = make_hasher(max_workers=2)
+    loop_thread = threading.get_ident()
+    active = 0
+    peak = 0
+    threads = set()
+    lock = threading.Lock()
+    original = hasher.hash_sync
+
+    def tracked_hash(password):
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        threads.add(threading.get_ident())
+        try:
+            return original(password)
+        finally:
+            with lock:
+                active -= 1
+
+    hasher.hash_sync = tracked_hash
+    hashes = await asyncio.gather(*(hasher.hash(f"password{i}") for i in range(8)))
+
+    assert len(set(hashes)) == 8
+    assert loop_thread not in threads
+    assert peak <= 2
+    hasher.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_login_rehashes_legacy_md5_password():
+    """
+    Юнит-тест: успешный вход с MD5-хэшем заменяет его на scrypt условным UPDATE.
+    """
+    legacy = hashlib.md5(b"secret").hexdigest()
+    pool, conn = make_pool({"id": 7, "login": "seller", "is_blocked": False, "password": legacy})
+    repository = AccountRepository(pool, hasher=make_hasher())
+
+    account = await repository.get_by_login_and_password("seller", "secret")
+
+    assert account.id == 7
+    query, account_id, new_hash, old_hash = conn.execute.await_args.args
+    assert query.startswith("UPDATE account SET password")
+    assert (account_id, old_hash) == (7, legacy)
+    assert repository.hasher.verify_sync("secret", new_hash) == (True, False)
+
+
+@pytest.mark.asyncio
+async def test_login_with_wrong_password_or_unknown_login_fails():
+    """
+    Юнит-тест: неверный пароль и неизвестный логин возвращают None и ничего не перехэшируют.
+    """
+    hasher = make_hasher()
+    pool, conn = make_pool({"id": 7, "login": "seller", "is_blocked": False, "password": hasher.hash_sync("secret")})
+    repository = AccountRepository(pool, hasher=hasher)
+    assert await repository.get_by_login_and_password("seller", "wrong") is None
+
+    pool, conn = make_pool(None)
+    repository = AccountRepository(pool, hasher=hasher)
+    assert await repository.get_by_login_and_password("nobody", "secret") is None
+    conn.execute.assert_not_awaited()
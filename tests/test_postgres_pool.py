@@ -0,0 +1,109 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.clients import postgres
+from app.clients.postgres import InstrumentedPool, create_pool
+from prometheus_client import REGISTRY
+
+
+def make_asyncpg_pool(min_size: int = 2):
+    connection = AsyncMock()
+    pool = MagicMock()
+    pool.acquire = AsyncMock(return_value=connection)
+    pool.release = AsyncMock()
+    pool.close = AsyncMock()
+    pool.get_min_size.return_value = min_size
+    pool.get_max_size.return_value = 10
+    pool.get_size.return_value = 4
+    pool.get_idle_size.return_value = 1
+    return pool, connection
+
+
+def acquire_count(name: str) -> float:
+    return REGISTRY.get_sample_value("db_pool_acquire_wait_seconds_count", {"pool": name}) or 0.0
+
+
+@pytest.mark.asyncio
+async def test_acquire_records_wait_and_releases_connection():
+    """
+    Юнит-тест: acquire() измеряет ожидание соединения и возвращает его в пул после блока.
+    """
+    raw_pool, connection = make_asyncpg_pool()
+    pool = InstrumentedPool(raw_pool, "test_acquire")
+    before = acquire_count("test_acquire")
+
+    async with pool.acquire() as conn:
+        assert conn is connection
+        raw_pool.release.assert_not_awaited()
+
+    raw_pool.release.assert_awaited_once_with(connection)
+    assert acquire_count("test_acquire") - before == 1
+
+
+def test_connection_gauges_follow_pool_state():
+    """
+    Юнит-тест: db_pool_connections отражает открытые, занятые и допустимые соединения пула.
+    """
+    raw_pool, _ = make_asyncpg_pool()
+    InstrumentedPool(raw_pool, "test_gauges")
+
+    def sample(state: str) -> float:
+        return REGISTRY.get_sample_value("db_pool_connections", {"pool": "test_gauges", "state": state})
+
+    assert (sample("open"), sample("in_use"), sample("max")) == (4, 3, 10)
+    raw_pool.get_idle_size.return_value = 4
+    assert sample("in_use") == 0
+
+
+@pytest.mark.asyncio
+async def test_warm_checks_min_size_connections():
+    """
+    Юнит-тест: прогрев проверяет запросом min_size соединений и возвращает их все в пул.
+    """
+    raw_pool, connection = make_asyncpg_pool(min_size=3)
+    pool = InstrumentedPool(raw_pool, "test_warm")
+
+    assert await pool.warm() == 3
+    assert connection.fetchval.await_count == 3
+    assert raw_pool.release.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_create_pool_passes_settings_and_init_sql(monkeypatch):
+    """
+    Юнит-тест: настройки из окружения передаются в asyncpg, а init выполняет DB_CONNECTION_INIT_SQL на соединении.
+    """
+    raw_pool, _ = make_asyncpg_pool(min_size=1)
+    asyncpg_create_pool = AsyncMock(return_value=raw_pool)
+    monkeypatch.setattr(postgres.asyncpg, "create_pool", asyncpg_create_pool)
+
+    pool = await create_pool(
+        "postgresql://db", name="test_create", min_size=1, max_size=5, statement_cache_size=0,
+        init_sql="SET statement_timeout = '5s'",
+    )
+
+    kwargs = asyncpg_create_pool.await_args.kwargs
+    assert (kwargs["min_size"], kwargs["max_size"], kwargs["statement_cache_size"]) == (1, 5, 0)
+    assert kwargs["server_settings"] == {"application_name": "test_create"}
+    new_connection = AsyncMock()
+    await kwargs["init"](new_connection)
+    new_connection.execute.assert_awaited_once_with("SET statement_timeout = '5s'")
+    # Остальные методы пула доступны через обертку
+    await pool.close()
+    raw_pool.close.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_create_pool_closes_pool_when_warm_fails(monkeypatch):
+    """
+    Юнит-тест: если прогрев не удался, пул закрывается и ошибка доходит до старта приложения.
+    """
+    raw_pool, connection = make_asyncpg_pool(min_size=1)
+    connection.fetchval.side_effect = ConnectionError("db down")
+    monkeypatch.setattr(postgres.asyncpg, "create_pool", AsyncMock(return_value=raw_pool))
+
+    with pytest.raises(ConnectionError):
+        await create_pool("postgresql://db", name="test_warm_fails")
+
+    raw_pool.release.assert_awaited_once_with(connection)
+    raw_pool.close.assert_awaited_once()
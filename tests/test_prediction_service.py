@@ -0,0 +1,282 @@
+import asyncio
+import numpy as np
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from sklearn.linear_model import LogisticRegression
+
+from model import train_model, save_model_compact, load_model_compact
+from models.schemas import Item
+from services.prediction import ItemNotFoundError, LinearScorer, MicroBatcher, PredictionService
+
+
+@pytest.fixture(scope="module")
+def model():
+    return train_model()
+
+
+def make_item(item_id: int = 1, **overrides) -> Item:
+    data = dict(
+        item_id=item_id, name="Test", description="Test desc", category=1,
+        images_qty=1, seller_id=1, is_verified_seller=True
+    )
+    data.update(overrides)
+    return Item(**data)
+
+
+def test_predict_returns_label_and_probability(model):
+    """
+    Юнит-тест: predict возвращает метку и вероятность нарушения.
+    """
+    service = PredictionService(model)
+    result = service.predict(make_item())
+
+    assert set(result) == {"is_violation", "probability"}
+    assert 0.0 <= result["probability"] <= 1.0
+
+
+def test_predict_without_model():
+    """
+    Юнит-тест: без загруженной модели predict выбрасывает RuntimeError.
+    """
+    service = PredictionService(None)
+    with pytest.raises(RuntimeError):
+        service.predict(make_item())
+
+
+@pytest.mark.asyncio
+async def test_batching_scores_concurrent_requests_in_one_call(model):
+    """
+    Юнит-тест: конкурентные запросы объединяются в один вызов модели,
+    и каждый получает свой результат.
+    """
+    wrapped = MagicMock(wraps=model)
+    service = PredictionService(wrapped)
+    await service.start_batching(max_batch_size=16, max_wait_ms=50)
+    try:
+        items = [
+            make_item(i, is_verified_seller=i % 2 == 0, images_qty=i % 5)
+            for i in range(1, 9)
+        ]
+        results = await asyncio.gather(*(service.predict_async(item) for item in items))
+    finally:
+        await service.stop_batching()
+
+    assert wrapped.predict_proba.call_count == 1
+    assert wrapped.predict_proba.call_args.args[0].shape == (8, 4)
+    expected = [PredictionService(model).predict(item) for item in items]
+    for result, single in zip(results, expected):
+        assert result["is_violation"] == single["is_violation"]
+        assert result["probability"] == pytest.approx(single["probability"])
+
+
+@pytest.mark.asyncio
+async def test_batching_respects_max_batch_size(model):
+    """
+    Юнит-тест: батч не превышает max_batch_size.
+    """
+    wrapped = MagicMock(wraps=model)
+    service = PredictionService(wrapped)
+    await service.start_batching(max_batch_size=3, max_wait_ms=50)
+    try:
+        await asyncio.gather(*(service.predict_async(make_item(i)) for i in range(1, 8)))
+    finally:
+        await service.stop_batching()
+
+    sizes = [call.args[0].shape[0] for call in wrapped.predict_proba.call_args_list]
+    assert sizes == [3, 3, 1]
+
+
+@pytest.mark.asyncio
+async def test_batching_propagates_model_errors():
+    """
+    Юнит-тест: ошибка модели доставляется каждому запросу батча.
+    """
+    broken_model = MagicMock()
+    broken_model.predict.side_effect = ValueError("boom")
+    service = PredictionService(broken_model)
+    await service.start_batching(max_batch_size=4, max_wait_ms=10)
+    try:
+        results = await asyncio.gather(
+            service.predict_async(make_item(1)),
+            service.predict_async(make_item(2)),
+            return_exceptions=True,
+        )
+    finally:
+        await service.stop_batching()
+
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("max_batch_size, max_wait_ms", [(1, 0), (4, 1000)])
+async def test_stop_fails_requests_taken_from_queue(max_batch_size, max_wait_ms):
+    """
+    Юнит-тест: остановка во время оценки батча или его сборки не оставляет запросы этого батча
+    ждать вечно.
+    """
+    scoring = asyncio.Event()
+
+    async def slow_score(features):
+        scoring.set()
+        await asyncio.sleep(10)
+
+    batcher = MicroBatcher(slow_score, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    await batcher.start()
+    submit = asyncio.create_task(batcher.submit([0.0, 0.0, 0.0, 0.0]))
+    if max_batch_size == 1:
+        await asyncio.wait_for(scoring.wait(), 1)
+    else:
+        # Запрос взят из очереди, батч еще собирается
+        while not batcher._batch:
+            await asyncio.sleep(0)
+
+    await batcher.stop()
+
+    with pytest.raises(RuntimeError):
+        await asyncio.wait_for(submit, 1)
+
+
+def test_cache_key_follows_model_weights(model, tmp_path):
+    """
+    Юнит-тест: ключ кэша одинаков для одних и тех же весов (в том числе из компактного артефакта)
+    и меняется вместе с моделью, поэтому предсказания прежней модели после смены не читаются.
+    """
+    path = tmp_path / "model.npz"
+    save_model_compact(model, path)
+    other = LogisticRegression(C=0.01).fit(np.random.default_rng(0).random((50, 4)), np.arange(50) % 2)
+
+    key = PredictionService(model).cache_key(7)
+    assert key.startswith("prediction:") and key.endswith(":7")
+    assert PredictionService(load_model_compact(path)).cache_key(7) == key
+    assert PredictionService(other).cache_key(7) != key
+
+
+def test_linear_scorer_matches_sklearn(model):
+    """
+    Юнит-тест: быстрый линейный скорер совпадает с predict/predict_proba sklearn.
+    """
+    scorer = LinearScorer.from_model(model)
+    assert scorer is not None
+
+    features = np.random.default_rng(0).random((500, 4)) * 3 - 1
+    labels, probas = scorer.score(features)
+
+    np.testing.assert_array_equal(labels, model.predict(features))
+    np.testing.assert_allclose(probas, model.predict_proba(features)[:, 1], rtol=1e-12, atol=1e-15)
+
+
+def test_prediction_service_uses_linear_scorer(model):
+    """
+    Юнит-тест: для логистической регрессии сервис не вызывает sklearn на запросе.
+    """
+    service = PredictionService(model)
+    assert service.scorer is not None
+
+    features = np.array([PredictionService.build_features(make_item())])
+    expected_label = model.predict(features)[0] == 1
+    expected_proba = model.predict_proba(features)[0][1]
+
+    with patch.object(LogisticRegression, "predict") as predict, \
+            patch.object(LogisticRegression, "predict_proba") as predict_proba:
+        result = service.predict(make_item())
+    predict.assert_not_called()
+    predict_proba.assert_not_called()
+    assert result["is_violation"] == expected_label
+    assert result["probability"] == pytest.approx(expected_proba)
+
+
+def test_other_models_fall_back_to_generic_path():
+    """
+    Юнит-тест: модели без линейного скорера обслуживаются через predict/predict_proba.
+    """
+    other_model = MagicMock()
+    other_model.predict.return_value = np.array([1])
+    other_model.predict_proba.return_value = np.array([[0.2, 0.8]])
+
+    service = PredictionService(other_model)
+    result = service.predict(make_item())
+
+    assert service.scorer is None
+    assert result == {"is_violation": True, "probability": 0.8}
+
+
+def test_build_feature_matrix_matches_row_features():
+    """
+    Юнит-тест: поколоночная сборка матрицы совпадает с построчной.
+    """
+    items = [
+        make_item(i, is_verified_seller=i % 2 == 0, images_qty=i, description="x" * i * 10, category=i)
+        for i in range(1, 6)
+    ]
+    matrix = PredictionService.build_feature_matrix(items)
+    rows = np.array([PredictionService.build_features(item) for item in items])
+
+    np.testing.assert_allclose(matrix, rows)
+
+
+def test_predict_batch_uses_one_model_call(model):
+    """
+    Юнит-тест: predict_batch оценивает все объявления одним вызовом модели.
+    """
+    wrapped = MagicMock(wraps=model)
+    service = PredictionService(wrapped)
+    items = [make_item(i, images_qty=i) for i in range(1, 11)]
+
+    results = service.predict_batch(items)
+
+    assert len(results) == 10
+    assert wrapped.predict_proba.call_count == 1
+    assert service.predict_batch([]) == []
+
+
+def test_record_features_match_item_features():
+    """
+    Юнит-тест: признаки из записи БД совпадают с признаками из Item.
+    """
+    items = [make_item(i, is_verified_seller=i % 2 == 0, images_qty=i, description="x" * i) for i in range(1, 6)]
+    records = [
+        {
+            "item_id": item.item_id,
+            "is_verified_seller": item.is_verified_seller,
+            "images_qty": item.images_qty,
+            "description_length": len(item.description),
+            "category": item.category,
+        }
+        for item in items
+    ]
+
+    assert PredictionService.build_features_from_record(records[0]) == PredictionService.build_features(items[0])
+    np.testing.assert_allclose(
+        PredictionService.build_feature_matrix_from_records(records),
+        PredictionService.build_feature_matrix(items),
+    )
+
+
+@pytest.mark.asyncio
+async def test_simple_predict_uses_feature_record(model):
+    """
+    Юнит-тест: simple_predict берет из репозитория только признаки, а не Item.
+    """
+    repository = MagicMock()
+    repository.get_item_features = AsyncMock(return_value={
+        "item_id": 1, "is_verified_seller": True, "images_qty": 1,
+        "description_length": 9, "category": 1,
+    })
+    service = PredictionService(model)
+
+    result = await service.simple_predict(1, repository)
+
+    assert result == service.predict(make_item())
+    repository.get_item_with_seller_info.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_simple_predict_not_found(model):
+    """
+    Юнит-тест: отсутствующее объявление приводит к ItemNotFoundError.
+    """
+    repository = MagicMock()
+    repository.get_item_features = AsyncMock(return_value=None)
+
+    with pytest.raises(ItemNotFoundError):
+        await PredictionService(model).simple_predict(999, repository)
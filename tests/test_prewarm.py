@@ -0,0 +1,112 @@
+import time
+import pytest
+from unittest.mock import AsyncMock
+
+from model import train_model
+from services.executor import ExecutorOverloadedError
+from services.prediction import PredictionService
+from services.prewarm import CachePrewarmer
+
+
+class FakeItemRepository:
+    """Отдает страницы открытых объявлений по keyset-пагинации и запоминает запросы."""
+    def __init__(self, count: int, closed: set[int] = frozenset()):
+        self.records = [
+            {"item_id": i, "is_verified_seller": i % 2 == 0, "images_qty": i % 10,
+             "description_length": 10 * i, "category": i % 100}
+            for i in range(1, count + 1) if i not in closed
+        ]
+        self.pages: list[tuple[int, int]] = []
+
+    async def get_open_items_features_page(self, after_id: int, limit: int):
+        self.pages.append((after_id, limit))
+        return [r for r in self.records if r["item_id"] > after_id][:limit]
+
+
+@pytest.fixture(scope="module")
+def prediction_service():
+    return PredictionService(train_model())
+
+
+@pytest.mark.asyncio
+async def test_prewarm_writes_predictions_for_all_open_items(prediction_service):
+    """
+    Юнит-тест: прогрев обходит открытые объявления страницами с конца предыдущей
+    и пишет каждую страницу одним set_many_unless с джиттером TTL.
+    """
+    items = FakeItemRepository(count=7, closed={3})
+    redis_repository = AsyncMock()
+    prewarmer = CachePrewarmer(
+        items, redis_repository, lambda: prediction_service, chunk_size=3, max_items_per_second=0
+    )
+
+    status = await prewarmer.run()
+
+    assert status["status"] == "completed"
+    assert status["items"] == 6
+    assert items.pages == [(0, 3), (4, 3), (7, 3)]
+    assert redis_repository.set_many_unless.await_count == 2
+    written = {}
+    for c in redis_repository.set_many_unless.await_args_list:
+        written.update(c.args[0])
+        # Каждое предсказание пишется, только если объявление не отмечено закрытым
+        assert c.kwargs["guards"] == [f"item_missing:{key.rsplit(':', 1)[1]}" for key in c.args[0]]
+        assert (c.kwargs["ttl"], c.kwargs["ttl_jitter"]) == (3600, 0.1)
+    assert list(written) == [prediction_service.cache_key(i) for i in (1, 2, 4, 5, 6, 7)]
+    expected = prediction_service.predict_features(
+        PredictionService.build_feature_matrix_from_records(items.records)
+    )
+    assert list(written.values()) == expected
+
+
+@pytest.mark.asyncio
+async def test_prewarm_retries_page_when_executor_is_overloaded(prediction_service):
+    """
+    Юнит-тест: при переполненной очереди исполнителя прогрев ждет и повторяет ту же страницу.
+    """
+    service = AsyncMock()
+    service.predict_features_async.side_effect = [
+        ExecutorOverloadedError("full"), [{"is_violation": False, "probability": 0.1}]
+    ]
+    redis_repository = AsyncMock()
+    prewarmer = CachePrewarmer(
+        FakeItemRepository(count=1), redis_repository, lambda: service,
+        max_items_per_second=0, overload_backoff=0.01,
+    )
+
+    status = await prewarmer.run()
+
+    assert status["status"] == "completed"
+    assert service.predict_features_async.await_count == 2
+    redis_repository.set_many_unless.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_prewarm_respects_rate_limit(prediction_service):
+    """
+    Юнит-тест: прогрев не обгоняет max_items_per_second.
+    """
+    prewarmer = CachePrewarmer(
+        FakeItemRepository(count=8), AsyncMock(), lambda: prediction_service,
+        chunk_size=2, max_items_per_second=40,
+    )
+
+    start = time.monotonic()
+    status = await prewarmer.run()
+
+    assert status["items"] == 8
+    assert time.monotonic() - start >= 8 / 40 - 0.01
+
+
+@pytest.mark.asyncio
+async def test_prewarm_fails_without_model():
+    """
+    Юнит-тест: без загруженной модели прогрев завершается со статусом failed и ничего не пишет.
+    """
+    redis_repository = AsyncMock()
+    prewarmer = CachePrewarmer(FakeItemRepository(count=2), redis_repository, lambda: None)
+
+    status = await prewarmer.run()
+
+    assert status["status"] == "failed"
+    redis_repository.set_many_unless.assert_not_awaited()
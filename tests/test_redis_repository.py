@@ -1,7 +1,8 @@
 import pytest
-from unittest.mock import AsyncMock
+from unittest.mock import AsyncMock, MagicMock, call
 
 from repositories.redis_repository import RedisRepository
+from repositories.codecs import BinaryCodec
 
 @pytest.mark.asyncio
 async def test_redis_repository_set_get():
@@ -51,3 +52,159 @@ async def test_redis_repository_delete():
     await repo.delete(test_key)
 
     repo.client.delete.assert_called_once_with(test_key)
+
+@pytest.mark.asyncio
+async def test_redis_repository_get_many_keeps_order_and_missing_keys():
+    """
+    Юнит-тест: get_many читает ключи одним MGET и возвращает None на месте отсутствующих.
+    """
+    repo = RedisRepository()
+    repo.client = AsyncMock()
+    repo.client.mget.return_value = ['{"a": 1}', None, '{"c": 3}']
+
+    values = await repo.get_many(["a", "b", "c"])
+
+    repo.client.mget.assert_awaited_once_with(["a", "b", "c"])
+    assert values == [{"a": 1}, None, {"c": 3}]
+    assert await repo.get_many([]) == []
+    repo.client.mget.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_redis_repository_set_many_uses_pipeline():
+    """
+    Юнит-тест: set_many отправляет все SET EX одним pipeline без транзакции.
+    """
+    repo = RedisRepository()
+    repo.client = MagicMock()
+    pipe = MagicMock()
+    pipe.execute = AsyncMock()
+    repo.client.pipeline.return_value.__aenter__.return_value = pipe
+
+    await repo.set_many({"a": {"x": 1}, "b": {"x": 2}}, ttl=60)
+
+    repo.client.pipeline.assert_called_once_with(transaction=False)
+    assert pipe.set.call_args_list == [
+        call("a", '{"x": 1}', ex=60),
+        call("b", '{"x": 2}', ex=60),
+    ]
+    pipe.execute.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_redis_repository_delete_many():
+    """
+    Юнит-тест: delete_many удаляет ключи одной командой DEL и ничего не делает для пустого списка.
+    """
+    repo = RedisRepository()
+    repo.client = AsyncMock()
+
+    await repo.delete_many([])
+    await repo.delete_many(["a", "b"])
+
+    repo.client.delete.assert_awaited_once_with("a", "b")
+
+@pytest.mark.asyncio
+async def test_redis_repository_uses_codec():
+    """
+    Юнит-тест: значения пишутся и читаются через кодек, нечитаемое значение считается промахом.
+    """
+    repo = RedisRepository(codec=BinaryCodec())
+    repo.client = AsyncMock()
+    value = {"is_violation": False, "probability": 0.25}
+
+    await repo.set("prediction:1", value, ttl=60)
+    stored = repo.client.set.call_args.args[1]
+    assert isinstance(stored, bytes)
+
+    repo.client.get.return_value = stored
+    assert await repo.get("prediction:1") == value
+
+    repo.client.get.return_value = b"\x00\x09\x01"
+    assert await repo.get("prediction:1") is None
+
+@pytest.mark.asyncio
+async def test_redis_repository_indexed_keys():
+    """
+    Юнит-тест: set_indexed пишет значение и индекс одним скриптом, delete_indexed удаляет
+    индекс вместе с дополнительными ключами и возвращает найденные в индексе ключи строками.
+    """
+    repo = RedisRepository()
+    repo.client = AsyncMock()
+
+    await repo.set_indexed("moderation_result:5", {"status": "completed"}, ttl=60, index_key="item_tasks:1")
+    args = repo.client.eval.call_args.args
+    assert args[1:6] == (2, "moderation_result:5", "item_tasks:1", '{"status": "completed"}', 60)
+    # Score в индексе - момент истечения ключа
+    assert args[7] == pytest.approx(args[6] + 60)
+
+    repo.client.eval.return_value = [b"moderation_result:5", b"moderation_result:6"]
+    deleted = await repo.delete_indexed("item_tasks:1", keys=["prediction:1"])
+
+    assert deleted == ["moderation_result:5", "moderation_result:6"]
+    assert repo.client.eval.call_args.args[1:4] == (2, "item_tasks:1", "prediction:1")
+
+@pytest.mark.asyncio
+async def test_redis_repository_set_many_unless_passes_guards():
+    """
+    Юнит-тест: set_many_unless передает скрипту ключи, затем стоп-ключи, затем пары значение-TTL.
+    """
+    repo = RedisRepository()
+    repo.client = AsyncMock()
+    repo.client.eval.return_value = 1
+
+    written = await repo.set_many_unless(
+        {"prediction:1": {"p": 1}, "prediction:2": {"p": 2}},
+        guards=["item_missing:1", "item_missing:2"], ttl=60,
+    )
+
+    assert written == 1
+    assert repo.client.eval.call_args.args[1:] == (
+        4, "prediction:1", "prediction:2", "item_missing:1", "item_missing:2", '{"p": 1}', 60, '{"p": 2}', 60
+    )
+    assert await repo.set_many_unless({}, guards=[], ttl=60) == 0
+
+@pytest.mark.asyncio
+async def test_redis_repository_set_unless_passes_guard():
+    """
+    Юнит-тест: set_unless передает скрипту ключ, стоп-ключ, значение и TTL и сообщает, записан ли ключ.
+    """
+    repo = RedisRepository()
+    repo.client = AsyncMock()
+    repo.client.eval.return_value = 0
+
+    assert await repo.set_unless("prediction:1", {"p": 1}, ttl=60, guard="item_missing:1") is False
+    assert repo.client.eval.call_args.args[1:] == (2, "prediction:1", "item_missing:1", '{"p": 1}', 60)
+
+@pytest.mark.asyncio
+async def test_redis_repository_set_many_jitters_ttl():
+    """
+    Юнит-тест: с ttl_jitter TTL каждого ключа случайно сокращается, но не больше чем на заданную долю.
+    """
+    repo = RedisRepository()
+    repo.client = MagicMock()
+    pipe = MagicMock()
+    pipe.execute = AsyncMock()
+    repo.client.pipeline.return_value.__aenter__.return_value = pipe
+
+    await repo.set_many({f"k{i}": i for i in range(200)}, ttl=1000, ttl_jitter=0.1)
+
+    ttls = [c.kwargs["ex"] for c in pipe.set.call_args_list]
+    assert all(900 <= ttl <= 1000 for ttl in ttls)
+    assert len(set(ttls)) > 1
+
+@pytest.mark.asyncio
+async def test_redis_repository_get_with_ttl():
+    """
+    Юнит-тест: get_with_ttl читает значение и PTTL одним pipeline; у отсутствующего ключа TTL - None.
+    """
+    repo = RedisRepository()
+    repo.client = MagicMock()
+    pipe = MagicMock()
+    pipe.execute = AsyncMock(return_value=['{"x": 1}', 1500])
+    repo.client.pipeline.return_value.__aenter__.return_value = pipe
+
+    assert await repo.get_with_ttl("a") == ({"x": 1}, 1.5)
+    pipe.get.assert_called_once_with("a")
+    pipe.pttl.assert_called_once_with("a")
+
+    pipe.execute.return_value = [None, -2]
+    assert await repo.get_with_ttl("a") == (None, None)
@@ -0,0 +1,226 @@
+import pytest
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock
+from fastapi import HTTPException
+
+from app import dependencies
+from app.dependencies import get_current_account
+from models.schemas import Account
+from repositories.accounts import AccountRepository
+from repositories.revoked_accounts import (
+    MemoryRevokedAccounts, RedisRevokedAccounts, RevokedAccountsNotLoaded, REVOKE_CHUNK_SIZE,
+)
+
+
+def make_pool(row=None, rows=(), execute_result="DELETE 1"):
+    conn = MagicMock()
+    conn.fetchrow = AsyncMock(return_value=row)
+    conn.fetch = AsyncMock(return_value=list(rows))
+    conn.execute = AsyncMock(return_value=execute_result)
+    pool = MagicMock()
+
+    @asynccontextmanager
+    async def acquire():
+        yield conn
+
+    pool.acquire = acquire
+    return pool, conn
+
+
+def make_request(revoked_accounts):
+    request = MagicMock()
+    request.cookies = {}
+    request.app.state.revoked_accounts = revoked_accounts
+    request.app.state.account_repository = AsyncMock()
+    request.app.state.account_repository.get_by_id.return_value = Account(id=1, login="from_db")
+    return request
+
+
+@pytest.fixture
+def stateless_auth(monkeypatch):
+    auth_service = MagicMock()
+    auth_service.verify_token.return_value = {"sub": "1", "login": "seller"}
+    monkeypatch.setattr(dependencies, "AUTH_SERVICE", auth_service)
+    monkeypatch.setattr(dependencies, "AUTH_MODE", "stateless")
+
+
+@pytest.mark.asyncio
+async def test_memory_revoked_accounts():
+    """
+    Юнит-тест: локальная замена Redis помнит отозванные id.
+    """
+    revoked = MemoryRevokedAccounts()
+    await revoked.revoke(1)
+    await revoked.revoke_many([2, 3])
+
+    assert await revoked.is_revoked(1)
+    assert await revoked.is_revoked(3)
+    assert not await revoked.is_revoked(4)
+
+
+def make_redis_client(revoked: int, loaded: int):
+    client = AsyncMock()
+    pipe = MagicMock()
+    pipe.execute = AsyncMock(return_value=[revoked, loaded])
+    client.pipeline = MagicMock()
+    client.pipeline.return_value.__aenter__.return_value = pipe
+    return client, pipe
+
+
+@pytest.mark.asyncio
+async def test_redis_revoked_accounts_adds_ids_in_chunks():
+    """
+    Юнит-тест: проверка - SISMEMBER и метка синхронизации одним pipeline, синхронизация добавляет
+    id порциями SADD и ставит метку.
+    """
+    client, pipe = make_redis_client(revoked=1, loaded=1)
+    revoked = RedisRevokedAccounts(client, key="revoked")
+
+    assert await revoked.is_revoked(5)
+    pipe.sismember.assert_called_once_with("revoked", 5)
+    pipe.exists.assert_called_once_with("revoked:loaded")
+
+    await revoked.load(range(REVOKE_CHUNK_SIZE + 1))
+    assert client.sadd.await_count == 2
+    client.set.assert_awaited_once_with("revoked:loaded", 1)
+    await revoked.revoke_many([])
+    assert client.sadd.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_redis_revoked_accounts_without_marker_is_not_trusted():
+    """
+    Юнит-тест: после потери данных Redis метки нет, и отсутствие id в множестве не считается допуском.
+    """
+    client, _ = make_redis_client(revoked=0, loaded=0)
+
+    with pytest.raises(RevokedAccountsNotLoaded):
+        await RedisRevokedAccounts(client).is_revoked(5)
+
+
+@pytest.mark.asyncio
+async def test_block_and_delete_revoke_only_existing_accounts():
+    """
+    Юнит-тест: block_account и delete_account добавляют id в множество, только если аккаунт был в БД.
+    """
+    revoked = MemoryRevokedAccounts()
+    pool, conn = make_pool(row={"id": 1, "login": "seller", "is_blocked": True})
+    repository = AccountRepository(pool, revoked_accounts=revoked)
+    await repository.block_account(1)
+    await repository.delete_account(2)
+
+    conn.fetchrow.return_value = None
+    conn.execute.return_value = "DELETE 0"
+    await repository.block_account(3)
+    await repository.delete_account(4)
+
+    assert [await revoked.is_revoked(i) for i in (1, 2, 3, 4)] == [True, True, False, False]
+
+
+@pytest.mark.asyncio
+async def test_revoke_failure_rolls_back_block():
+    """
+    Юнит-тест: если id не удалось добавить в множество, транзакция откатывается и ошибка доходит
+    до вызывающего, чтобы блокировку можно было повторить.
+    """
+    revoked = AsyncMock()
+    revoked.revoke.side_effect = ConnectionError("redis down")
+    pool, conn = make_pool(row={"id": 1, "login": "seller", "is_blocked": True})
+    repository = AccountRepository(pool, revoked_accounts=revoked)
+
+    with pytest.raises(ConnectionError):
+        await repository.block_account(1)
+    with pytest.raises(ConnectionError):
+        await repository.delete_account(1)
+
+    # Ошибка прошла через транзакцию, поэтому asyncpg откатит изменение
+    exc_type = conn.transaction.return_value.__aexit__.await_args.args[0]
+    assert exc_type is ConnectionError
+
+
+@pytest.mark.asyncio
+async def test_sync_revoked_accounts_loads_blocked_ids():
+    """
+    Юнит-тест: синхронизация при старте переносит в множество заблокированные в БД аккаунты.
+    """
+    revoked = MemoryRevokedAccounts()
+    pool, conn = make_pool(rows=[{"id": 4}, {"id": 9}])
+    repository = AccountRepository(pool, revoked_accounts=revoked)
+
+    assert await repository.sync_revoked_accounts() == 2
+    assert await revoked.is_revoked(4) and await revoked.is_revoked(9)
+
+
+@pytest.mark.asyncio
+async def test_stateless_auth_skips_database(stateless_auth):
+    """
+    Юнит-тест: в режиме stateless аккаунт собирается из claims токена без запроса в БД.
+    """
+    request = make_request(MemoryRevokedAccounts())
+
+    account = await get_current_account(request=request, token="token")
+
+    assert account == Account(id=1, login="seller", is_blocked=False)
+    request.app.state.account_repository.get_by_id.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_stateless_auth_rejects_revoked_account(stateless_auth):
+    """
+    Юнит-тест: токен заблокированного или удаленного аккаунта отклоняется, пока не истек.
+    """
+    revoked = MemoryRevokedAccounts()
+    await revoked.revoke(1)
+
+    with pytest.raises(HTTPException) as excinfo:
+        await get_current_account(request=make_request(revoked), token="token")
+
+    assert excinfo.value.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_stateless_auth_resyncs_lost_set(stateless_auth):
+    """
+    Юнит-тест: если множество потеряно, аккаунт проверяется по БД и запускается восстановление множества.
+    """
+    revoked = AsyncMock()
+    revoked.is_revoked.side_effect = RevokedAccountsNotLoaded("lost")
+    request = make_request(revoked)
+    request.app.state.account_repository.request_revoked_accounts_sync = MagicMock()
+
+    account = await get_current_account(request=request, token="token")
+
+    assert account.login == "from_db"
+    request.app.state.account_repository.request_revoked_accounts_sync.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_request_sync_runs_once_at_a_time():
+    """
+    Юнит-тест: повторные запросы восстановления, пока синхронизация идет, не запускают новую.
+    """
+    revoked = MemoryRevokedAccounts()
+    pool, conn = make_pool(rows=[{"id": 7}])
+    repository = AccountRepository(pool, revoked_accounts=revoked)
+
+    repository.request_revoked_accounts_sync()
+    repository.request_revoked_accounts_sync()
+    await repository._sync_task
+
+    assert conn.fetch.await_count == 1
+    assert await revoked.is_revoked(7)
+
+
+@pytest.mark.asyncio
+async def test_stateless_auth_falls_back_to_database(stateless_auth):
+    """
+    Юнит-тест: если множество недоступно, аккаунт проверяется по БД, а не пропускается.
+    """
+    revoked = AsyncMock()
+    revoked.is_revoked.side_effect = ConnectionError("redis down")
+    request = make_request(revoked)
+
+    account = await get_current_account(request=request, token="token")
+
+    assert account.login == "from_db"
+    request.app.state.account_repository.get_by_id.assert_awaited_once_with(1)
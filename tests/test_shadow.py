@@ -0,0 +1,128 @@
+import asyncio
+import numpy as np
+import pytest
+from unittest.mock import MagicMock
+from prometheus_client import REGISTRY
+
+from model import train_model, CompactLinearModel
+from models.schemas import Item
+from services.prediction import PredictionService
+from services.shadow import ShadowEvaluator
+
+
+def make_item(item_id: int = 1) -> Item:
+    return Item(
+        item_id=item_id, name="Test", description="Test desc", category=1,
+        images_qty=item_id % 5, seller_id=1, is_verified_seller=item_id % 2 == 0
+    )
+
+
+def metric(name: str, labels: dict | None = None) -> float:
+    return REGISTRY.get_sample_value(name, labels or {}) or 0.0
+
+
+@pytest.fixture(scope="module")
+def model():
+    return train_model()
+
+
+async def wait_for_queue(shadow: ShadowEvaluator):
+    for _ in range(100):
+        if shadow._queue.empty():
+            break
+        await asyncio.sleep(0.01)
+    # Даем фоновой задаче завершить оценку последнего батча
+    await asyncio.sleep(0.05)
+
+
+@pytest.mark.asyncio
+async def test_shadow_records_agreement_for_sampled_requests(model):
+    """
+    Юнит-тест: при sample_rate=1 каждый запрос сравнивается с теневой моделью,
+    а ответ основной модели не меняется.
+    """
+    # Теневая модель с обратным знаком всегда расходится с основной
+    inverted = CompactLinearModel(-model.coef_, -model.intercept_, model.classes_)
+    shadow = ShadowEvaluator(inverted, sample_rate=1.0, flush_interval_ms=0)
+    service = PredictionService(model)
+    service.shadow = shadow
+    agree_before = metric("shadow_predictions_total", {"agreement": "agree"})
+    disagree_before = metric("shadow_predictions_total", {"agreement": "disagree"})
+    deltas_before = metric("shadow_probability_delta_count")
+
+    await shadow.start()
+    try:
+        results = [await service.predict_async(make_item(i)) for i in range(1, 11)]
+        await wait_for_queue(shadow)
+    finally:
+        await shadow.stop()
+
+    assert results == [PredictionService(model).predict(make_item(i)) for i in range(1, 11)]
+    assert metric("shadow_predictions_total", {"agreement": "agree"}) == agree_before
+    assert metric("shadow_predictions_total", {"agreement": "disagree"}) - disagree_before == 10
+    assert metric("shadow_probability_delta_count") - deltas_before == 10
+
+
+@pytest.mark.asyncio
+async def test_shadow_drops_samples_when_queue_is_full(model):
+    """
+    Юнит-тест: переполненная очередь теневой модели отбрасывает выборку, не блокируя запрос.
+    """
+    shadow = ShadowEvaluator(model, sample_rate=1.0, max_queue=1)
+    shadow._queue = asyncio.Queue(maxsize=1)
+    dropped_before = metric("shadow_dropped_total")
+
+    features = np.ones((3, 4))
+    shadow.submit(features, np.zeros(3), np.zeros(3))
+    shadow.submit(features, np.zeros(3), np.zeros(3))
+
+    assert shadow._queue.qsize() == 1
+    assert metric("shadow_dropped_total") - dropped_before == 3
+
+
+def test_shadow_sample_rate_zero_skips_everything(model):
+    """
+    Юнит-тест: при sample_rate=0 в очередь ничего не попадает.
+    """
+    shadow = ShadowEvaluator(model, sample_rate=0.0)
+    shadow._queue = asyncio.Queue()
+    shadow.submit(np.ones((100, 4)), np.zeros(100), np.zeros(100))
+    assert shadow._queue.empty()
+
+
+def test_generic_shadow_model_matches_sklearn(model):
+    """
+    Юнит-тест: модель без быстрого пути оценивается одним predict_proba с теми же метками, что у predict.
+    """
+    shadow = ShadowEvaluator(model)
+    shadow.service.scorer = None
+    features = np.random.default_rng(3).random((50, 4))
+
+    labels, probas = shadow._score(features)
+
+    np.testing.assert_array_equal(labels, model.predict(features))
+    np.testing.assert_allclose(probas, model.predict_proba(features)[:, 1])
+
+
+@pytest.mark.asyncio
+async def test_shadow_failure_does_not_affect_primary(model):
+    """
+    Юнит-тест: ошибка теневой модели учитывается в метрике и не затрагивает основной ответ.
+    """
+    broken = MagicMock()
+    broken.predict.side_effect = ValueError("broken shadow")
+    broken.predict_proba.side_effect = ValueError("broken shadow")
+    shadow = ShadowEvaluator(broken, sample_rate=1.0, flush_interval_ms=0)
+    service = PredictionService(model)
+    service.shadow = shadow
+    errors_before = metric("shadow_errors_total")
+
+    await shadow.start()
+    try:
+        result = await service.predict_async(make_item())
+        await wait_for_queue(shadow)
+    finally:
+        await shadow.stop()
+
+    assert result == PredictionService(model).predict(make_item())
+    assert metric("shadow_errors_total") - errors_before == 1
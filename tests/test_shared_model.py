@@ -0,0 +1,136 @@
+import os
+import pickle
+import subprocess
+import sys
+import numpy as np
+import pytest
+
+from model import (
+    CompactLinearModel, train_model, publish_shared_model, load_shared_model, share_model,
+)
+from services.prediction import PredictionService
+
+# Число признаков синтетической модели для замера памяти: 2M float64 = 16 МБ весов
+LARGE_FEATURES = 2_000_000
+LARGE_MODEL_BYTES = LARGE_FEATURES * 8
+
+# Дочерний процесс загружает модель, читает все веса и печатает прирост анонимной
+# (принадлежащей только процессу) памяти и RSS в килобайтах
+CHILD_CODE = """
+import sys
+import numpy as np
+from model import load_shared_model
+
+def memory():
+    values = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ("Rss:", "Anonymous:"):
+                values[parts[0]] = int(parts[1])
+    return values["Anonymous:"], values["Rss:"]
+
+path, mode = sys.argv[1], sys.argv[2]
+anon_before, rss_before = memory()
+if mode == "shared":
+    model = load_shared_model(path)
+else:
+    model = np.load(path + "/coef.npy")
+weights = model.coef_ if mode == "shared" else model
+checksum = float(np.sum(weights))
+anon_after, rss_after = memory()
+print(anon_after - anon_before, rss_after - rss_before, checksum)
+"""
+
+
+def is_memory_mapped(array: np.ndarray) -> bool:
+    while array is not None:
+        if isinstance(array, np.memmap):
+            return True
+        array = array.base if isinstance(array.base, np.ndarray) else None
+    return False
+
+
+@pytest.fixture(scope="module")
+def trained_model():
+    return train_model()
+
+
+def test_shared_model_is_read_only_mapping(trained_model, tmp_path):
+    """
+    Юнит-тест: опубликованная модель отображается в память только для чтения
+    и предсказывает так же, как исходная.
+    """
+    shared = share_model(trained_model, str(tmp_path))
+
+    assert isinstance(shared, CompactLinearModel)
+    assert is_memory_mapped(shared.coef_)
+    assert not shared.coef_.flags.writeable
+    features = np.random.default_rng(3).random((50, 4))
+    np.testing.assert_allclose(shared.predict_proba(features), trained_model.predict_proba(features), atol=1e-12)
+
+
+def test_publish_is_idempotent_per_weights(trained_model, tmp_path):
+    """
+    Юнит-тест: одинаковые веса публикуются в один каталог, новые - в другой.
+    """
+    first = publish_shared_model(trained_model, str(tmp_path))
+    assert publish_shared_model(trained_model, str(tmp_path)) == first
+
+    other = CompactLinearModel(trained_model.coef_ * 2, trained_model.intercept_, trained_model.classes_)
+    assert publish_shared_model(other, str(tmp_path)) != first
+
+
+def test_linear_scorer_does_not_copy_shared_weights(trained_model, tmp_path):
+    """
+    Юнит-тест: быстрый скорер использует отображенные веса без копирования.
+    """
+    shared = share_model(trained_model, str(tmp_path))
+    scorer = PredictionService(shared).scorer
+    assert np.shares_memory(scorer.coef, shared.coef_)
+
+
+def test_pickled_shared_model_remaps_instead_of_copying(tmp_path):
+    """
+    Юнит-тест: при передаче в другой процесс сериализуется путь, а не веса.
+    """
+    big = CompactLinearModel(np.ones(LARGE_FEATURES), np.zeros(1), np.array([0, 1]))
+    shared = share_model(big, str(tmp_path))
+
+    payload = pickle.dumps(shared)
+    restored = pickle.loads(payload)
+
+    assert len(payload) < 1024
+    assert restored.shared_path == shared.shared_path
+    assert is_memory_mapped(restored.coef_)
+    assert restored.coef_.shape == shared.coef_.shape
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/smaps_rollup"), reason="Нужен Linux с /proc/self/smaps_rollup")
+def test_private_memory_stays_flat_as_processes_are_added(tmp_path):
+    """
+    Юнит-тест: каждый новый процесс с разделяемой моделью почти не добавляет
+    собственной памяти, тогда как приватная загрузка копирует все веса.
+    """
+    rng = np.random.default_rng(4)
+    big = CompactLinearModel(rng.random(LARGE_FEATURES), np.zeros(1), np.array([0, 1]))
+    path = publish_shared_model(big, str(tmp_path))
+    # Родитель держит отображение, как уже работающий процесс узла
+    holder = load_shared_model(path)
+    expected_checksum = float(np.sum(holder.coef_))
+
+    def run_child(mode: str) -> tuple[int, int]:
+        output = subprocess.run(
+            [sys.executable, "-c", CHILD_CODE, path, mode],
+            capture_output=True, text=True, check=True, cwd=os.getcwd(),
+        ).stdout.split()
+        assert float(output[2]) == pytest.approx(expected_checksum)
+        return int(output[0]) * 1024, int(output[1]) * 1024
+
+    shared_private = [run_child("shared")[0] for _ in range(3)]
+    private_copy, _ = run_child("private")
+
+    # Приватная загрузка добавляет порядка размера весов в собственную память процесса
+    assert private_copy > LARGE_MODEL_BYTES * 0.9
+    # Разделяемая - не более нескольких процентов, и так для каждого добавленного процесса
+    assert all(delta < LARGE_MODEL_BYTES * 0.05 for delta in shared_private)
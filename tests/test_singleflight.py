@@ -0,0 +1,198 @@
+import asyncio
+import numpy as np
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from httpx import AsyncClient, ASGITransport
+
+from main import app
+from app.dependencies import get_current_account
+from models.schemas import Account
+from services.prediction import PredictionService
+from services.singleflight import SingleFlight
+from repositories.cache import NegativeCache, SoftTtlCache
+
+
+class FakeRedisClient:
+    """Минимальная замена redis-клиента для блокировок: SET NX, EXISTS и скрипт снятия."""
+    def __init__(self):
+        self.data: dict[str, str] = {}
+
+    async def set(self, key, value, nx=False, px=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    async def exists(self, key):
+        return int(key in self.data)
+
+    async def eval(self, script, numkeys, key, token):
+        if self.data.get(key) == token:
+            del self.data[key]
+            return 1
+        return 0
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_computation():
+    """
+    Юнит-тест: одновременные вызовы по одному ключу выполняют функцию один раз.
+    """
+    singleflight = SingleFlight()
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"value": calls}
+
+    results = await asyncio.gather(*(singleflight.do("k", compute) for _ in range(20)))
+
+    assert calls == 1
+    assert all(result == {"value": 1} for result in results)
+    # После завершения следующий вызов снова вычисляет значение
+    assert await singleflight.do("k", compute) == {"value": 2}
+
+
+@pytest.mark.asyncio
+async def test_different_keys_are_not_coalesced():
+    """
+    Юнит-тест: вызовы по разным ключам выполняются независимо.
+    """
+    singleflight = SingleFlight()
+    compute = AsyncMock(side_effect=lambda: asyncio.sleep(0.01, result="ok"))
+
+    await asyncio.gather(singleflight.do("a", compute), singleflight.do("b", compute))
+
+    assert compute.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_exception_is_shared_with_waiters():
+    """
+    Юнит-тест: исключение вычисления получают все ожидающие.
+    """
+    singleflight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise LookupError("not found")
+
+    results = await asyncio.gather(*(singleflight.do("k", fail) for _ in range(5)), return_exceptions=True)
+
+    assert all(isinstance(result, LookupError) for result in results)
+
+
+@pytest.mark.asyncio
+async def test_leader_cancellation_does_not_cancel_followers():
+    """
+    Юнит-тест: отмена запроса, начавшего вычисление, не отменяет его для остальных.
+    """
+    singleflight = SingleFlight()
+
+    async def compute():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    leader = asyncio.create_task(singleflight.do("k", compute))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(singleflight.do("k", compute))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await follower == "done"
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+
+
+@pytest.mark.asyncio
+async def test_distributed_lock_holder_computes_and_releases_lock():
+    """
+    Юнит-тест: реплика, взявшая блокировку в Redis, вычисляет значение и снимает блокировку.
+    """
+    redis_client = FakeRedisClient()
+    singleflight = SingleFlight(redis_client=redis_client)
+
+    assert await singleflight.do("prediction:1", AsyncMock(return_value="fresh")) == "fresh"
+    assert redis_client.data == {}
+
+
+@pytest.mark.asyncio
+async def test_distributed_waiter_takes_result_from_cache():
+    """
+    Юнит-тест: если блокировку держит другая реплика, результат берется из кэша без вычисления.
+    """
+    redis_client = FakeRedisClient()
+    redis_client.data["lock:prediction:1"] = "other-replica"
+    singleflight = SingleFlight(redis_client=redis_client, lock_ttl=1.0, poll_interval=0.01)
+    cache = {}
+    compute = AsyncMock(return_value="own")
+
+    async def other_replica_finishes():
+        await asyncio.sleep(0.03)
+        cache["prediction:1"] = "from-other-replica"
+        del redis_client.data["lock:prediction:1"]
+
+    finisher = asyncio.create_task(other_replica_finishes())
+    result = await singleflight.do(
+        "prediction:1", compute, recheck=AsyncMock(side_effect=lambda: cache.get("prediction:1"))
+    )
+    await finisher
+
+    assert result == "from-other-replica"
+    compute.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_distributed_waiter_computes_when_lock_expires():
+    """
+    Юнит-тест: если чужая блокировка истекла без результата, реплика вычисляет значение сама.
+    """
+    redis_client = FakeRedisClient()
+    redis_client.data["lock:prediction:1"] = "stuck-replica"
+    singleflight = SingleFlight(redis_client=redis_client, lock_ttl=0.05, poll_interval=0.01)
+    compute = AsyncMock(return_value="own")
+
+    assert await singleflight.do("prediction:1", compute, recheck=AsyncMock(return_value=None)) == "own"
+    compute.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_simple_predict_misses_query_database_once():
+    """
+    Юнит-тест: N одновременных промахов кэша simple_predict по одному объявлению
+    дают ровно один запрос в БД и одну запись в кэш.
+    """
+    model = MagicMock()
+    model.predict.return_value = np.array([0])
+    model.predict_proba.return_value = np.array([[0.9, 0.1]])
+
+    async def get_item_features(item_id):
+        await asyncio.sleep(0.02)
+        return {"item_id": item_id, "is_verified_seller": True, "images_qty": 2,
+                "description_length": 10, "category": 1}
+
+    item_repository = MagicMock()
+    item_repository.get_item_features = AsyncMock(side_effect=get_item_features)
+    app.state.item_repository = item_repository
+    app.state.prediction_service = PredictionService(model)
+    app.state.redis_repository = AsyncMock()
+    app.state.redis_repository.get.return_value = None
+    app.state.redis_repository.get_with_ttl.return_value = (None, None)
+    app.state.singleflight = SingleFlight()
+    app.state.prediction_cache = SoftTtlCache(app.state.redis_repository, singleflight=app.state.singleflight)
+    app.state.negative_cache = NegativeCache(app.state.redis_repository)
+    app.dependency_overrides[get_current_account] = lambda: Account(id=1, login="testuser")
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            responses = await asyncio.gather(
+                *(client.post("/simple_predict", params={"item_id": 42}) for _ in range(10))
+            )
+    finally:
+        app.dependency_overrides.clear()
+
+    assert all(response.status_code == 200 for response in responses)
+    assert all(response.json() == {"is_violation": False, "probability": 0.1} for response in responses)
+    item_repository.get_item_features.assert_awaited_once_with(42)
+    app.state.redis_repository.set_unless.assert_awaited_once()
@@ -0,0 +1,143 @@
+import asyncio
+import subprocess
+import sys
+import numpy as np
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from fastapi import APIRouter, FastAPI
+from httpx import AsyncClient, ASGITransport
+
+from app.dependencies import get_current_account
+from app.metrics import REQUEST_STAGE_DURATION
+from app.timing import StageTimer, StageTimingMiddleware, TimedRoute
+from models.schemas import Account
+from repositories.cache import NegativeCache, SoftTtlCache
+from routes.predictions import router as predictions_router
+from services.prediction import PredictionService
+from services.singleflight import SingleFlight
+
+
+def parse_server_timing(header: str) -> dict[str, float]:
+    stages = {}
+    for part in header.split(", "):
+        stage, _, duration = part.partition(";dur=")
+        stages[stage] = float(duration)
+    return stages
+
+
+def histogram_count(route: str, stage: str) -> float:
+    for metric in REQUEST_STAGE_DURATION.collect():
+        for sample in metric.samples:
+            if (sample.name.endswith("_count") and sample.labels.get("route") == route
+                    and sample.labels.get("stage") == stage):
+                return sample.value
+    return 0.0
+
+
+@pytest.mark.asyncio
+async def test_stage_timer_accumulates_stages_and_sets_header():
+    """
+    Юнит-тест: время одноименных этапов суммируется, попадает в Server-Timing и в гистограмму
+    с шаблоном пути маршрута; сериализация ответа измеряется отдельно.
+    """
+    router = APIRouter(route_class=TimedRoute)
+
+    @router.get("/things/{thing_id}")
+    async def get_thing(thing_id: int):
+        for _ in range(2):
+            with StageTimer("db"):
+                await asyncio.sleep(0.005)
+        return {"id": thing_id}
+
+    app = FastAPI()
+    app.include_router(router)
+    app.add_middleware(StageTimingMiddleware, server_timing_header=True)
+    count_before = histogram_count("/things/{thing_id}", "db")
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/things/1")
+
+    assert response.json() == {"id": 1}
+    stages = parse_server_timing(response.headers["Server-Timing"])
+    assert set(stages) == {"db", "serialization"}
+    assert stages["db"] >= 10
+    assert histogram_count("/things/{thing_id}", "db") - count_before == 1
+
+
+@pytest.mark.asyncio
+async def test_server_timing_header_is_optional():
+    """
+    Юнит-тест: без server_timing_header замеры пишутся только в метрики.
+    """
+    router = APIRouter(route_class=TimedRoute)
+
+    @router.get("/ping")
+    async def ping():
+        with StageTimer("db"):
+            pass
+        return {"ok": True}
+
+    app = FastAPI()
+    app.include_router(router)
+    app.add_middleware(StageTimingMiddleware)
+    count_before = histogram_count("/ping", "db")
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/ping")
+
+    assert "Server-Timing" not in response.headers
+    assert histogram_count("/ping", "db") - count_before == 1
+
+
+def test_stage_timer_outside_request_is_noop():
+    """
+    Юнит-тест: вне запроса таймер ничего не записывает и не падает.
+    """
+    with StageTimer("db") as timer:
+        pass
+    assert timer.timings is None
+
+
+@pytest.mark.asyncio
+async def test_simple_predict_reports_all_stages():
+    """
+    Юнит-тест: промах кэша simple_predict раскладывается на этапы от кэша до сериализации.
+    """
+    model = MagicMock()
+    model.predict.return_value = np.array([0])
+    model.predict_proba.return_value = np.array([[0.9, 0.1]])
+    item_repository = MagicMock()
+    item_repository.get_item_features = AsyncMock(return_value={
+        "item_id": 1, "is_verified_seller": True, "images_qty": 1, "description_length": 9, "category": 1,
+    })
+    redis_repository = AsyncMock()
+    redis_repository.get.return_value = None
+    redis_repository.get_with_ttl.return_value = (None, None)
+
+    app = FastAPI()
+    app.include_router(predictions_router)
+    app.add_middleware(StageTimingMiddleware, server_timing_header=True)
+    app.state.prediction_service = PredictionService(model)
+    app.state.item_repository = item_repository
+    app.state.singleflight = SingleFlight()
+    app.state.prediction_cache = SoftTtlCache(redis_repository, singleflight=app.state.singleflight)
+    app.state.negative_cache = NegativeCache(redis_repository)
+    app.dependency_overrides[get_current_account] = lambda: Account(id=1, login="testuser")
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.post("/simple_predict", params={"item_id": 1})
+
+    assert response.status_code == 200
+    stages = parse_server_timing(response.headers["Server-Timing"])
+    assert set(stages) == {"cache_get", "db", "features", "inference", "cache_set", "serialization"}
+
+
+def test_prediction_service_import_does_not_load_fastapi():
+    """
+    Юнит-тест: сервис предсказаний использует таймеры этапов без FastAPI, поэтому воркер
+    и процессы пула инференса не тратят время старта на импорт фреймворка.
+    """
+    code = "import sys, services.prediction; print('fastapi' in sys.modules, 'starlette' in sys.modules)"
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert output.split() == ["False", "False"]
+